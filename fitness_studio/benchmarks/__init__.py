@@ -0,0 +1,10 @@
+"""
+Reproducible load tests for the booking API.
+
+``dataset`` seeds a deterministic studio (classes, members, bookings),
+``scenarios`` scripts what clients do against it, ``runner`` drives the
+scenarios through the in-process test client or a running server and
+summarises throughput and latency, and ``compare`` flags regressions
+between two result files. The ``run_benchmarks`` and ``compare_benchmarks``
+commands wrap them.
+"""
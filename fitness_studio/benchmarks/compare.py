@@ -0,0 +1,51 @@
+"""
+Flag regressions between two benchmark result files.
+
+A scenario regresses when its throughput drops, or its p50/p95/p99
+latency rises, by more than ``threshold`` (a fraction) and by more than
+``min_delta_ms`` for latencies, so sub-millisecond noise on fast endpoints
+does not count. More failed operations, or a failed consistency check,
+is always a regression.
+"""
+from dataclasses import dataclass
+
+LATENCY_KEYS = ('p50', 'p95', 'p99')
+
+
+@dataclass
+class Change:
+    scenario: str
+    metric: str
+    base: float
+    head: float
+    regression: bool
+
+    @property
+    def ratio(self):
+        return (self.head - self.base) / self.base if self.base else 0.0
+
+
+def compare(base, head, threshold=0.1, min_delta_ms=1.0):
+    """Return one ``Change`` per compared metric of the scenarios both runs have."""
+    changes = []
+    for name, old in base['scenarios'].items():
+        new = head['scenarios'].get(name)
+        if new is None:
+            continue
+        old_rate, new_rate = old['throughput_ops'], new['throughput_ops']
+        changes.append(Change(
+            name, 'throughput_ops', old_rate, new_rate,
+            bool(old_rate) and new_rate < old_rate * (1 - threshold),
+        ))
+        for key in LATENCY_KEYS:
+            old_latency, new_latency = old['latency_ms'][key], new['latency_ms'][key]
+            changes.append(Change(
+                name, f'{key}_ms', old_latency, new_latency,
+                new_latency > old_latency * (1 + threshold) and new_latency - old_latency > min_delta_ms,
+            ))
+        changes.append(Change(name, 'errors', old['errors'], new['errors'], new['errors'] > old['errors']))
+    return changes
+
+
+def regressions(changes):
+    return [change for change in changes if change.regression]
@@ -0,0 +1,133 @@
+"""
+Seeded benchmark data: classes, member accounts and their bookings.
+
+The same ``seed`` and sizes always produce the same studio, with class times
+counted from the next midnight so runs on different days stay comparable.
+Everything created is marked (``bench-`` usernames, ``Bench`` instructors)
+and removed again by ``clear``.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+import random
+import threading
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from booking import catalogue, schedule
+from booking.models import Booking, FitnessClass
+from userprofile.models import UserProfile
+from userprofile.serializers import RoleTokenObtainPairSerializer
+
+USERNAME_PREFIX = 'bench-'
+INSTRUCTOR_PREFIX = 'Bench '
+CLASS_NAMES = [name for name, _ in FitnessClass.CLASS_TYPES]
+
+
+@dataclass
+class Dataset:
+    """IDs of the seeded rows, and access tokens issued on demand."""
+
+    seed: int
+    class_ids: list
+    user_ids: list
+    bookings: int
+    _tokens: dict = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def token(self, user_id):
+        """An access token for ``user_id``, issued once."""
+        token = self._tokens.get(user_id)
+        if token is None:
+            user = User.objects.select_related('profile').get(pk=user_id)
+            token = str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+            with self._lock:
+                self._tokens[user_id] = token
+        return token
+
+    def describe(self):
+        return {
+            'seed': self.seed,
+            'classes': len(self.class_ids),
+            'users': len(self.user_ids),
+            'bookings': self.bookings,
+        }
+
+
+def clear():
+    """Delete everything a previous ``seed`` created."""
+    with transaction.atomic():
+        FitnessClass.objects.filter(instructor__startswith=INSTRUCTOR_PREFIX).delete()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+
+def base_time():
+    """Midnight starting tomorrow, the zero point of every seeded schedule."""
+    return (timezone.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def seed(classes=200, users=500, bookings=2000, seed=1, days=28):
+    """
+    Replace the benchmark data with ``classes`` classes over ``days`` days,
+    ``users`` members and up to ``bookings`` bookings, all drawn from ``seed``.
+
+    Bookings never exceed a class's capacity and a member books a class at
+    most once, so fewer are created when the classes cannot hold them.
+    """
+    rng = random.Random(seed)
+    clear()
+    start = base_time()
+    with transaction.atomic():
+        class_rows = []
+        for index in range(classes):
+            total_slots = rng.randint(10, 30)
+            class_rows.append(FitnessClass(
+                name=rng.choice(CLASS_NAMES),
+                date_time=start + timedelta(minutes=rng.randrange(days * 24 * 4) * 15),
+                instructor=f"{INSTRUCTOR_PREFIX}{rng.randrange(20)}",
+                total_slots=total_slots,
+                available_slots=total_slots,
+                duration=rng.choice(['30 min', '45 min', '60 min']),
+                Location=f"Studio {rng.choice('ABCD')}",
+            ))
+        class_rows = FitnessClass.objects.bulk_create(class_rows)
+
+        user_rows = []
+        for index in range(users):
+            user = User(username=f"{USERNAME_PREFIX}{seed}-{index}", email=f"member{index}@bench.example.com")
+            user.set_unusable_password()
+            user_rows.append(user)
+        user_rows = User.objects.bulk_create(user_rows)
+        profiles = UserProfile.objects.bulk_create(
+            [UserProfile(user=user, role='member') for user in user_rows]
+        )
+
+        booked = set()
+        booking_rows = []
+        attempts = 0
+        while len(booking_rows) < bookings and attempts < bookings * 4:
+            attempts += 1
+            fitness_class = rng.choice(class_rows)
+            profile = rng.choice(profiles) if profiles else None
+            if profile is None or fitness_class.available_slots == 0 or (fitness_class.pk, profile.pk) in booked:
+                continue
+            booked.add((fitness_class.pk, profile.pk))
+            fitness_class.available_slots -= 1
+            booking_rows.append(Booking(
+                fitness_class=fitness_class,
+                user_details=profile,
+                booking_time=start - timedelta(hours=rng.randrange(1, 24 * 7)),
+            ))
+        Booking.objects.bulk_create(booking_rows)
+        FitnessClass.objects.bulk_update(class_rows, ['available_slots'], batch_size=500)
+        # bulk_create skips the signals that maintain the schedule projection.
+        schedule.rebuild([profile.pk for profile in profiles])
+        transaction.on_commit(catalogue.bump_version)
+
+    return Dataset(
+        seed=seed,
+        class_ids=[fitness_class.pk for fitness_class in class_rows],
+        user_ids=[user.pk for user in user_rows],
+        bookings=len(booking_rows),
+    )
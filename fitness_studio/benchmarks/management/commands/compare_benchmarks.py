@@ -0,0 +1,61 @@
+"""
+Compare two ``run_benchmarks`` result files and fail on regressions::
+
+    python manage.py compare_benchmarks before.json after.json --threshold 0.1
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.compare import compare, regressions
+
+
+class Command(BaseCommand):
+    help = "Compare two benchmark result files; exits non-zero when the second regressed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('base', help="Result file of the baseline run")
+        parser.add_argument('head', help="Result file of the run to check")
+        parser.add_argument(
+            '--threshold', type=float, default=0.1,
+            help="Relative change that counts as a regression (default 0.1, i.e. 10%%)",
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=1.0,
+            help="Ignore latency increases smaller than this many milliseconds",
+        )
+
+    def handle(self, *args, **options):
+        reports = []
+        for path in (options['base'], options['head']):
+            try:
+                with open(path) as result_file:
+                    reports.append(json.load(result_file))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {path}: {e}")
+        base, head = reports
+
+        for side, report in (('base', base), ('head', head)):
+            meta = report.get('meta', {})
+            self.stdout.write(
+                f"{side}: {meta.get('revision') or 'unknown revision'} on {meta.get('database')}"
+                f" via {meta.get('transport')}, concurrency {meta.get('concurrency')}"
+            )
+        if base.get('meta', {}).get('dataset') != head.get('meta', {}).get('dataset'):
+            self.stderr.write("Warning: the runs used different datasets")
+
+        changes = compare(base, head, options['threshold'], options['min_delta_ms'])
+        for change in changes:
+            marker = 'REGRESSION' if change.regression else ''
+            self.stdout.write(
+                f"{change.scenario:>20} {change.metric:>15}: {change.base:>10,.2f} -> {change.head:>10,.2f}"
+                f"  {change.ratio:+7.1%}  {marker}"
+            )
+
+        found = regressions(changes)
+        if found:
+            raise CommandError(
+                f"{len(found)} regression(s): "
+                + ', '.join(f"{change.scenario} {change.metric}" for change in found)
+            )
+        self.stdout.write("No regressions")
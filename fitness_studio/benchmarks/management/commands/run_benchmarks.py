@@ -0,0 +1,157 @@
+"""
+Seed a studio and replay the benchmark scenarios against it.
+
+By default everything runs in-process: a throwaway test database is created
+(a temporary file for SQLite, so parallel clients share it), seeded, loaded
+through the full Django stack with throttles out of the way and the plan
+model replaced by ``StubClient``, and dropped again::
+
+    python manage.py run_benchmarks --output before.json
+    python manage.py run_benchmarks --scenarios catalogue,booking_rush --concurrency 16
+
+With ``--url`` the requests go to a running server instead, and the data is
+seeded into the configured DATABASE_URL, which that server must share.
+Point it at a scratch database, and start the server with throttles raised
+and ``PLAN_MODEL_CLIENT=presionalized_assistance.llm.StubClient``.
+
+Compare two result files with ``compare_benchmarks``.
+"""
+import json
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from benchmarks import dataset, runner
+from benchmarks.scenarios import SCENARIOS
+from booking import catalogue
+from fitness_studio import throttling
+from presionalized_assistance import llm, plan_cache
+
+
+def benchmark_settings(model_latency):
+    """Settings for in-process runs: no throttles or job caps, a stub model, no plan cache."""
+    return {
+        'THROTTLING': {
+            **getattr(settings, 'THROTTLING', {}),
+            'RATES': {scope: '1000000/s' for scope in throttling.DEFAULTS['RATES']},
+        },
+        'PLAN_JOB_MAX_IN_FLIGHT': 1000000,
+        'PLAN_MODEL_CLIENT': 'presionalized_assistance.llm.StubClient',
+        'PLAN_MODEL_CLIENT_OPTIONS': {'latency': model_latency},
+        'PLAN_JOBS_EAGER': False,
+        'PLAN_JOBS_IN_PROCESS': True,
+        'PLAN_CACHE': {**getattr(settings, 'PLAN_CACHE', {}), 'ENABLED': False},
+    }
+
+
+def reset_caches():
+    throttling.reset_backend()
+    catalogue.reset_backend()
+    llm.reset_client()
+    plan_cache.reset_cache()
+
+
+class Command(BaseCommand):
+    help = "Run the booking API benchmark scenarios on seeded data and write the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenarios', default=','.join(SCENARIOS),
+            help=f"Comma-separated scenarios to run (default: all of {', '.join(SCENARIOS)})",
+        )
+        parser.add_argument('--classes', type=int, default=200, help="Seeded classes")
+        parser.add_argument('--users', type=int, default=500, help="Seeded members")
+        parser.add_argument('--bookings', type=int, default=2000, help="Seeded bookings")
+        parser.add_argument('--seed', type=int, default=1, help="Seed for the data and the request mix")
+        parser.add_argument('--operations', type=int, default=500, help="Measured operations per scenario")
+        parser.add_argument('--concurrency', type=int, default=8, help="Parallel clients")
+        parser.add_argument('--warmup', type=int, default=20, help="Unmeasured operations before each scenario")
+        parser.add_argument('--model-latency', type=float, default=0.05, help="Stub model latency in seconds")
+        parser.add_argument('--output', help="Write the JSON results to this file ('-' for stdout)")
+        parser.add_argument('--url', help="Load a running server at this base URL instead of the in-process client")
+        parser.add_argument(
+            '--app-logs', action='store_true',
+            help="Keep the views' INFO and WARNING logs, e.g. every rejected booking (off by default)",
+        )
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = sorted(set(names) - set(SCENARIOS))
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        scenarios = [SCENARIOS[name] for name in names]
+
+        if not options['app_logs']:
+            logging.disable(logging.WARNING)
+        try:
+            if options['url']:
+                report = self._run(scenarios, runner.HttpTransport(options['url']), options)
+            else:
+                report = self._run_in_process(scenarios, options)
+        finally:
+            logging.disable(logging.NOTSET)
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def _run_in_process(self, scenarios, options):
+        default = connections['default'].settings_dict
+        # Threads keep no connections open, so the test database can be dropped afterwards.
+        default['CONN_MAX_AGE'] = 0
+        if connections['default'].vendor == 'sqlite':
+            default.setdefault('TEST', {})['NAME'] = os.path.join(tempfile.gettempdir(), 'fitness_benchmarks.sqlite3')
+            # Writers queue for the lock instead of failing when a read transaction upgrades.
+            default.setdefault('OPTIONS', {}).update(transaction_mode='IMMEDIATE', timeout=30)
+
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            with override_settings(**benchmark_settings(options['model_latency'])):
+                reset_caches()
+                try:
+                    return self._run(scenarios, runner.InProcessTransport(), options)
+                finally:
+                    reset_caches()
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def _run(self, scenarios, transport, options):
+        data = dataset.seed(options['classes'], options['users'], options['bookings'], options['seed'])
+        self.stdout.write(
+            f"Seeded {len(data.class_ids)} classes, {len(data.user_ids)} members and {data.bookings} bookings"
+        )
+        try:
+            return runner.run(
+                scenarios, transport, data, options['operations'], options['concurrency'],
+                options['warmup'], options['seed'], log=self._log,
+            )
+        finally:
+            if options['url']:
+                dataset.clear()
+
+    def _log(self, name, result):
+        latency = result['latency_ms']
+        self.stdout.write(
+            f"{name:>20}: {result['throughput_ops']:9,.1f} ops/s"
+            f"  p50 {latency['p50']:8.2f}ms  p95 {latency['p95']:8.2f}ms  p99 {latency['p99']:8.2f}ms"
+            f"  errors {result['errors']}/{result['operations']}"
+        )
+        for message in result['error_messages']:
+            self.stderr.write(f"{'':>22}{message}")
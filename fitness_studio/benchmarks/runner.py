@@ -0,0 +1,207 @@
+"""
+Drive scenarios with parallel clients and summarise what they measured.
+
+Requests go through a transport: ``InProcessTransport`` calls the full
+Django stack (middleware, authentication, throttles) through DRF's test
+client, ``HttpTransport`` talks to a running server. Each scenario runs
+``operations`` operations spread over ``concurrency`` threads, after
+``warmup`` unmeasured ones, and is summarised as operations per second and
+operation latency percentiles in milliseconds.
+"""
+from datetime import datetime, timezone as dt_timezone
+import itertools
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+
+import django
+from django.conf import settings
+from django.db import connection, connections
+from rest_framework.test import APIClient
+
+from .scenarios import Context
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class InProcessTransport:
+    """Requests through the test client, one client per thread."""
+
+    name = 'in-process'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method, path, token=None, data=None, params=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = APIClient()
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {token}"} if token else {}
+        if method == 'GET':
+            response = client.get(path, params or {}, **headers)
+        else:
+            response = getattr(client, method.lower())(path, data, format='json', **headers)
+        return response.status_code, _json(response.content)
+
+
+class HttpTransport:
+    """Requests to a running server at ``base_url``, one session per thread."""
+
+    name = 'http'
+
+    def __init__(self, base_url, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method, path, token=None, data=None, params=None):
+        import requests
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        response = session.request(
+            method, self.base_url + path, params=params, json=data, headers=headers, timeout=self.timeout
+        )
+        return response.status_code, _json(response.content)
+
+
+def _json(content):
+    try:
+        return json.loads(content) if content else None
+    except ValueError:
+        return None
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarise(results, elapsed, expected):
+    """Fold ``(latency, statuses, error)`` per operation into one scenario result."""
+    latencies = sorted(latency * 1000 for latency, _, _ in results)
+    statuses, errors, messages = {}, 0, []
+    for _, op_statuses, error in results:
+        for status in op_statuses:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if error or any(status not in expected for status in op_statuses):
+            errors += 1
+            if error and len(messages) < 5:
+                messages.append(error)
+    operations = len(results)
+    return {
+        'operations': operations,
+        'requests': sum(isinstance(status, int) for _, op_statuses, _ in results for status in op_statuses),
+        'errors': errors,
+        'error_rate': round(errors / operations, 4) if operations else 0.0,
+        'duration_s': round(elapsed, 3),
+        'throughput_ops': round(operations / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(sum(latencies) / operations, 3) if operations else 0.0,
+            **{f'p{pct}': round(percentile(latencies, pct), 3) for pct in PERCENTILES},
+            'max': round(latencies[-1], 3) if latencies else 0.0,
+        },
+        'statuses': dict(sorted(statuses.items())),
+        'error_messages': messages,
+    }
+
+
+def _operation(scenario, transport, dataset, state, seed, index):
+    rng = random.Random(f"{seed}:{scenario.name}:{index}")
+    started = time.perf_counter()
+    try:
+        statuses = scenario.operation(Context(transport, dataset, rng, index, state))
+        error = ''
+    except Exception as e:
+        statuses, error = ('exception',), f"{e.__class__.__name__}: {e}"
+    return time.perf_counter() - started, statuses, error
+
+
+def _run_parallel(work, count, concurrency):
+    """Call ``work(index)`` for ``range(count)`` on ``concurrency`` threads; returns results and wall time."""
+    indexes = itertools.count()
+    results = []
+    lock = threading.Lock()
+
+    def client():
+        try:
+            while (index := next(indexes)) < count:
+                result = work(index)
+                with lock:
+                    results.append(result)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(min(concurrency, count))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def run_scenario(scenario, transport, dataset, operations, concurrency=8, warmup=20, seed=1):
+    state = scenario.setup(dataset, operations) if scenario.setup else None
+    try:
+        if scenario.warmup and warmup:
+            _run_parallel(
+                lambda index: _operation(scenario, transport, dataset, state, f"{seed}:warmup", index),
+                warmup, concurrency,
+            )
+        results, elapsed = _run_parallel(
+            lambda index: _operation(scenario, transport, dataset, state, seed, index),
+            operations, concurrency,
+        )
+        summary = summarise(results, elapsed, scenario.expected)
+        if scenario.verify:
+            summary['checks'] = scenario.verify(state, dataset)
+            if not summary['checks'].get('consistent', True):
+                summary['errors'] += 1
+    finally:
+        if scenario.teardown:
+            scenario.teardown(state, dataset)
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(scenarios, transport, dataset, operations, concurrency=8, warmup=20, seed=1, log=None):
+    """Run ``scenarios`` in order; returns the result document written as JSON."""
+    report = {
+        'meta': {
+            'started_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connections['default'].vendor,
+            'transport': transport.name,
+            'dataset': dataset.describe(),
+            'operations': operations,
+            'concurrency': concurrency,
+            'warmup': warmup,
+        },
+        'scenarios': {},
+    }
+    for scenario in scenarios:
+        result = run_scenario(scenario, transport, dataset, operations, concurrency, warmup, seed)
+        report['scenarios'][scenario.name] = result
+        if log:
+            log(scenario.name, result)
+    return report
@@ -0,0 +1,187 @@
+"""
+Scripted client behaviour replayed by the benchmark runner.
+
+A scenario's ``operation`` is one user action, which may take several
+requests; it gets a ``Context`` with the transport, the seeded dataset, the
+scenario's ``setup`` state and a random generator seeded from the run seed
+and the operation index, so every run issues the same requests. It returns
+the status of each request (and, for plan jobs, the job's final status);
+the operation counts as an error if any of them is outside ``expected``.
+``verify`` checks the database afterwards, e.g. that a sold-out class was
+not oversold.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+import time
+
+from django.db.models import Sum
+
+from booking.models import Booking, FitnessClass
+
+from .dataset import CLASS_NAMES, INSTRUCTOR_PREFIX, base_time
+
+CLASSES_PATH = '/api/classes/'
+BOOKINGS_PATH = '/api/bookings/'
+PLANS_PATH = '/api/ai-assistance/'
+TIMEZONES = ['Asia/Kolkata', 'UTC', 'Europe/London', 'America/New_York']
+PLAN_POLL_INTERVAL = 0.02
+PLAN_TIMEOUT = 60
+
+
+@dataclass
+class Context:
+    client: object
+    dataset: object
+    rng: object
+    index: int
+    state: object = None
+
+    def member(self):
+        """A random seeded member and their access token."""
+        user_id = self.rng.choice(self.dataset.user_ids)
+        return user_id, self.dataset.token(user_id)
+
+
+@dataclass
+class Scenario:
+    name: str
+    description: str
+    operation: object
+    expected: frozenset
+    setup: object = None
+    verify: object = None
+    teardown: object = None
+    # Warm-up operations would change what the measured ones see, e.g. sell seats.
+    warmup: bool = True
+
+
+def browse_catalogue(ctx):
+    params = {'timezone': ctx.rng.choice(TIMEZONES)}
+    if ctx.rng.random() < 0.5:
+        params['fitnessclass_type'] = ctx.rng.choice(CLASS_NAMES)
+    if ctx.rng.random() < 0.5:
+        params['page_size'] = ctx.rng.choice([20, 50])
+    status, _ = ctx.client.request('GET', CLASSES_PATH, params=params)
+    return (status,)
+
+
+def create_rush_class(dataset, operations):
+    """One class with seats for half the bookers, starting in a week."""
+    capacity = max(1, operations // 2)
+    fitness_class = FitnessClass.objects.create(
+        name='HIIT',
+        date_time=base_time() + timedelta(days=7),
+        instructor=f"{INSTRUCTOR_PREFIX}rush",
+        total_slots=capacity,
+        available_slots=capacity,
+        duration='45 min',
+        Location='Studio A',
+    )
+    return fitness_class.pk
+
+
+def book_rush_class(ctx):
+    # Distinct members while they last, so refusals mean "sold out", not "already booked".
+    user_id = ctx.dataset.user_ids[ctx.index % len(ctx.dataset.user_ids)]
+    status, _ = ctx.client.request(
+        'POST', BOOKINGS_PATH, token=ctx.dataset.token(user_id), data={'class_id': ctx.state}
+    )
+    return (status,)
+
+
+def verify_rush_class(class_id, dataset):
+    fitness_class = FitnessClass.objects.get(pk=class_id)
+    booked = Booking.objects.filter(fitness_class_id=class_id).aggregate(slots=Sum('slots'))['slots'] or 0
+    return {
+        'capacity': fitness_class.total_slots,
+        'booked': booked,
+        'consistent': booked <= fitness_class.total_slots
+        and booked + fitness_class.available_slots == fitness_class.total_slots,
+    }
+
+
+def delete_rush_class(class_id, dataset):
+    FitnessClass.objects.filter(pk=class_id).delete()
+
+
+def seats_left(dataset, operations=None):
+    return FitnessClass.objects.filter(pk__in=dataset.class_ids).aggregate(
+        slots=Sum('available_slots')
+    )['slots'] or 0
+
+
+def book_and_cancel(ctx):
+    _, token = ctx.member()
+    status, booking = ctx.client.request(
+        'POST', BOOKINGS_PATH, token=token, data={'class_id': ctx.rng.choice(ctx.dataset.class_ids)}
+    )
+    if status != 201:
+        # Full, or already booked by this member.
+        return (status,)
+    cancelled, _ = ctx.client.request('DELETE', BOOKINGS_PATH, token=token, data={'id': booking['id']})
+    return (status, cancelled)
+
+
+def verify_churn(seats_before, dataset):
+    seats_after = seats_left(dataset)
+    return {'seats_before': seats_before, 'seats_after': seats_after, 'consistent': seats_before == seats_after}
+
+
+def read_history(ctx):
+    _, token = ctx.member()
+    status, _ = ctx.client.request('GET', BOOKINGS_PATH, token=token, params={'page_size': 20})
+    return (status,)
+
+
+def generate_plan(ctx):
+    """Queue a plan and poll its job until it finishes."""
+    _, token = ctx.member()
+    status, job = ctx.client.request('POST', PLANS_PATH, token=token, data={
+        'goal': ctx.rng.choice(['strength', 'weight loss', 'endurance', 'flexibility']),
+        'start_date': base_time().date().isoformat(),
+        'duration': ctx.rng.choice([7, 14]),
+        'daily_workout_hours': 1,
+        'budget': ctx.rng.choice([50, 100, 200]),
+        'fresh': True,
+    })
+    if status != 202:
+        return (status,)
+    statuses, status_url = [status], job['status_url']
+    deadline = time.monotonic() + PLAN_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(PLAN_POLL_INTERVAL)
+        status, job = ctx.client.request('GET', status_url, token=token)
+        statuses.append(status)
+        if status != 200 or job['status'] in ('succeeded', 'failed'):
+            break
+    statuses.append(job.get('status', 'unknown') if status == 200 else 'unknown')
+    return tuple(statuses)
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario(
+            'catalogue', "Anonymous catalogue browsing with mixed timezones, types and page sizes",
+            browse_catalogue, frozenset({200}),
+        ),
+        Scenario(
+            'booking_rush', "Every operation books one class that has seats for half of them",
+            book_rush_class, frozenset({201, 400}),
+            setup=create_rush_class, verify=verify_rush_class, teardown=delete_rush_class, warmup=False,
+        ),
+        Scenario(
+            'cancellation_churn', "Members book a random class and cancel straight away",
+            book_and_cancel, frozenset({201, 204, 400}),
+            setup=seats_left, verify=verify_churn, warmup=False,
+        ),
+        Scenario(
+            'history', "Members read the first page of their booking history",
+            read_history, frozenset({200}),
+        ),
+        Scenario(
+            'plan_generation', "Members queue a plan against the stub model and poll until it is done",
+            generate_plan, frozenset({200, 202, 'succeeded'}),
+        ),
+    ]
+}
@@ -0,0 +1,118 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from booking.models import Booking, FitnessClass
+from userprofile.models import UserProfile
+
+from . import dataset, runner
+from .compare import compare, regressions
+from .management.commands.run_benchmarks import benchmark_settings, reset_caches
+from .scenarios import SCENARIOS
+
+
+def result(throughput, p50, p95, p99, errors=0):
+    return {
+        'throughput_ops': throughput,
+        'latency_ms': {'p50': p50, 'p95': p95, 'p99': p99},
+        'errors': errors,
+    }
+
+
+class DatasetTests(TestCase):
+    """Tests for the seeded benchmark data."""
+
+    def _snapshot(self):
+        start = dataset.base_time()
+        classes = [
+            (c.name, c.date_time - start, c.instructor, c.total_slots, c.available_slots)
+            for c in FitnessClass.objects.order_by('id')
+        ]
+        bookings = sorted(
+            (b.fitness_class.date_time - start, b.user_details.user.username)
+            for b in Booking.objects.select_related('fitness_class', 'user_details__user')
+        )
+        return classes, bookings
+
+    def test_same_seed_same_studio(self):
+        """Test a seed always produces the same classes and bookings, and a new seed does not."""
+        data = dataset.seed(classes=20, users=30, bookings=100, seed=7)
+        first = self._snapshot()
+        dataset.seed(classes=20, users=30, bookings=100, seed=7)
+        self.assertEqual(self._snapshot(), first)
+        dataset.seed(classes=20, users=30, bookings=100, seed=8)
+        self.assertNotEqual(self._snapshot(), first)
+        self.assertEqual(data.describe(), {'seed': 7, 'classes': 20, 'users': 30, 'bookings': 100})
+
+    def test_capacity_respected(self):
+        """Test seeded bookings fit their classes and leave consistent seat counts."""
+        data = dataset.seed(classes=3, users=50, bookings=500, seed=1)
+        self.assertLess(data.bookings, 500)
+        for fitness_class in FitnessClass.objects.all():
+            booked = Booking.objects.filter(fitness_class=fitness_class).count()
+            self.assertEqual(booked + fitness_class.available_slots, fitness_class.total_slots)
+
+    def test_clear_leaves_other_rows(self):
+        """Test clearing removes only the benchmark rows."""
+        dataset.seed(classes=5, users=5, bookings=5)
+        other = FitnessClass.objects.create(
+            name='YOGA', date_time=dataset.base_time(), instructor='Jane Doe', total_slots=5, available_slots=5,
+            duration='60 min', Location='Studio A'
+        )
+        dataset.clear()
+        self.assertEqual(list(FitnessClass.objects.all()), [other])
+        self.assertFalse(UserProfile.objects.exists())
+
+
+class CompareTests(TestCase):
+    """Tests for flagging regressions between two runs."""
+
+    def test_regressions(self):
+        """Test slower throughput, higher tail latency and new errors are flagged, noise is not."""
+        base = {'scenarios': {
+            'catalogue': result(1000, 2.0, 5.0, 9.0),
+            'history': result(300, 20.0, 50.0, 80.0),
+        }}
+        head = {'scenarios': {
+            'catalogue': result(950, 2.5, 5.2, 9.1),
+            'history': result(200, 20.0, 70.0, 80.0, errors=2),
+        }}
+        found = {(change.scenario, change.metric) for change in regressions(compare(base, head))}
+        self.assertEqual(found, {('history', 'throughput_ops'), ('history', 'p95_ms'), ('history', 'errors')})
+
+    def test_percentile(self):
+        """Test percentiles use the nearest rank."""
+        values = list(range(1, 101))
+        self.assertEqual(runner.percentile(values, 50), 50)
+        self.assertEqual(runner.percentile(values, 99), 99)
+        self.assertEqual(runner.percentile([7], 95), 7)
+
+
+class ScenarioTests(TransactionTestCase):
+    """Tests for running every scenario in-process on a small studio."""
+
+    def setUp(self):
+        self.settings_override = override_settings(
+            **{**benchmark_settings(model_latency=0), 'PLAN_JOBS_EAGER': True}
+        )
+        self.settings_override.enable()
+        reset_caches()
+
+    def tearDown(self):
+        reset_caches()
+        self.settings_override.disable()
+
+    def test_all_scenarios(self):
+        """Test each scenario completes without errors and the rush class is not oversold."""
+        data = dataset.seed(classes=10, users=20, bookings=30)
+        report = runner.run(
+            SCENARIOS.values(), runner.InProcessTransport(), data, operations=12, concurrency=1, warmup=2
+        )
+        self.assertEqual(list(report['scenarios']), list(SCENARIOS))
+        for name, summary in report['scenarios'].items():
+            self.assertEqual(summary['errors'], 0, (name, summary))
+            self.assertEqual(summary['operations'], 12)
+            self.assertGreater(summary['throughput_ops'], 0)
+        rush = report['scenarios']['booking_rush']
+        self.assertEqual(rush['statuses'], {'201': 6, '400': 6})
+        self.assertEqual(rush['checks'], {'capacity': 6, 'booked': 6, 'consistent': True})
+        self.assertTrue(report['scenarios']['cancellation_churn']['checks']['consistent'])
+        self.assertEqual(report['meta']['transport'], 'in-process')
@@ -0,0 +1,15 @@
+"""
+URL configuration for booking app under ASGI, with the async views.
+"""
+from django.urls import path
+from .async_views import AsyncFitnessClassView, AsyncBookingView
+from .views import FitnessClassBulkView, ScheduleView, WaitlistView
+
+urlpatterns = [
+    path('classes/', AsyncFitnessClassView.as_view(), name='class-list'),
+    path('classes/<int:pk>/', AsyncFitnessClassView.as_view(), name='class-list'),
+    path('classes/bulk/', FitnessClassBulkView.as_view(), name='class-bulk'),
+    path('bookings/', AsyncBookingView.as_view(), name='booking-list'),
+    path('schedule/', ScheduleView.as_view(), name='schedule'),
+    path('waitlist/', WaitlistView.as_view(), name='waitlist'),
+]
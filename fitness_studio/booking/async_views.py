@@ -0,0 +1,118 @@
+"""
+Async versions of the catalogue and booking views for ASGI deployments.
+
+Reads go through Django's async ORM and the async catalogue cache, so a
+worker keeps serving other requests while one waits on the database.
+Writes need transactions and row locks, which the async ORM does not offer,
+so they run the sync views' handlers in a thread. Authentication,
+permissions and throttles are the sync views' own.
+"""
+from adrf.views import APIView
+from asgiref.sync import sync_to_async
+from rest_framework.response import Response
+from rest_framework import status
+from fitness_studio.db_router import replica_reads
+from . import catalogue
+from .pagination import PaginationError, apaginate, parse_list_params
+from .rendering import BOOKING_FIELDS, booking_key, class_key, sharded_class_ids
+from .reservations import shard_availability
+from .views import (
+    BookingView,
+    FitnessClassView,
+    bookings_data,
+    bookings_queryset,
+    catalogue_queryset,
+    catalogue_request,
+    render_catalogue,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AsyncFitnessClassView(APIView, FitnessClassView):
+    """``FitnessClassView`` with an async catalogue read."""
+
+    @replica_reads('catalogue')
+    async def get(self, request):
+        """Retrieve upcoming fitness classes with optional timezone filtering."""
+        try:
+            params, error = catalogue_request(request.query_params)
+            if error:
+                return error
+
+            cache_key = await catalogue.acatalogue_key(*params.key)
+            entry = await catalogue.aget_entry(cache_key)
+            if entry is None:
+                rows = catalogue_queryset(params)
+                if params.paginated:
+                    rows, next_cursor = await apaginate(
+                        rows, 'date_time', params.cursor, params.page_size, class_key
+                    )
+                else:
+                    rows, next_cursor = [row async for row in rows.order_by('date_time')], None
+                sharded = sharded_class_ids(rows, params.fields)
+                available = await sync_to_async(shard_availability)(sharded) if sharded else {}
+                entry = await catalogue.astore(
+                    cache_key,
+                    render_catalogue(params, rows, next_cursor, available),
+                    valid_until=class_key(rows[0])[0] if rows else None,
+                )
+                logger.info(f"Rendered {len(rows)} classes for timezone {params.timezone_name}")
+            return catalogue.respond(request, entry)
+
+        except Exception as e:
+            logger.error(f"Error retrieving classes: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    async def post(self, request):
+        """Create a new fitness class."""
+        return await sync_to_async(super().post)(request)
+
+    async def put(self, request, pk):
+        """Update an existing fitness class."""
+        return await sync_to_async(super().put)(request, pk)
+
+class AsyncBookingView(APIView, BookingView):
+    """``BookingView`` with an async booking list."""
+
+    @replica_reads()
+    async def get(self, request):
+        """Retrieve the bookings of the authenticated user."""
+        try:
+            try:
+                fields, paginated, cursor, page_size = parse_list_params(
+                    request.query_params, BOOKING_FIELDS
+                )
+            except PaginationError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            bookings = bookings_queryset(request.user, fields)
+            if not paginated:
+                bookings = [row async for row in bookings]
+                return Response(bookings_data(bookings, fields))
+
+            bookings, next_cursor = await apaginate(
+                bookings, 'fitness_class__date_time', cursor, page_size, booking_key
+            )
+            return Response({
+                'results': bookings_data(bookings, fields),
+                'next_cursor': next_cursor,
+            })
+
+        except Exception as e:
+            logger.error(f"Error retrieving bookings: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    async def post(self, request):
+        """Create a new booking for a fitness class."""
+        return await sync_to_async(super().post)(request)
+
+    async def delete(self, request):
+        """Cancel a booking."""
+        return await sync_to_async(super().delete)(request)
@@ -0,0 +1,258 @@
+"""
+Versioned cache of the rendered upcoming-class catalogue.
+
+Entries hold the JSON bytes exactly as ``FitnessClassView.get`` would return
+them, keyed by the catalogue version, the class type filter and the timezone.
+Any write that changes what the catalogue shows bumps the version, so stale
+entries are never served. Each lookup has an ``a``-prefixed twin used by
+the async views. The backend is selected with the
+``CATALOGUE_CACHE`` setting::
+
+    CATALOGUE_CACHE = {
+        'BACKEND': 'locmem',   # or 'django' to share entries between workers
+        'ALIAS': 'default',    # Django cache alias used by the 'django' backend
+        'TIMEOUT': 300,        # seconds an entry may be served
+        'MAX_ENTRIES': 512,    # locmem only
+    }
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from fitness_studio import db_router
+
+DEFAULTS = {
+    'BACKEND': 'locmem',
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'MAX_ENTRIES': 512,
+}
+
+_VERSION_KEY = 'booking:catalogue:version'
+
+
+@dataclass
+class CatalogueEntry:
+    """Rendered catalogue body with its validator and expiry."""
+
+    body: bytes
+    etag: str
+    valid_until: float
+
+    @property
+    def fresh(self):
+        return time.time() < self.valid_until
+
+
+class LocalMemoryBackend:
+    """Per-process LRU store; the version is local to the worker."""
+
+    def __init__(self, options):
+        self.max_entries = options['MAX_ENTRIES']
+        self._entries = OrderedDict()
+        self._version = 1
+        self._lock = threading.Lock()
+
+    def get_version(self):
+        return self._version
+
+    def bump_version(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, timeout):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # Nothing here blocks, so the async views call straight through.
+    async def aget_version(self):
+        return self.get_version()
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, entry, timeout):
+        self.set(key, entry, timeout)
+
+
+class DjangoCacheBackend:
+    """Stores entries and the version in a shared Django cache."""
+
+    def __init__(self, options):
+        self.cache = caches[options['ALIAS']]
+
+    def get_version(self):
+        version = self.cache.get(_VERSION_KEY)
+        if version is None:
+            self.cache.add(_VERSION_KEY, 1, None)
+            version = self.cache.get(_VERSION_KEY, 1)
+        return version
+
+    def bump_version(self):
+        try:
+            self.cache.incr(_VERSION_KEY)
+        except ValueError:
+            self.cache.add(_VERSION_KEY, 2, None)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, entry, timeout):
+        self.cache.set(key, entry, timeout)
+
+    async def aget_version(self):
+        version = await self.cache.aget(_VERSION_KEY)
+        if version is None:
+            await self.cache.aadd(_VERSION_KEY, 1, None)
+            version = await self.cache.aget(_VERSION_KEY, 1)
+        return version
+
+    async def aget(self, key):
+        return await self.cache.aget(key)
+
+    async def aset(self, key, entry, timeout):
+        await self.cache.aset(key, entry, timeout)
+
+
+BACKENDS = {
+    'locmem': LocalMemoryBackend,
+    'django': DjangoCacheBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_options():
+    return {**DEFAULTS, **getattr(settings, 'CATALOGUE_CACHE', {})}
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_catalogue_cache(app_configs, **kwargs):
+    """A write on one worker must retire the catalogue pages of all of them."""
+    options = get_options()
+    if options['BACKEND'] == 'locmem' or db_router.is_process_local(options['ALIAS']):
+        return [checks.Warning(
+            "The catalogue cache keeps its version in each process; with several workers, "
+            "the others keep serving the class list from before a write for up to CATALOGUE_CACHE['TIMEOUT'] seconds.",
+            hint="Set CATALOGUE_CACHE_BACKEND=django and CACHE_URL to a cache shared by all workers.",
+            id='booking.W001',
+        )]
+    return []
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                options = get_options()
+                _backend = BACKENDS[options['BACKEND']](options)
+    return _backend
+
+
+def reset_backend():
+    """Drop the configured backend so the next call re-reads settings."""
+    global _backend
+    _backend = None
+
+
+def bump_version():
+    """
+    Invalidate every cached catalogue page.
+
+    Catalogue reads also stay on the primary for a moment, so the next page
+    is not rendered from a replica that has yet to see the change.
+    """
+    get_backend().bump_version()
+    db_router.pin('catalogue')
+
+
+def _key(version, parts):
+    suffix = ':'.join('' if part is None else str(part) for part in parts)
+    return f"booking:catalogue:{version}:{suffix}"
+
+
+def catalogue_key(*parts):
+    """Build the cache key for the current version and the given filters."""
+    return _key(get_backend().get_version(), parts)
+
+
+async def acatalogue_key(*parts):
+    return _key(await get_backend().aget_version(), parts)
+
+
+def _fresh(entry):
+    if entry is not None and entry.fresh:
+        return entry
+    return None
+
+
+def get_entry(key):
+    return _fresh(get_backend().get(key))
+
+
+async def aget_entry(key):
+    return _fresh(await get_backend().aget(key))
+
+
+def store(key, body, valid_until=None):
+    """
+    Cache ``body`` under ``key`` and return the entry.
+
+    ``valid_until`` is the time the rendered list stops being correct on its
+    own, e.g. when the first listed class starts and must drop off.
+    """
+    entry = _entry(body, valid_until)
+    get_backend().set(key, entry, max(1, int(entry.valid_until - time.time())))
+    return entry
+
+
+async def astore(key, body, valid_until=None):
+    entry = _entry(body, valid_until)
+    await get_backend().aset(key, entry, max(1, int(entry.valid_until - time.time())))
+    return entry
+
+
+def _entry(body, valid_until):
+    timeout = get_options()['TIMEOUT']
+    expires = time.time() + timeout
+    if valid_until is not None:
+        expires = min(expires, valid_until.timestamp())
+    return CatalogueEntry(
+        body=body,
+        etag='"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest(),
+        valid_until=expires,
+    )
+
+
+def respond(request, entry):
+    """Serve ``entry``, answering a matching If-None-Match with 304."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and (
+        if_none_match.strip() == '*' or entry.etag in parse_etags(if_none_match)
+    ):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry.body, content_type='application/json')
+    response['ETag'] = entry.etag
+    return response
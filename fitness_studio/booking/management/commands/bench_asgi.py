@@ -0,0 +1,184 @@
+"""
+Load-test sync WSGI against async ASGI with slow AI calls among fast reads.
+
+Each mode is started as a gunicorn server from ``gunicorn.conf.py`` with
+the same worker count, ``StubClient`` standing in for the model, and
+throttles and the plan template cache out of the way. Virtual users then
+hammer it for a fixed time: most requests read the class catalogue, a
+share stream a generated plan. Requests per second and p50/p99 latency are
+reported per request kind.
+
+Pass ``--url`` to load an already running server instead.
+"""
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from booking.models import FitnessClass
+from userprofile.models import UserProfile
+from userprofile.serializers import RoleTokenObtainPairSerializer
+
+MODES = {'wsgi': 'False', 'asgi': 'True'}
+CLASSES_PATH = '/api/classes/'
+STREAM_PATH = '/api/ai-assistance/stream/'
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def request(host, port, method, path, token, body=None):
+    """Send one HTTP/1.1 request and read the whole response; returns the status code."""
+    reader, writer = await asyncio.open_connection(host, port)
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = (
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nAuthorization: Bearer {token}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n"
+    )
+    writer.write(head.encode() + payload)
+    await writer.drain()
+    status_line = await reader.readline()
+    while await reader.read(65536):
+        pass
+    writer.close()
+    return int(status_line.split()[1]) if status_line else 0
+
+
+async def virtual_user(host, port, token, deadline, ai_ratio, results):
+    plan = {
+        "goal": "strength", "start_date": "2030-01-01", "duration": 7,
+        "daily_workout_hours": 1, "budget": 100,
+    }
+    while time.monotonic() < deadline:
+        kind = 'ai' if random.random() < ai_ratio else 'catalogue'
+        started = time.monotonic()
+        try:
+            if kind == 'ai':
+                code = await request(host, port, 'POST', STREAM_PATH, token, plan)
+            else:
+                code = await request(host, port, 'GET', CLASSES_PATH, token)
+        except OSError:
+            code = 0
+        results.append((kind, time.monotonic() - started, code))
+
+
+async def run_load(url, token, seconds, concurrency, ai_ratio):
+    parts = urlsplit(url)
+    results = []
+    deadline = time.monotonic() + seconds
+    started = time.monotonic()
+    await asyncio.gather(*[
+        virtual_user(parts.hostname, parts.port or 80, token, deadline, ai_ratio, results)
+        for _ in range(concurrency)
+    ])
+    return results, time.monotonic() - started
+
+
+class Command(BaseCommand):
+    help = "Compare requests per second and p99 latency of sync WSGI and async ASGI under a mixed load."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=15, help="Load duration per mode")
+        parser.add_argument('--concurrency', type=int, default=64, help="Virtual users")
+        parser.add_argument('--ai-ratio', type=float, default=0.1, help="Share of requests that stream a plan")
+        parser.add_argument('--ai-latency', type=float, default=2.0, help="Stub model seconds per plan")
+        parser.add_argument('--workers', type=int, default=2, help="Gunicorn workers in both modes")
+        parser.add_argument('--port', type=int, default=8765, help="Port for the spawned servers")
+        parser.add_argument('--modes', default='wsgi,asgi', help="Comma-separated modes to run")
+        parser.add_argument('--url', help="Load this running server instead of spawning one")
+
+    def handle(self, *args, **options):
+        token = self.prepare()
+        if options['url']:
+            self.report(options['url'], *self.load(options['url'], token, options))
+            return
+        for mode in options['modes'].split(','):
+            if mode not in MODES:
+                raise CommandError(f"Unknown mode {mode!r}; choose from {', '.join(MODES)}")
+            server = self.spawn(mode, options)
+            try:
+                url = f"http://127.0.0.1:{options['port']}"
+                self.wait_until_ready(url, token, server)
+                self.report(mode, *self.load(url, token, options))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    def prepare(self):
+        """Make sure there is a member to load-test as and classes to list; return its token."""
+        user, created = User.objects.get_or_create(username='loadtest')
+        if created:
+            user.set_unusable_password()
+            user.save()
+        UserProfile.objects.get_or_create(user=user, defaults={'role': 'member'})
+        if not FitnessClass.objects.filter(date_time__gt=timezone.now()).exists():
+            start = timezone.now() + timedelta(days=1)
+            FitnessClass.objects.bulk_create([
+                FitnessClass(
+                    name='YOGA', date_time=start + timedelta(hours=i), instructor='Load Test',
+                    total_slots=20, available_slots=20, duration='60', Location='Studio',
+                )
+                for i in range(50)
+            ])
+        return str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+
+    def spawn(self, mode, options):
+        env = dict(
+            os.environ,
+            ASYNC_VIEWS=MODES[mode],
+            ALLOWED_HOSTS='127.0.0.1',
+            PORT=str(options['port']),
+            WEB_CONCURRENCY=str(options['workers']),
+            PLAN_MODEL_CLIENT='presionalized_assistance.llm.StubClient',
+            PLAN_MODEL_CLIENT_OPTIONS=json.dumps({'latency': options['ai_latency']}),
+            PLAN_CACHE_ENABLED='False',
+            THROTTLE_AI_GENERATION='1000000/s',
+            THROTTLE_CATALOGUE_READ='1000000/s',
+        )
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+
+    def wait_until_ready(self, url, token, server, attempts=100):
+        parts = urlsplit(url)
+        for _ in range(attempts):
+            if server.poll() is not None:
+                raise CommandError(f"Server exited with status {server.returncode}")
+            try:
+                if asyncio.run(request(parts.hostname, parts.port, 'GET', CLASSES_PATH, token)) == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f"Server at {url} did not come up")
+
+    def load(self, url, token, options):
+        return asyncio.run(run_load(url, token, options['seconds'], options['concurrency'], options['ai_ratio']))
+
+    def report(self, label, results, elapsed):
+        errors = sum(1 for _, _, code in results if code != 200)
+        self.stdout.write(
+            f"{label}: {len(results) / elapsed:.1f} req/s over {elapsed:.1f}s, "
+            f"{len(results)} requests, {errors} errors"
+        )
+        for kind in ('catalogue', 'ai'):
+            latencies = [latency for k, latency, _ in results if k == kind]
+            self.stdout.write(
+                f"  {kind:<9} {len(latencies):>6} requests  "
+                f"p50 {percentile(latencies, 0.5) * 1000:8.1f}ms  p99 {percentile(latencies, 0.99) * 1000:8.1f}ms"
+            )
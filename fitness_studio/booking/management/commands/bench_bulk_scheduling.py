@@ -0,0 +1,69 @@
+"""
+Benchmark class scheduling throughput: one POST per class versus the bulk endpoint.
+
+Runs inside a transaction that is rolled back, using an in-process trainer
+account, so no data is left behind.
+"""
+from datetime import timedelta
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from booking.views import FitnessClassView, FitnessClassBulkView
+from userprofile.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Compare classes/s for single POSTs against one bulk request."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=10000, help="Classes in the bulk request")
+        parser.add_argument(
+            '--single-sample', type=int, default=1000,
+            help="Classes created one POST at a time to estimate the single path"
+        )
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        with transaction.atomic():
+            trainer = User.objects.create_user(username='bench-trainer')
+            UserProfile.objects.create(user=trainer, role='trainer')
+            start = timezone.now() + timedelta(days=1)
+
+            def payload(index):
+                return {
+                    'name': 'YOGA',
+                    'date_time': (start + timedelta(minutes=index)).isoformat(),
+                    'instructor': 'Benchmark',
+                    'total_slots': 20,
+                    'duration': '60 min',
+                    'Location': 'Benchmark',
+                }
+
+            single_view = FitnessClassView.as_view()
+            started = time.perf_counter()
+            for index in range(options['single_sample']):
+                request = factory.post('/api/classes/', payload(index), format='json')
+                force_authenticate(request, user=trainer)
+                assert single_view(request).status_code == 201
+            single_rate = options['single_sample'] / (time.perf_counter() - started)
+
+            bulk_view = FitnessClassBulkView.as_view()
+            classes = [payload(options['single_sample'] + index) for index in range(options['classes'])]
+            request = factory.post('/api/classes/bulk/', {'classes': classes}, format='json')
+            force_authenticate(request, user=trainer)
+            started = time.perf_counter()
+            response = bulk_view(request)
+            bulk_elapsed = time.perf_counter() - started
+            assert response.status_code == 201, response.data
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"single POST: {single_rate:10,.0f} classes/s")
+        self.stdout.write(
+            f"bulk POST:   {options['classes'] / bulk_elapsed:10,.0f} classes/s "
+            f"({options['classes']:,} classes in {bulk_elapsed:.2f} s)"
+        )
@@ -0,0 +1,99 @@
+"""
+Benchmark class list latency as the table grows: full list versus keyset pages.
+
+Seeds classes inside a transaction that is rolled back at the end, so it can
+be pointed at a scratch copy of any database. The catalogue cache is
+invalidated before every request so each one measures the uncached path.
+"""
+from datetime import timedelta
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from booking import catalogue
+from booking.models import FitnessClass
+from booking.pagination import encode_cursor
+from booking.views import FitnessClassView
+
+
+class Command(BaseCommand):
+    help = "Compare full-list and keyset-paginated class list latency at growing table sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000,100000,1000000',
+            help="Comma separated table sizes to measure"
+        )
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5, help="Requests per measurement")
+        parser.add_argument(
+            '--full-list-limit', type=int, default=100000,
+            help="Skip the full-list measurement above this many rows"
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        self.view = FitnessClassView.as_view()
+        self.factory = RequestFactory()
+
+        with transaction.atomic():
+            seeded = 0
+            for size in sizes:
+                self._seed(seeded, size)
+                seeded = size
+                deep_cursor = self._deep_cursor(options['page_size'])
+                row = {
+                    'first page': self._measure({'page_size': options['page_size']}, options['repeat']),
+                    'deep page': self._measure(
+                        {'page_size': options['page_size'], 'cursor': deep_cursor}, options['repeat']
+                    ),
+                }
+                if size <= options['full_list_limit']:
+                    row['full list'] = self._measure({}, options['repeat'])
+                self.stdout.write(
+                    f"{size:>9,} classes: " + ", ".join(
+                        f"{label} {latency * 1000:8.2f} ms" for label, latency in row.items()
+                    )
+                )
+            transaction.set_rollback(True)
+
+    def _seed(self, start, stop):
+        base = timezone.now() + timedelta(days=1)
+        FitnessClass.objects.bulk_create(
+            (
+                FitnessClass(
+                    name=('YOGA', 'ZUMBA', 'HIIT')[index % 3],
+                    date_time=base + timedelta(minutes=index),
+                    instructor='Benchmark',
+                    total_slots=20,
+                    available_slots=20,
+                    duration='60 min',
+                    Location='Benchmark'
+                )
+                for index in range(start, stop)
+            ),
+            batch_size=5000,
+        )
+
+    def _deep_cursor(self, page_size):
+        """Cursor pointing at the middle of the table."""
+        count = FitnessClass.objects.count()
+        middle = FitnessClass.objects.order_by('date_time', 'id').values_list(
+            'date_time', 'id'
+        )[max(0, count // 2 - page_size)]
+        return encode_cursor(*middle)
+
+    def _measure(self, params, repeat):
+        timings = []
+        for _ in range(repeat):
+            catalogue.bump_version()
+            request = self.factory.get('/api/classes/', params)
+            started = time.perf_counter()
+            response = self.view(request)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.content
+        return statistics.median(timings)
@@ -0,0 +1,100 @@
+"""
+Benchmark connection acquisition under concurrent load.
+
+Parallel clients replay a request's database lifecycle: take a connection,
+run a small query and finish the request the way Django's
+``close_old_connections`` does. Three setups of the ``default`` database are
+compared:
+
+- ``unpooled``: ``CONN_MAX_AGE = 0``, a fresh connection per request;
+- ``persistent``: ``CONN_MAX_AGE = 600`` with health checks, one connection
+  per thread that is pinged at the start of each request;
+- ``pooled``: a psycopg pool of ``--max-size`` connections shared by all
+  clients, each checked before it is lent out.
+
+Needs DATABASE_URL pointing at Postgres. Besides latency, the number of
+server connections each setup opened is reported; with more clients than
+pool slots, the pool's waiting time shows up in its acquisition latency.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+
+class Command(BaseCommand):
+    help = "Compare connection acquisition latency: unpooled, persistent and pooled connections."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32, help="Parallel clients")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per client")
+        parser.add_argument('--min-size', type=int, default=4, help="Pool minimum size")
+        parser.add_argument('--max-size', type=int, default=16, help="Pool maximum size")
+
+    def handle(self, *args, **options):
+        base = connections['default'].settings_dict
+        if base['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError("bench_db_pool needs DATABASE_URL pointing at Postgres")
+
+        setups = {
+            'unpooled': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+            'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+            'pooled': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'pool': {
+                'min_size': options['min_size'],
+                'max_size': options['max_size'],
+            }},
+        }
+        for name, setup in setups.items():
+            latencies, opened, elapsed = self._run(name, base, setup, options['clients'], options['requests'])
+            latencies.sort()
+            self.stdout.write(
+                f"{name:>10}: {len(latencies) / elapsed:8,.0f} req/s"
+                f"  acquire p50 {latencies[len(latencies) // 2] * 1000:7.2f}ms"
+                f"  p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.2f}ms"
+                f"  mean {statistics.fmean(latencies) * 1000:7.2f}ms"
+                f"  connections opened {opened}"
+            )
+
+    def _run(self, name, base, setup, clients, requests):
+        settings_dict = {**base, 'OPTIONS': {**base.get('OPTIONS', {})}}
+        pool_options = setup.pop('pool', None)
+        settings_dict.update(setup)
+        if pool_options:
+            settings_dict['OPTIONS']['pool'] = pool_options
+        alias = f"bench_{name}"
+        backend = load_backend(settings_dict['ENGINE'])
+
+        def client(_):
+            wrapper = backend.DatabaseWrapper(settings_dict, alias)
+            latencies, opened = [], 0
+            try:
+                for _ in range(requests):
+                    wrapper.close_if_unusable_or_obsolete()  # request_started
+                    started = time.perf_counter()
+                    opened += wrapper.connection is None
+                    wrapper.ensure_connection()
+                    latencies.append(time.perf_counter() - started)
+                    with wrapper.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                        cursor.fetchone()
+                    wrapper.close_if_unusable_or_obsolete()  # request_finished
+            finally:
+                wrapper.close()
+            return latencies, opened
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            results = list(executor.map(client, range(clients)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+        opened = sum(client_opened for _, client_opened in results)
+        if pool_options:
+            # Clients count pool checkouts; the pool knows how many server connections it made.
+            pool_wrapper = backend.DatabaseWrapper(settings_dict, alias)
+            opened = pool_wrapper.pool.get_stats().get('connections_num', 0)
+            pool_wrapper.close_pool()
+        return latencies, opened, elapsed
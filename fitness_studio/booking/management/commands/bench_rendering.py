@@ -0,0 +1,119 @@
+"""
+Benchmark rendering long class and booking lists: serializers versus rows.
+
+Seeds ``--rows`` classes, and one booking of a single member per class,
+inside a transaction that is rolled back at the end. Each list is rendered
+both ways, model instances through ``FitnessClassSerializer`` or
+``BookingSerializer`` and ``JSONRenderer``, and ``values_list`` rows through
+``booking.rendering``. Both the render step alone and the query plus render
+are timed, and the two outputs are checked to be the same bytes. The class
+list is also rendered in ``--timezone``, as the catalogue does for clients
+asking for a zone.
+"""
+from datetime import timedelta
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from booking import rendering
+from booking.models import Booking, FitnessClass
+from booking.serializers import BookingSerializer, FitnessClassSerializer
+from booking.timezones import get_zone
+from userprofile.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Compare serializer and row rendering of long class and booking lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Classes and bookings to render")
+        parser.add_argument('--repeat', type=int, default=5, help="Renders per measurement")
+        parser.add_argument('--timezone', default='Europe/London', help="Zone to render class times in")
+
+    def handle(self, *args, **options):
+        zone = get_zone(options['timezone'])
+        with transaction.atomic():
+            member = self._seed(options['rows'])
+            classes = FitnessClass.objects.order_by('date_time')
+            bookings = Booking.objects.filter(user_details__user=member).order_by('id')
+            lists = {
+                'classes': (
+                    lambda: list(classes),
+                    lambda instances: JSONRenderer().render(FitnessClassSerializer(instances, many=True).data),
+                    lambda: list(classes.values_list(*rendering.class_columns())),
+                    lambda rows: rendering.dumps(rendering.class_data(rows)),
+                ),
+                'classes in zone': (
+                    lambda: list(classes),
+                    lambda instances: self._in_zone(zone, instances),
+                    lambda: list(classes.values_list(*rendering.class_columns())),
+                    lambda rows: rendering.dumps(rendering.class_data(rows, zone=zone)),
+                ),
+                'bookings': (
+                    lambda: list(bookings.select_related('fitness_class')),
+                    lambda instances: JSONRenderer().render(BookingSerializer(instances, many=True).data),
+                    lambda: list(bookings.values_list(*rendering.booking_columns())),
+                    lambda rows: rendering.dumps(rendering.booking_data(rows)),
+                ),
+            }
+            for name, (load_instances, serialize, load_rows, render) in lists.items():
+                if serialize(load_instances()) != render(load_rows()):
+                    raise CommandError(f"Row rendering of {name} differs from the serializer output")
+                self._report(name, 'render', options['repeat'], load_instances, serialize, load_rows, render)
+                self._report(
+                    name, 'query + render', options['repeat'],
+                    lambda: None, lambda _: serialize(load_instances()),
+                    lambda: None, lambda _: render(load_rows()),
+                )
+            transaction.set_rollback(True)
+
+    def _in_zone(self, zone, instances):
+        with timezone.override(zone):
+            return JSONRenderer().render(FitnessClassSerializer(instances, many=True).data)
+
+    def _seed(self, count):
+        start = timezone.now() + timedelta(days=1)
+        fitness_classes = FitnessClass.objects.bulk_create(
+            (
+                FitnessClass(
+                    name=('YOGA', 'ZUMBA', 'HIIT')[index % 3],
+                    date_time=start + timedelta(minutes=15 * index),
+                    instructor=f"Instructor {index % 40}",
+                    total_slots=20,
+                    available_slots=19,
+                    duration='60 min',
+                    Location=f"Studio {'ABC'[index % 3]}",
+                )
+                for index in range(count)
+            ),
+            batch_size=5000,
+        )
+        user = User.objects.create_user(username='bench-rendering', password='unused')
+        profile = UserProfile.objects.create(user=user)
+        Booking.objects.bulk_create(
+            (Booking(fitness_class=fitness_class, user_details=profile) for fitness_class in fitness_classes),
+            batch_size=5000,
+        )
+        return user
+
+    def _report(self, name, step, repeat, load_instances, serialize, load_rows, render):
+        serializer = self._measure(load_instances, serialize, repeat)
+        rows = self._measure(load_rows, render, repeat)
+        self.stdout.write(
+            f"{name:>15} {step:>15}: serializer {serializer * 1000:9.2f} ms"
+            f"  rows {rows * 1000:8.2f} ms  speedup {serializer / rows:5.1f}x"
+        )
+
+    def _measure(self, load, render, repeat):
+        timings = []
+        for _ in range(repeat):
+            data = load()
+            started = time.perf_counter()
+            render(data)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
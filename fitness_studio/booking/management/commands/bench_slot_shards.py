@@ -0,0 +1,71 @@
+"""
+Benchmark booking throughput for one hot class, single row versus slot shards.
+
+Creates a throwaway class in the configured database, lets parallel clients
+book it until it sells out, and deletes it again. Point DATABASE_URL at a
+scratch Postgres database for meaningful numbers; SQLite serialises writers.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.utils import timezone
+
+from booking.models import FitnessClass
+from booking.reservations import reserve_slots, configure_slot_shards
+
+
+class Command(BaseCommand):
+    help = "Compare bookings per second on a single slot row against K slot shards."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', type=int, default=8, help="Shard count to compare against")
+        parser.add_argument('--clients', type=int, default=16, help="Parallel booking clients")
+        parser.add_argument('--bookings', type=int, default=2000, help="Seats in the benchmark class")
+
+    def handle(self, *args, **options):
+        for shard_count in (0, options['shards']):
+            rate = self._run(shard_count, options['clients'], options['bookings'])
+            label = "single row" if not shard_count else f"{shard_count} shards"
+            self.stdout.write(f"{label:>12}: {rate:,.1f} bookings/s")
+
+    def _run(self, shard_count, clients, bookings):
+        fitness_class = FitnessClass.objects.create(
+            name='HIIT',
+            date_time=timezone.now() + timedelta(days=1),
+            instructor='Benchmark',
+            total_slots=bookings,
+            available_slots=bookings,
+            duration='45 min',
+            Location='Benchmark'
+        )
+        if shard_count:
+            configure_slot_shards(fitness_class, shard_count)
+
+        def client(_):
+            booked = 0
+            try:
+                while True:
+                    try:
+                        result = reserve_slots(fitness_class)
+                    except OperationalError:
+                        continue
+                    if not result.success:
+                        return booked
+                    booked += 1
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                booked = sum(pool.map(client, range(clients)))
+            elapsed = time.perf_counter() - started
+        finally:
+            fitness_class.delete()
+
+        if booked != bookings:
+            self.stderr.write(f"Expected {bookings} bookings, got {booked}")
+        return booked / elapsed
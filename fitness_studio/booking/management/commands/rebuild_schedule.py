@@ -0,0 +1,34 @@
+"""
+Reconcile the schedule projection with ``Booking``::
+
+    python manage.py rebuild_schedule            # fix any drift
+    python manage.py rebuild_schedule --check    # only report it, failing if there is any
+
+Entries and per-type counts are recomputed from the bookings of each member
+and compared with what the projection holds; missing rows are created,
+stale ones updated and orphaned ones deleted. Run it after loading bookings
+with ``bulk_create`` or raw SQL, or from cron as a consistency check.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from booking import schedule
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-member schedule projection from bookings, or check it with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Report drift without fixing it; exit non-zero if any")
+        parser.add_argument('--batch-size', type=int, default=500, help="Members reconciled per transaction")
+
+    def handle(self, *args, **options):
+        entries, summaries = schedule.rebuild(apply=not options['check'], batch_size=options['batch_size'])
+        verb = "differ" if options['check'] else "fixed"
+        for name, result in (('entries', entries), ('summaries', summaries)):
+            self.stdout.write(
+                f"{name:>9} {verb}: {result.created} missing, {result.updated} stale, {result.deleted} orphaned"
+            )
+        drift = entries.changed + summaries.changed
+        if options['check'] and drift:
+            raise CommandError(f"Schedule projection is out of date in {drift} row(s); run rebuild_schedule")
+        self.stdout.write("Schedule projection is consistent" if not drift else "Schedule projection rebuilt")
@@ -0,0 +1,48 @@
+"""
+Copy the primary SQLite database onto the replica file, standing in for replication.
+
+For trying read-replica routing locally with two SQLite files::
+
+    export DATABASE_URL=sqlite:///primary.sqlite3 DATABASE_REPLICA_URL=sqlite:///replica.sqlite3
+    python manage.py migrate
+    python manage.py sync_replica --interval 2
+
+The copy is made with SQLite's online backup into the existing file, so
+open replica connections see the new rows. Between copies the replica lags,
+and reads fall back to the primary once it is behind by ``REPLICA_MAX_LAG``.
+"""
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from fitness_studio.db_router import REPLICA
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database to the SQLite replica, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help="Repeat every N seconds (0 copies once)")
+
+    def handle(self, *args, **options):
+        primary, replica = connections['default'], connections[REPLICA]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("sync_replica only copies between SQLite databases")
+        primary_name, replica_name = primary.settings_dict['NAME'], replica.settings_dict['NAME']
+        if str(primary_name) == str(replica_name):
+            raise CommandError("Set DATABASE_REPLICA_URL to a different SQLite file than DATABASE_URL")
+
+        while True:
+            started = time.perf_counter()
+            source, target = sqlite3.connect(primary_name), sqlite3.connect(replica_name)
+            try:
+                source.backup(target)
+            finally:
+                source.close()
+                target.close()
+            self.stdout.write(f"Copied {primary_name} to {replica_name} in {time.perf_counter() - started:.3f}s")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -22,9 +22,25 @@ class FitnessClass(models.Model):
     available_slots = models.PositiveIntegerField()
     duration=models.CharField(max_length=50, null=True)
     Location=models.CharField(max_length=200,null=True)
+    slot_shard_count = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Number of ClassSlotShard rows holding capacity; 0 keeps it on this row"
+    )
+    waitlist_issued = models.PositiveIntegerField(
+        default=0,
+        help_text="Sequence number of the most recent waitlist entry"
+    )
+    waitlist_served = models.PositiveIntegerField(
+        default=0,
+        help_text="Sequence number of the most recently promoted waitlist entry"
+    )
 
     class Meta:
         ordering = ['date_time']
+        indexes = [
+            models.Index(fields=['date_time', 'id'], name='fitnessclass_keyset_idx'),
+            models.Index(fields=['name', 'date_time', 'id'], name='fitnessclass_type_keyset_idx'),
+        ]
         verbose_name = 'Fitness Class'
         verbose_name_plural = 'Fitness Classes'
 
@@ -45,6 +61,25 @@ class FitnessClass(models.Model):
     def __str__(self):
         return f"{self.get_name_display()} with {self.instructor} at {self.date_time}"
 
+class ClassSlotShard(models.Model):
+    """Slice of a class's capacity, used to spread booking writes over several rows."""
+
+    fitness_class = models.ForeignKey(
+        FitnessClass,
+        on_delete=models.CASCADE,
+        related_name='slot_shards'
+    )
+    index = models.PositiveSmallIntegerField()
+    available_slots = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['fitness_class', 'index']
+        verbose_name = 'Class Slot Shard'
+        verbose_name_plural = 'Class Slot Shards'
+
+    def __str__(self):
+        return f"Shard {self.index} of {self.fitness_class_id}: {self.available_slots} slots"
+
 class Booking(models.Model):
     """Model representing a booking for a fitness class."""
     
@@ -61,9 +96,17 @@ class Booking(models.Model):
         blank=True
     )
     booking_time = models.DateTimeField(default=timezone.now)
+    slots = models.PositiveIntegerField(default=1)
 
     class Meta:
         unique_together = ['fitness_class', 'user_details']
+        indexes = [
+            models.Index(
+                fields=['user_details', 'fitness_class'],
+                condition=models.Q(user_details__isnull=False),
+                name='booking_member_class_idx',
+            ),
+        ]
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
 
@@ -77,4 +120,129 @@ class Booking(models.Model):
             raise ValidationError("Cannot book after class start time")
 
     def __str__(self):
-        return f"{self.user_details} booked {self.fitness_class}"
\ No newline at end of file
+        return f"{self.user_details} booked {self.fitness_class}"
+
+class WaitlistEntry(models.Model):
+    """Member queued for a full class, promoted to a booking in FIFO order."""
+
+    WAITING = 'waiting'
+    PROMOTED = 'promoted'
+    WITHDRAWN = 'withdrawn'
+    STATUSES = [
+        (WAITING, 'Waiting'),
+        (PROMOTED, 'Promoted'),
+        (WITHDRAWN, 'Withdrawn'),
+    ]
+
+    fitness_class = models.ForeignKey(
+        FitnessClass,
+        on_delete=models.CASCADE,
+        related_name='waitlist'
+    )
+    user_details = models.ForeignKey(
+        'userprofile.UserProfile',
+        on_delete=models.CASCADE,
+        related_name='waitlist_entries'
+    )
+    slots = models.PositiveIntegerField(default=1)
+    sequence = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=WAITING)
+    booking = models.OneToOneField(
+        Booking,
+        on_delete=models.SET_NULL,
+        related_name='waitlist_entry',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['fitness_class', 'sequence']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fitness_class', 'user_details'],
+                condition=models.Q(status='waiting'),
+                name='waitlist_one_waiting_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['fitness_class', 'sequence'],
+                condition=models.Q(status='waiting'),
+                name='waitlist_queue_idx',
+            ),
+        ]
+        verbose_name = 'Waitlist Entry'
+        verbose_name_plural = 'Waitlist Entries'
+
+    @property
+    def position(self):
+        """Queue tickets ahead of and including this one; 0 once it has left the queue."""
+        if self.status != self.WAITING:
+            return 0
+        return self.sequence - self.fitness_class.waitlist_served
+
+    def __str__(self):
+        return f"{self.user_details} waiting #{self.sequence} for {self.fitness_class}"
+
+class ScheduleEntry(models.Model):
+    """
+    Booking copied with its class details, so a member's schedule reads no history.
+
+    An entry outlives its booking or class until the post-commit refresh
+    removes it, which is when the member's summary is decremented.
+    """
+
+    booking = models.OneToOneField(
+        Booking,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        primary_key=True,
+        related_name='schedule_entry'
+    )
+    user_details = models.ForeignKey(
+        'userprofile.UserProfile',
+        on_delete=models.CASCADE,
+        related_name='schedule_entries'
+    )
+    fitness_class = models.ForeignKey(
+        FitnessClass,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='schedule_entries'
+    )
+    class_type = models.CharField(max_length=100)
+    date_time = models.DateTimeField()
+    instructor = models.CharField(max_length=100)
+    duration = models.CharField(max_length=50, null=True)
+    Location = models.CharField(max_length=200, null=True)
+    slots = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_details', 'date_time'], name='schedule_member_time_idx'),
+        ]
+        verbose_name = 'Schedule Entry'
+        verbose_name_plural = 'Schedule Entries'
+
+    def __str__(self):
+        return f"{self.user_details} at {self.class_type} on {self.date_time}"
+
+class BookingSummary(models.Model):
+    """Number of bookings a member holds for one class type."""
+
+    user_details = models.ForeignKey(
+        'userprofile.UserProfile',
+        on_delete=models.CASCADE,
+        related_name='booking_summaries'
+    )
+    class_type = models.CharField(max_length=100)
+    booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user_details', 'class_type']
+        verbose_name = 'Booking Summary'
+        verbose_name_plural = 'Booking Summaries'
+
+    def __str__(self):
+        return f"{self.user_details}: {self.booked} {self.class_type}"
@@ -0,0 +1,195 @@
+"""
+Read-path rendering of the class and booking lists.
+
+``FitnessClassSerializer`` and ``BookingSerializer`` build a field tree per
+response and resolve every value through a model instance, which dominates
+the response time of long lists. The functions here render the same data
+from ``values_list`` rows instead: choice labels come from a map built once,
+each distinct datetime is formatted once, and ``dumps`` encodes with orjson.
+
+The output is the serializers' output, byte for byte once encoded; the
+tests compare both for every field projection. A field added to either
+serializer has to be added here as well.
+"""
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+from operator import itemgetter
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import ISO_8601, api_settings
+from rest_framework.utils.encoders import JSONEncoder
+import orjson
+
+from .models import FitnessClass
+from .reservations import shard_availability
+from .timezones import ZoneSegments
+
+# Rendered fields, in serializer order, and the column each is read from.
+CLASS_FIELDS = (
+    'id', 'name', 'class_type', 'date_time', 'instructor', 'duration', 'Location', 'total_slots', 'available_slots',
+)
+CLASS_SOURCES = {name: name for name in CLASS_FIELDS}
+CLASS_SOURCES['class_type'] = 'name'
+BOOKING_FIELDS = ('id', 'class_id', 'fitness_class_details', 'booking_time')
+BOOKING_SOURCES = {'id': 'id', 'class_id': 'fitness_class', 'booking_time': 'booking_time'}
+
+# Every row starts with these columns, whatever the projection.
+CLASS_REQUIRED_COLUMNS = ('id', 'date_time', 'slot_shard_count')
+BOOKING_REQUIRED_COLUMNS = ('id', 'fitness_class', 'fitness_class__date_time')
+
+# ``(date_time, id)`` of a row, the keyset its list is paginated on.
+class_key = itemgetter(1, 0)
+booking_key = itemgetter(2, 0)
+
+CLASS_TYPE_LABELS = {value: str(label) for value, label in FitnessClass._meta.get_field('name').flatchoices}
+
+
+def _selected(names, fields):
+    return names if fields is None else [name for name in names if name in fields]
+
+
+def _columns(required, sources):
+    columns = list(required)
+    for column in sources:
+        if column not in columns:
+            columns.append(column)
+    return columns
+
+
+def class_columns(fields=None):
+    """Columns to load with ``values_list`` to render ``fields`` of a class."""
+    return _columns(CLASS_REQUIRED_COLUMNS, (CLASS_SOURCES[name] for name in _selected(CLASS_FIELDS, fields)))
+
+
+def booking_columns(fields=None):
+    """Columns to load with ``values_list`` to render ``fields`` of a booking."""
+    sources = []
+    for name in _selected(BOOKING_FIELDS, fields):
+        if name == 'fitness_class_details':
+            sources.extend(f'fitness_class__{column}' for column in class_columns())
+        else:
+            sources.append(BOOKING_SOURCES[name])
+    return _columns(BOOKING_REQUIRED_COLUMNS, sources)
+
+
+def _format(value, output_format):
+    if output_format.lower() == ISO_8601:
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return value.strftime(output_format)
+
+
+@lru_cache(maxsize=4096)
+def _format_datetime(value, field_timezone, output_format):
+    if field_timezone is not None:
+        value = value.astimezone(field_timezone) if timezone.is_aware(value) else timezone.make_aware(
+            value, field_timezone
+        )
+    elif timezone.is_aware(value):
+        value = timezone.make_naive(value, dt_timezone.utc)
+    return _format(value, output_format)
+
+
+@lru_cache(maxsize=4096)
+def _format_fixed(value, offset, name, output_format):
+    # Keyed on the name as well: fixed-offset zones compare equal by offset alone.
+    return _format(value.astimezone(dt_timezone(offset, name)), output_format)
+
+
+def datetime_formatter(zone=None, values=()):
+    """
+    Format datetimes as ``DateTimeField`` does, with ``DATETIME_FORMAT``.
+
+    Times are shown in the current time zone, or in ``zone`` when given; then
+    ``values`` must hold every aware datetime that will be formatted, so their
+    offsets are resolved once per DST segment.
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    if output_format is None:
+        # The serializers pass datetimes through and leave them to the encoder.
+        return lambda value: JSONEncoder().default(value) if value else None
+    if zone is not None and settings.USE_TZ:
+        segments = ZoneSegments(zone, values)
+        return lambda value: _format_fixed(value, *segments.offset(value), output_format) if value else None
+    field_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+    return lambda value: _format_datetime(value, field_timezone, output_format) if value else None
+
+
+def _getter(index, convert=None):
+    if convert is None:
+        return itemgetter(index)
+    return lambda row: convert(row[index])
+
+
+def _class_plan(fields, columns, format_datetime, prefix=''):
+    """``(field, getter)`` pairs rendering one class from a row holding ``columns``."""
+    plan = []
+    for name in _selected(CLASS_FIELDS, fields):
+        index = columns.index(prefix + CLASS_SOURCES[name])
+        if name == 'class_type':
+            plan.append((name, _getter(index, lambda value: CLASS_TYPE_LABELS.get(value, value))))
+        elif name == 'date_time':
+            plan.append((name, _getter(index, format_datetime)))
+        else:
+            plan.append((name, _getter(index)))
+    return plan
+
+
+def _render(rows, plan):
+    return [{name: get(row) for name, get in plan} for row in rows]
+
+
+def sharded_class_ids(rows, fields=None):
+    """Ids of the sharded classes among ``rows``, if ``fields`` shows their availability."""
+    if fields is not None and 'available_slots' not in fields:
+        return []
+    return [row[0] for row in rows if row[2]]
+
+
+def class_availability(rows, fields=None):
+    """Return ``{class_id: available_slots}`` for the sharded classes among ``rows``."""
+    sharded = sharded_class_ids(rows, fields)
+    return shard_availability(sharded) if sharded else {}
+
+
+def class_data(rows, fields=None, available=None, zone=None):
+    """
+    Render ``class_columns(fields)`` rows as ``FitnessClassSerializer(many=True)`` would.
+
+    ``available`` overrides ``available_slots`` of sharded classes, as
+    ``apply_shard_availability`` does for model instances. ``date_time`` is
+    shown in ``zone`` if given, as the serializer does with that zone active.
+    """
+    format_datetime = datetime_formatter(zone, [row[1] for row in rows] if zone is not None else ())
+    data = _render(rows, _class_plan(fields, class_columns(fields), format_datetime))
+    if available:
+        for row, item in zip(rows, data):
+            if row[0] in available:
+                item['available_slots'] = available[row[0]]
+    return data
+
+
+def booking_data(rows, fields=None):
+    """Render ``booking_columns(fields)`` rows as ``BookingSerializer(many=True)`` would."""
+    columns = booking_columns(fields)
+    format_datetime = datetime_formatter()
+    plan = []
+    for name in _selected(BOOKING_FIELDS, fields):
+        if name == 'fitness_class_details':
+            details = _class_plan(None, columns, format_datetime, prefix='fitness_class__')
+            plan.append((name, lambda row: {field: get(row) for field, get in details}))
+        elif name == 'booking_time':
+            plan.append((name, _getter(columns.index('booking_time'), format_datetime)))
+        else:
+            plan.append((name, _getter(columns.index(BOOKING_SOURCES[name]))))
+    return _render(rows, plan)
+
+
+def dumps(data):
+    """Encode ``data`` to the bytes ``JSONRenderer().render(data)`` returns."""
+    if not (api_settings.COMPACT_JSON and api_settings.UNICODE_JSON):
+        return JSONRenderer().render(data)
+    # JSONRenderer escapes these two so the output stays a JavaScript subset.
+    return orjson.dumps(data).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
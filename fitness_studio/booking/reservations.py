@@ -0,0 +1,285 @@
+"""
+Atomic slot reservation for fitness classes.
+
+Slots are claimed with a single conditional UPDATE so concurrent bookings can
+never oversell a class, and the booking row is written in the same short
+transaction. Model-level ``full_clean`` is deliberately bypassed here: the
+WHERE clause of the UPDATE enforces the invariants that matter at write time.
+
+Hot classes can optionally spread their capacity over ``ClassSlotShard`` rows
+so parallel bookings do not all queue on the same row lock. For those classes
+``FitnessClass.available_slots`` is not maintained on every booking; read the
+derived value through ``shard_availability``.
+"""
+from dataclasses import dataclass
+from typing import Optional
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from . import catalogue
+from .models import FitnessClass, ClassSlotShard, Booking
+
+RESERVED = 'reserved'
+SOLD_OUT = 'sold_out'
+CLASS_STARTED = 'class_started'
+CLASS_NOT_FOUND = 'class_not_found'
+DUPLICATE = 'duplicate'
+
+_SHARD_CACHE_KEY = 'booking:slot-shards:{}'
+
+FAILURE_MESSAGES = {
+    SOLD_OUT: "Requested slots exceed available slots",
+    CLASS_STARTED: "Cannot book a class that has already occurred",
+    CLASS_NOT_FOUND: "Class not found",
+    DUPLICATE: "This user has already booked this class",
+}
+
+
+@dataclass
+class ReservationResult:
+    """Outcome of a reservation attempt."""
+
+    status: str
+    booking: Optional[Booking] = None
+
+    @property
+    def success(self):
+        return self.status == RESERVED
+
+    @property
+    def message(self):
+        return FAILURE_MESSAGES.get(self.status, '')
+
+
+def _failure_reason(fitness_class_id, now):
+    """Explain why the conditional UPDATE matched no row (failure path only)."""
+    date_time = FitnessClass.objects.filter(pk=fitness_class_id).values_list(
+        'date_time', flat=True
+    ).first()
+    if date_time is None:
+        return CLASS_NOT_FOUND
+    if date_time <= now:
+        return CLASS_STARTED
+    return SOLD_OUT
+
+
+def _claim_class_row(fitness_class_id, slots, now):
+    """Decrement the slot counter held on the class row itself, unless the class is sharded."""
+    return FitnessClass.objects.filter(
+        pk=fitness_class_id,
+        date_time__gt=now,
+        slot_shard_count=0,
+        available_slots__gte=slots,
+    ).update(available_slots=F('available_slots') - slots)
+
+
+def _claim_shard(fitness_class_id, shard_count, slots):
+    """
+    Decrement one shard that still holds ``slots`` seats.
+
+    Shards are tried in random order so parallel bookings spread their row
+    locks; the claim is never split across shards, so a class whose remaining
+    seats are fragmented can reject a multi-slot request early.
+    """
+    for index in random.sample(range(shard_count), shard_count):
+        if ClassSlotShard.objects.filter(
+            fitness_class_id=fitness_class_id,
+            index=index,
+            available_slots__gte=slots,
+        ).update(available_slots=F('available_slots') - slots):
+            return True
+    return False
+
+
+def _claim(fitness_class, shard_count, slots, now):
+    if shard_count:
+        return fitness_class.date_time > now and _claim_shard(fitness_class.pk, shard_count, slots)
+    return _claim_class_row(fitness_class.pk, slots, now)
+
+
+def _shard_count(fitness_class_id):
+    return FitnessClass.objects.filter(pk=fitness_class_id).values_list(
+        'slot_shard_count', flat=True
+    ).first() or 0
+
+
+def _unheld_slots(fitness_class_id, total_slots):
+    """Seats of a sharded class that are neither booked nor held by a shard."""
+    booked = Booking.objects.filter(fitness_class_id=fitness_class_id).aggregate(
+        booked=Coalesce(Sum('slots'), 0)
+    )['booked']
+    held = ClassSlotShard.objects.filter(fitness_class_id=fitness_class_id).aggregate(
+        held=Coalesce(Sum('available_slots'), 0)
+    )['held']
+    return total_slots - booked - held
+
+
+def reserve_slots(fitness_class, user_profile=None, slots=1, booking_time=None):
+    """
+    Claim ``slots`` seats in ``fitness_class`` and create the booking.
+
+    The decrement only applies if the class is still upcoming and has enough
+    seats left, so the slot count stays exact under any level of concurrency.
+    Sharded classes claim from one of their ``ClassSlotShard`` rows instead of
+    the class row; if ``configure_slot_shards`` moved the seats since the
+    class was read, the claim is retried where they are now. Returns a
+    ``ReservationResult``; the UPDATE is rolled back if the booking insert hits
+    the one-booking-per-user constraint.
+    """
+    if slots < 1:
+        raise ValueError("slots must be a positive integer")
+
+    now = timezone.now()
+    loaded_by_caller = isinstance(fitness_class, FitnessClass)
+    if not loaded_by_caller:
+        fitness_class = FitnessClass.objects.only(
+            'id', 'date_time', 'slot_shard_count'
+        ).filter(pk=fitness_class).first()
+        if fitness_class is None:
+            return ReservationResult(CLASS_NOT_FOUND)
+    fitness_class_id = fitness_class.pk
+    shard_count = fitness_class.slot_shard_count
+
+    try:
+        with transaction.atomic():
+            claimed = _claim(fitness_class, shard_count, slots, now)
+            if not claimed:
+                current = _shard_count(fitness_class_id)
+                if current != shard_count:
+                    # Sharded or folded back since it was read; claim where the seats are now.
+                    shard_count = current
+                    claimed = _claim(fitness_class, shard_count, slots, now)
+            if not claimed:
+                return ReservationResult(_failure_reason(fitness_class_id, now))
+
+            booking = Booking.objects.create(
+                fitness_class_id=fitness_class_id,
+                user_details=user_profile,
+                booking_time=booking_time or now,
+                slots=slots,
+            )
+            transaction.on_commit(catalogue.bump_version)
+    except IntegrityError:
+        return ReservationResult(DUPLICATE)
+
+    if loaded_by_caller:
+        fitness_class.slot_shard_count = shard_count
+        if shard_count:
+            fitness_class.available_slots = shard_availability([fitness_class_id], cached=False)[fitness_class_id]
+        else:
+            fitness_class.refresh_from_db(fields=['available_slots'])
+        booking.fitness_class = fitness_class
+    return ReservationResult(RESERVED, booking)
+
+
+def release_booking(booking):
+    """
+    Cancel ``booking`` and hand its slots back to the class.
+
+    Returns ``False`` if the booking was already cancelled by a concurrent
+    request, in which case no slots are released. Sharded classes get back at
+    most the seats their total still leaves free, since a class shrunk below
+    its bookings was re-sharded with none.
+    """
+    with transaction.atomic():
+        deleted, _ = Booking.objects.filter(pk=booking.pk).delete()
+        if not deleted:
+            return False
+        shard_count, total_slots = FitnessClass.objects.filter(pk=booking.fitness_class_id).values_list(
+            'slot_shard_count', 'total_slots'
+        ).first() or (0, 0)
+        if shard_count:
+            returned = min(booking.slots, _unheld_slots(booking.fitness_class_id, total_slots))
+            if returned > 0:
+                ClassSlotShard.objects.filter(
+                    fitness_class_id=booking.fitness_class_id,
+                    index=booking.pk % shard_count,
+                ).update(available_slots=F('available_slots') + returned)
+            cache.delete(_SHARD_CACHE_KEY.format(booking.fitness_class_id))
+        else:
+            FitnessClass.objects.filter(pk=booking.fitness_class_id).update(
+                available_slots=Least(F('available_slots') + booking.slots, F('total_slots'))
+            )
+        transaction.on_commit(catalogue.bump_version)
+    return True
+
+
+def configure_slot_shards(fitness_class, shard_count):
+    """
+    Split the remaining capacity of ``fitness_class`` across ``shard_count`` rows.
+
+    Passing ``0`` folds the shards back into the class row. Existing shards are
+    locked while the remaining seats are recomputed from the bookings, so the
+    split is exact even if bookings arrive concurrently.
+    """
+    with transaction.atomic():
+        list(FitnessClass.objects.select_for_update().filter(pk=fitness_class.pk).values_list('pk'))
+        list(ClassSlotShard.objects.select_for_update().filter(fitness_class=fitness_class))
+        booked = fitness_class.bookings.aggregate(booked=Coalesce(Sum('slots'), 0))['booked']
+        remaining = max(0, fitness_class.total_slots - booked)
+
+        ClassSlotShard.objects.filter(fitness_class=fitness_class).delete()
+        if shard_count:
+            base, extra = divmod(remaining, shard_count)
+            ClassSlotShard.objects.bulk_create([
+                ClassSlotShard(
+                    fitness_class=fitness_class,
+                    index=index,
+                    available_slots=base + (1 if index < extra else 0),
+                )
+                for index in range(shard_count)
+            ])
+        FitnessClass.objects.filter(pk=fitness_class.pk).update(
+            slot_shard_count=shard_count,
+            available_slots=remaining,
+        )
+        transaction.on_commit(catalogue.bump_version)
+    fitness_class.slot_shard_count = shard_count
+    fitness_class.available_slots = remaining
+    cache.delete(_SHARD_CACHE_KEY.format(fitness_class.pk))
+
+
+def shard_availability(fitness_class_ids, cached=True):
+    """
+    Return ``{class_id: available_slots}`` summed over the shards of each class.
+
+    Sums are cached for ``SLOT_SHARD_CACHE_SECONDS`` so list endpoints can
+    show sharded classes without aggregating on every request.
+    """
+    fitness_class_ids = list(fitness_class_ids)
+    totals = {}
+    if cached:
+        keys = {_SHARD_CACHE_KEY.format(pk): pk for pk in fitness_class_ids}
+        totals = {keys[key]: value for key, value in cache.get_many(keys).items()}
+
+    missing = [pk for pk in fitness_class_ids if pk not in totals]
+    if missing:
+        fresh = dict.fromkeys(missing, 0)
+        fresh.update(
+            ClassSlotShard.objects.filter(fitness_class_id__in=missing)
+            .values('fitness_class_id')
+            .annotate(total=Sum('available_slots'))
+            .values_list('fitness_class_id', 'total')
+        )
+        cache.set_many(
+            {_SHARD_CACHE_KEY.format(pk): total for pk, total in fresh.items()},
+            getattr(settings, 'SLOT_SHARD_CACHE_SECONDS', 2)
+        )
+        totals.update(fresh)
+    return totals
+
+
+def apply_shard_availability(classes):
+    """Replace ``available_slots`` on sharded classes with their derived sum."""
+    sharded = [fitness_class for fitness_class in classes if fitness_class.slot_shard_count]
+    if sharded:
+        totals = shard_availability(fitness_class.pk for fitness_class in sharded)
+        for fitness_class in sharded:
+            fitness_class.available_slots = totals[fitness_class.pk]
+    return classes
@@ -0,0 +1,263 @@
+"""
+Per-member schedule projection: upcoming bookings and counts per class type.
+
+Home screens show a member's upcoming sessions and how many classes of each
+type they have booked. ``BookingView.get`` would answer that by joining the
+member's whole history with its classes; instead ``ScheduleEntry`` keeps a
+copy of every member booking with its class details, indexed by member and
+class time, and ``BookingSummary`` keeps the booking count per class type.
+Reading a schedule is then a range scan over the upcoming entries plus one
+row per class type.
+
+Both tables are refreshed once a booking or class write commits (see
+``signals.py``). A refresh re-reads the source rows of the bookings it
+covers and writes the difference to their entries; the entries it adds,
+moves to another class type or removes are applied to the summaries as
+``F()`` deltas, so a write costs the same however long the member's
+history is. Because the deltas follow the entry changes, refreshes may run
+in any order, or twice, without drifting. Writes that skip signals, such as
+``bulk_create``, are reconciled by ``python manage.py rebuild_schedule``,
+which recounts the summaries from ``Booking``.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from userprofile.models import UserProfile
+from .models import Booking, BookingSummary, ScheduleEntry
+from .rendering import CLASS_TYPE_LABELS, datetime_formatter
+
+# Projected entry fields and the booking columns they are copied from.
+ENTRY_SOURCES = {
+    'user_details': 'user_details_id',
+    'fitness_class': 'fitness_class_id',
+    'class_type': 'fitness_class__name',
+    'date_time': 'fitness_class__date_time',
+    'instructor': 'fitness_class__instructor',
+    'duration': 'fitness_class__duration',
+    'Location': 'fitness_class__Location',
+    'slots': 'slots',
+}
+ENTRY_ATTNAMES = [ScheduleEntry._meta.get_field(name).attname for name in ENTRY_SOURCES]
+
+
+@dataclass
+class SyncResult:
+    """Rows a sync created, updated and deleted, and the summary deltas of its entry changes."""
+
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    deltas: Counter = field(default_factory=Counter)
+
+    def __add__(self, other):
+        deltas = Counter(self.deltas)
+        deltas.update(other.deltas)
+        return SyncResult(
+            self.created + other.created, self.updated + other.updated, self.deleted + other.deleted, deltas
+        )
+
+    @property
+    def changed(self):
+        return self.created + self.updated + self.deleted
+
+
+def _entry_values(entry):
+    return tuple(getattr(entry, attname) for attname in ENTRY_ATTNAMES)
+
+
+def sync_entries(bookings, entries, apply=True):
+    """
+    Make the ``entries`` queryset the projection of the ``bookings`` queryset.
+
+    Both must cover the same bookings, e.g. those of one member or one class.
+    With ``apply=False`` the differences are only counted.
+    """
+    expected = {}
+    for booking_id, *values in bookings.filter(user_details__isnull=False).values_list(
+        'id', *ENTRY_SOURCES.values()
+    ):
+        expected[booking_id] = ScheduleEntry(booking_id=booking_id, **dict(zip(ENTRY_ATTNAMES, values)))
+    current = {entry.booking_id: entry for entry in entries}
+
+    missing = [entry for booking_id, entry in expected.items() if booking_id not in current]
+    stale = [
+        entry for booking_id, entry in expected.items()
+        if booking_id in current and _entry_values(current[booking_id]) != _entry_values(entry)
+    ]
+    orphaned = [booking_id for booking_id in current if booking_id not in expected]
+
+    deltas = Counter()
+    for entry in missing:
+        deltas[entry.user_details_id, entry.class_type] += 1
+    for entry in stale:
+        old = current[entry.booking_id]
+        deltas[old.user_details_id, old.class_type] -= 1
+        deltas[entry.user_details_id, entry.class_type] += 1
+    for booking_id in orphaned:
+        deltas[current[booking_id].user_details_id, current[booking_id].class_type] -= 1
+    if apply:
+        # An entry may have appeared meanwhile, or sit under the booking's previous member.
+        ScheduleEntry.objects.bulk_create(
+            missing, update_conflicts=True, unique_fields=['booking'], update_fields=list(ENTRY_SOURCES)
+        )
+        ScheduleEntry.objects.bulk_update(stale, list(ENTRY_SOURCES), batch_size=500)
+        ScheduleEntry.objects.filter(pk__in=orphaned).delete()
+    return SyncResult(len(missing), len(stale), len(orphaned), deltas)
+
+
+def sync_summaries(profile_ids, apply=True):
+    """Recount the bookings per class type of the members ``profile_ids``."""
+    profile_ids = list(profile_ids)
+    expected = {
+        (profile_id, class_type): booked
+        for profile_id, class_type, booked in Booking.objects.filter(user_details_id__in=profile_ids)
+        .values_list('user_details_id', 'fitness_class__name')
+        .annotate(booked=Count('id'))
+        .order_by()
+    }
+    current = {
+        (summary.user_details_id, summary.class_type): summary
+        for summary in BookingSummary.objects.filter(user_details_id__in=profile_ids)
+    }
+
+    missing = [
+        BookingSummary(user_details_id=profile_id, class_type=class_type, booked=booked)
+        for (profile_id, class_type), booked in expected.items() if (profile_id, class_type) not in current
+    ]
+    stale = []
+    for key, summary in current.items():
+        if key in expected and summary.booked != expected[key]:
+            summary.booked = expected[key]
+            stale.append(summary)
+    emptied = [summary.pk for key, summary in current.items() if key not in expected]
+    if apply:
+        BookingSummary.objects.bulk_create(missing)
+        BookingSummary.objects.bulk_update(stale, ['booked'], batch_size=500)
+        BookingSummary.objects.filter(pk__in=emptied).delete()
+    return SyncResult(len(missing), len(stale), len(emptied))
+
+
+def apply_summary_deltas(deltas):
+    """Add ``{(profile_id, class_type): delta}`` to the summaries, dropping those that reach zero."""
+    emptied = []
+    for (profile_id, class_type), delta in deltas.items():
+        if not delta:
+            continue
+        summaries = BookingSummary.objects.filter(user_details_id=profile_id, class_type=class_type)
+        if delta > 0:
+            if not summaries.update(booked=F('booked') + delta):
+                BookingSummary.objects.create(user_details_id=profile_id, class_type=class_type, booked=delta)
+        else:
+            summaries.update(booked=Greatest(F('booked') + delta, 0))
+            emptied.append((profile_id, class_type))
+    for profile_id, class_type in emptied:
+        BookingSummary.objects.filter(user_details_id=profile_id, class_type=class_type, booked=0).delete()
+
+
+def _lock_members(profile_ids):
+    """Serialise refreshes per member, so a recount never overwrites a newer one."""
+    list(UserProfile.objects.select_for_update().filter(pk__in=profile_ids).order_by('pk').values_list('pk'))
+
+
+def refresh_booking(booking_id, profile_id):
+    """Bring the projection of one member booking, created, changed or cancelled, up to date."""
+    with transaction.atomic():
+        _lock_members([profile_id])
+        result = sync_entries(Booking.objects.filter(pk=booking_id), ScheduleEntry.objects.filter(pk=booking_id))
+        apply_summary_deltas(result.deltas)
+
+
+def refresh_class(fitness_class_id):
+    """Copy a class's new details into the entries of its bookings."""
+    with transaction.atomic():
+        profile_ids = set(
+            Booking.objects.filter(fitness_class_id=fitness_class_id, user_details__isnull=False)
+            .values_list('user_details_id', flat=True)
+        )
+        _lock_members(profile_ids)
+        result = sync_entries(
+            Booking.objects.filter(fitness_class_id=fitness_class_id),
+            ScheduleEntry.objects.filter(fitness_class_id=fitness_class_id),
+        )
+        apply_summary_deltas(result.deltas)
+
+
+def rebuild(profile_ids=None, apply=True, batch_size=500):
+    """
+    Reconcile the projection of ``profile_ids`` (every member by default) with ``Booking``.
+
+    Members are processed ``batch_size`` at a time, each batch in its own
+    transaction. Returns the ``(entries, summaries)`` sync results.
+    """
+    if profile_ids is None:
+        profile_ids = list(UserProfile.objects.order_by('pk').values_list('pk', flat=True))
+    entries, summaries = SyncResult(), SyncResult()
+    batch = []
+    for profile_id in profile_ids:
+        batch.append(profile_id)
+        if len(batch) == batch_size:
+            entries, summaries = _rebuild_batch(batch, apply, entries, summaries)
+            batch = []
+    if batch:
+        entries, summaries = _rebuild_batch(batch, apply, entries, summaries)
+    return entries, summaries
+
+
+def _rebuild_batch(profile_ids, apply, entries, summaries):
+    with transaction.atomic():
+        if apply:
+            _lock_members(profile_ids)
+        entries += sync_entries(
+            Booking.objects.filter(user_details_id__in=profile_ids),
+            ScheduleEntry.objects.filter(user_details_id__in=profile_ids),
+            apply,
+        )
+        summaries += sync_summaries(profile_ids, apply)
+    return entries, summaries
+
+
+def schedule_data(user, now=None):
+    """
+    Return the upcoming sessions and per-type counts of ``user``.
+
+    Two queries: the upcoming entries, by the member/time index, and the
+    summaries. ``counts`` has every class type the member has booked, with
+    the upcoming sessions of that type.
+    """
+    now = now or timezone.now()
+    format_datetime = datetime_formatter()
+    upcoming = [
+        {
+            'booking_id': booking_id,
+            'class_id': class_id,
+            'name': class_type,
+            'class_type': CLASS_TYPE_LABELS.get(class_type, class_type),
+            'date_time': format_datetime(date_time),
+            'instructor': instructor,
+            'duration': duration,
+            'Location': location,
+            'slots': slots,
+        }
+        for booking_id, class_id, class_type, date_time, instructor, duration, location, slots in (
+            ScheduleEntry.objects.filter(user_details__user=user, date_time__gt=now)
+            .order_by('date_time', 'booking_id')
+            .values_list(
+                'booking_id', 'fitness_class_id', 'class_type', 'date_time',
+                'instructor', 'duration', 'Location', 'slots',
+            )
+        )
+    ]
+    counts = {
+        class_type: {'booked': booked, 'upcoming': 0}
+        for class_type, booked in BookingSummary.objects.filter(user_details__user=user)
+        .order_by('class_type')
+        .values_list('class_type', 'booked')
+    }
+    for session in upcoming:
+        counts.setdefault(session['name'], {'booked': 0, 'upcoming': 0})['upcoming'] += 1
+    return {'upcoming': upcoming, 'counts': counts}
@@ -0,0 +1,147 @@
+"""
+Bulk class scheduling: recurrence expansion, batch validation and insertion.
+
+A batch is validated entirely in memory with plain checks instead of running
+``FitnessClassSerializer`` and ``full_clean`` per row, then inserted with
+chunked ``bulk_create`` inside one transaction.
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+import pytz
+
+from . import catalogue
+from .models import FitnessClass
+
+MAX_BULK_CLASSES = 10000
+BULK_CHUNK_SIZE = 500
+
+WEEKDAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
+CLASS_TYPE_KEYS = frozenset(dict(FitnessClass.CLASS_TYPES))
+
+_MAX_LENGTHS = {
+    'instructor': FitnessClass._meta.get_field('instructor').max_length,
+    'duration': FitnessClass._meta.get_field('duration').max_length,
+    'Location': FitnessClass._meta.get_field('Location').max_length,
+}
+
+
+class BatchError(ValueError):
+    """Raised for a malformed batch or recurrence rule as a whole."""
+
+
+def expand_recurrence(rule):
+    """
+    Expand a weekly recurrence rule into one class dict per occurrence.
+
+    ``rule`` holds the shared class fields plus ``weekdays`` (e.g. ``["MON",
+    "WED"]``), ``time`` (``"HH:MM"``), inclusive ``start_date``/``end_date``
+    (``"YYYY-MM-DD"``) and an optional ``timezone`` the time is local to.
+    """
+    try:
+        weekdays = {WEEKDAYS.index(day.upper()) for day in rule['weekdays']}
+        start_time = datetime.strptime(rule['time'], '%H:%M').time()
+        start_date = datetime.strptime(rule['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(rule['end_date'], '%Y-%m-%d').date()
+        zone = pytz.timezone(rule.get('timezone', 'Asia/Kolkata'))
+    except KeyError as e:
+        raise BatchError(f"Recurrence is missing {e.args[0]}")
+    except (ValueError, AttributeError, TypeError):
+        raise BatchError("Recurrence has an invalid weekday, time or date")
+    except pytz.exceptions.UnknownTimeZoneError:
+        raise BatchError("Invalid timezone")
+    if end_date < start_date:
+        raise BatchError("end_date must not be before start_date")
+    if (end_date - start_date).days > 366:
+        raise BatchError("Recurrence cannot span more than a year")
+
+    template = {
+        key: rule[key]
+        for key in ('name', 'instructor', 'total_slots', 'duration', 'Location')
+        if key in rule
+    }
+    occurrences = []
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in weekdays:
+            local = zone.localize(datetime.combine(day, start_time))
+            occurrences.append(dict(template, date_time=local))
+        day += timedelta(days=1)
+    return occurrences
+
+
+def validate_batch(items):
+    """
+    Validate class dicts and build unsaved ``FitnessClass`` instances.
+
+    Returns ``(instances, errors)`` where ``errors`` maps the item index to a
+    field error dict in the same shape the serializer would produce.
+    """
+    if len(items) > MAX_BULK_CLASSES:
+        raise BatchError(f"A batch cannot contain more than {MAX_BULK_CLASSES} classes")
+
+    now = timezone.now()
+    date_field = serializers.DateTimeField()
+    slots_field = serializers.IntegerField()
+    instances, errors = [], {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = {'non_field_errors': ["Expected an object"]}
+            continue
+        item_errors = {}
+
+        name = item.get('name')
+        if not isinstance(name, str) or name not in CLASS_TYPE_KEYS:
+            item_errors['name'] = ["Invalid class type. Choose from: YOGA, ZUMBA, HIIT"]
+
+        date_time = item.get('date_time')
+        if date_time is None:
+            item_errors['date_time'] = ["This field is required."]
+        else:
+            try:
+                if not isinstance(date_time, datetime):
+                    date_time = date_field.to_internal_value(date_time)
+                if date_time < now:
+                    item_errors['date_time'] = ["Class date/time cannot be in the past"]
+            except serializers.ValidationError as e:
+                item_errors['date_time'] = list(e.detail)
+
+        try:
+            total_slots = slots_field.to_internal_value(item.get('total_slots', 10))
+            if total_slots <= 0:
+                item_errors['total_slots'] = ["Total slots must be greater than 0"]
+        except serializers.ValidationError as e:
+            item_errors['total_slots'] = list(e.detail)
+
+        if not item.get('instructor'):
+            item_errors['instructor'] = ["This field is required."]
+        for field, max_length in _MAX_LENGTHS.items():
+            value = item.get(field)
+            if value is not None and len(str(value)) > max_length:
+                item_errors[field] = [f"Ensure this field has no more than {max_length} characters."]
+
+        if item_errors:
+            errors[index] = item_errors
+            continue
+        instances.append(FitnessClass(
+            name=name,
+            date_time=date_time,
+            instructor=item['instructor'],
+            total_slots=total_slots,
+            available_slots=total_slots,
+            duration=item.get('duration'),
+            Location=item.get('Location'),
+        ))
+    return instances, errors
+
+
+def create_batch(instances, chunk_size=BULK_CHUNK_SIZE):
+    """Insert validated classes in chunks inside one transaction; return their IDs."""
+    with transaction.atomic():
+        created = []
+        for start in range(0, len(instances), chunk_size):
+            created.extend(FitnessClass.objects.bulk_create(instances[start:start + chunk_size]))
+        transaction.on_commit(catalogue.bump_version)
+    return [fitness_class.pk for fitness_class in created]
@@ -3,21 +3,46 @@ Serializers for fitness classes and bookings.
 """
 from rest_framework import serializers
 from django.utils import timezone
-from .models import FitnessClass, Booking
-import pytz
+from .models import FitnessClass, Booking, WaitlistEntry
+from .timezones import DEFAULT_TIMEZONE, get_zone
 
-class FitnessClassSerializer(serializers.ModelSerializer):
+MAX_SLOT_SHARDS = 64
+
+class ProjectedFieldsMixin:
+    """Accept a ``fields`` argument limiting which fields are rendered."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class FitnessClassSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
     """Serializer for FitnessClass model."""
     
     class_type = serializers.CharField(source='get_name_display', read_only=True)
 
     class Meta:
         model = FitnessClass
-        fields = ['id', 'name', 'class_type', 'date_time', 'instructor','duration','Location', 'total_slots', 'available_slots']
+        fields = ['id', 'name', 'class_type', 'date_time', 'instructor','duration','Location', 'total_slots', 'available_slots', 'slot_shard_count']
         extra_kwargs = {
-            'available_slots': {'required': False}
+            'available_slots': {'required': False},
+            'slot_shard_count': {'required': False, 'write_only': True}
         }
 
+    def update(self, instance, validated_data):
+        """
+        Save only the submitted fields.
+
+        ``available_slots`` and the waitlist counters are maintained by
+        conditional UPDATEs of their own; saving the whole row would write back
+        whatever values the instance was loaded with.
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
     def validate_name(self, value):
         """Validate class type is one of the allowed choices."""
         if value not in dict(FitnessClass.CLASS_TYPES).keys():
@@ -28,8 +53,8 @@ class FitnessClassSerializer(serializers.ModelSerializer):
         """Validate date_time is in the future and in correct format."""
         try:
             if isinstance(value, str):
-                value = pytz.timezone('Asia/Kolkata').localize(
-                    timezone.datetime.fromisoformat(value.replace('Z', '+00:00'))
+                value = timezone.make_aware(
+                    timezone.datetime.fromisoformat(value.replace('Z', '+00:00')), get_zone(DEFAULT_TIMEZONE)
                 )
             if value < timezone.now():
                 raise serializers.ValidationError("Class date/time cannot be in the past")
@@ -45,6 +70,12 @@ class FitnessClassSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Total slots must be greater than 0")
         return value
 
+    def validate_slot_shard_count(self, value):
+        """Validate the number of capacity shards stays within bounds."""
+        if value > MAX_SLOT_SHARDS:
+            raise serializers.ValidationError(f"Slot shard count cannot exceed {MAX_SLOT_SHARDS}")
+        return value
+
     def validate(self, data):
         """Validate available_slots does not exceed total_slots."""
         if 'available_slots' in data and data['available_slots'] > data.get(
@@ -59,13 +90,22 @@ class FitnessClassSerializer(serializers.ModelSerializer):
             validated_data['available_slots'] = validated_data['total_slots']
         return super().create(validated_data)
 
-class BookingSerializer(serializers.ModelSerializer):
-    """Serializer for Booking model."""
+class UpcomingClassField(serializers.PrimaryKeyRelatedField):
+    """Primary key field accepting only classes that have not started yet."""
+
+    def get_queryset(self):
+        return FitnessClass.objects.filter(date_time__gt=timezone.now())
+
+class BookingSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
+    """
+    Serializer for Booking model.
+
+    Validating a new booking costs at most two queries: the class lookup and
+    the duplicate check. Render lists from a queryset with
+    ``select_related('fitness_class')`` so the nested details need no more.
+    """
     
-    class_id = serializers.PrimaryKeyRelatedField(
-        queryset=FitnessClass.objects.filter(date_time__gt=timezone.now()),
-        source='fitness_class'
-    )
+    class_id = UpcomingClassField(source='fitness_class')
     fitness_class_details = FitnessClassSerializer(source='fitness_class', read_only=True)
 
     class Meta:
@@ -78,39 +118,47 @@ class BookingSerializer(serializers.ModelSerializer):
     def validate(self, data):
         """Validate booking data."""
         errors = {}
+        fitness_class = data['fitness_class']
 
         # Set default booking_time if not provided
         if 'booking_time' not in data:
             data['booking_time'] = timezone.now()
 
         # Validate booking_time
-        if data['booking_time'] > data['fitness_class'].date_time:
+        if data['booking_time'] > fitness_class.date_time:
             errors.setdefault('booking_time', []).append("Cannot book after class start time")
 
+        # Check available slots; sharded classes are checked when the slots are claimed
+        if not fitness_class.slot_shard_count and fitness_class.available_slots <= 0:
+            errors.setdefault('class_id', []).append("No available slots for this class")
+
         # Check for duplicate booking
-            print(data,"data................."),
-        if Booking.objects.filter(
-            fitness_class=data['fitness_class'],
-            user_details=data.get('userprofile', None)
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if not errors and user is not None and user.is_authenticated and Booking.objects.filter(
+            fitness_class=fitness_class,
+            user_details__user_id=user.pk
         ).exists():
             errors.setdefault('non_field_errors', []).append("This user has already booked this class")
 
-        # Check available slots
-        if data['fitness_class'].available_slots <= 0:
-            errors.setdefault('class_id', []).append("No available slots for this class")
-
-        # Perform model-level validation
-        try:
-            instance = Booking(**data)
-            instance.clean()
-        except ValidationError as e:
-            if hasattr(e, 'message_dict'):
-                for field, messages in e.message_dict.items():
-                    errors.setdefault(field, []).extend(messages)
-            else:
-                errors.setdefault('non_field_errors', []).extend(e.messages)
-
         if errors:
             raise serializers.ValidationError(errors)
 
-        return data
\ No newline at end of file
+        return data
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    """Serializer for WaitlistEntry model."""
+
+    class_id = UpcomingClassField(source='fitness_class')
+    position = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'class_id', 'slots', 'status', 'position', 'booking', 'created_at']
+        read_only_fields = ['status', 'booking', 'created_at']
+
+    def validate_slots(self, value):
+        """Validate slots is positive."""
+        if value <= 0:
+            raise serializers.ValidationError("Slots must be greater than 0")
+        return value
@@ -0,0 +1,38 @@
+"""
+Signal handlers keeping derived booking data in sync with model writes.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import catalogue, schedule
+from .models import Booking, FitnessClass
+
+
+@receiver(post_save, sender=FitnessClass)
+@receiver(post_delete, sender=FitnessClass)
+def invalidate_catalogue(sender, **kwargs):
+    """Bump the catalogue version once the class write is committed."""
+    transaction.on_commit(catalogue.bump_version)
+
+
+@receiver(post_save, sender=FitnessClass)
+def refresh_class_schedule(sender, instance, created, **kwargs):
+    """Copy changed class details into the schedules of its members once committed."""
+    if not created:
+        fitness_class_id = instance.pk
+        transaction.on_commit(lambda: schedule.refresh_class(fitness_class_id), robust=True)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_booking_schedule(sender, instance, **kwargs):
+    """
+    Refresh the member's schedule once the booking or its cancellation is committed.
+
+    A failed refresh is logged and leaves the booking in place;
+    ``rebuild_schedule`` reconciles the projection later.
+    """
+    booking_id, profile_id = instance.pk, instance.user_details_id
+    if profile_id is not None:
+        transaction.on_commit(lambda: schedule.refresh_booking(booking_id, profile_id), robust=True)
@@ -1,15 +1,59 @@
 """
 Tests for fitness class and booking APIs.
 """
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db import connection, connections, models, OperationalError
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 from django.utils import timezone
 from django.urls import reverse
-from .models import FitnessClass, Booking
+from django.contrib.auth.models import User
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+from fitness_studio import db_pool, db_router, instrumentation, throttling
+from . import catalogue, schedule
+from .pagination import MAX_PAGE_SIZE
+from .rendering import (
+    BOOKING_FIELDS,
+    CLASS_FIELDS,
+    booking_columns,
+    booking_data,
+    class_availability,
+    class_columns,
+    class_data,
+    dumps,
+)
+from .serializers import BookingSerializer, FitnessClassSerializer
+from . import timezones
+from .timezones import UnknownTimeZoneError, ZoneSegments, get_zone
+from .reservations import apply_shard_availability
+from .waitlist import WaitlistError, cancel_booking, join_waitlist, leave_waitlist
+from .models import FitnessClass, ClassSlotShard, Booking, WaitlistEntry, ScheduleEntry, BookingSummary
+from userprofile.models import UserProfile
+from .reservations import (
+    reserve_slots,
+    release_booking,
+    configure_slot_shards,
+    shard_availability,
+    RESERVED,
+    SOLD_OUT,
+    CLASS_STARTED,
+)
 import pytz
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
 import json
+import re
+import time
 
 class FitnessClassViewTests(TestCase):
     """Tests for FitnessClassView."""
@@ -266,4 +310,1467 @@ class BookingViewTests(TestCase):
             content_type='application/json'
         )
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(response.data['error'], 'Unauthorized to cancel this booking')
\ No newline at end of file
+        self.assertEqual(response.data['error'], 'Unauthorized to cancel this booking')
+
+class ReservationTests(TestCase):
+    """Tests for the atomic slot reservation path."""
+
+    def setUp(self):
+        self.fitness_class = FitnessClass.objects.create(
+            name="HIIT",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="John Doe",
+            total_slots=3,
+            available_slots=3,
+            duration="45 min",
+            Location="Studio A"
+        )
+
+    def test_reserve_decrements_slots(self):
+        """Test a successful claim decrements the class and creates the booking."""
+        result = reserve_slots(self.fitness_class, slots=2)
+        self.assertTrue(result.success)
+        self.assertEqual(result.booking.slots, 2)
+        self.assertEqual(self.fitness_class.available_slots, 1)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_reserve_sold_out(self):
+        """Test a claim larger than the remaining slots is rejected untouched."""
+        result = reserve_slots(self.fitness_class, slots=4)
+        self.assertFalse(result.success)
+        self.assertEqual(result.status, SOLD_OUT)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 3)
+        self.assertEqual(Booking.objects.count(), 0)
+
+    def test_reserve_started_class(self):
+        """Test a class in the past cannot be claimed."""
+        FitnessClass.objects.filter(pk=self.fitness_class.pk).update(
+            date_time=timezone.now() - timedelta(hours=1)
+        )
+        result = reserve_slots(self.fitness_class.pk)
+        self.assertEqual(result.status, CLASS_STARTED)
+
+    def test_release_returns_slots_once(self):
+        """Test cancelling twice only hands the slots back once."""
+        booking = reserve_slots(self.fitness_class, slots=2).booking
+        self.assertTrue(release_booking(booking))
+        self.assertFalse(release_booking(booking))
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 3)
+
+    def test_sharded_reserve_and_release(self):
+        """Test a sharded class splits capacity and reports the derived sum."""
+        configure_slot_shards(self.fitness_class, 2)
+        self.assertEqual(
+            sorted(ClassSlotShard.objects.values_list('available_slots', flat=True)), [1, 2]
+        )
+        booking = reserve_slots(self.fitness_class).booking
+        self.assertEqual(self.fitness_class.available_slots, 2)
+        reserve_slots(self.fitness_class.pk)
+        reserve_slots(self.fitness_class.pk)
+        self.assertEqual(reserve_slots(self.fitness_class.pk).status, SOLD_OUT)
+        release_booking(booking)
+        self.assertEqual(shard_availability([self.fitness_class.pk], cached=False)[self.fitness_class.pk], 1)
+
+    def test_reserve_after_concurrent_reshard(self):
+        """Test a class read before it was sharded, or folded back, is claimed where its seats are now."""
+        stale = FitnessClass.objects.get(pk=self.fitness_class.pk)
+        configure_slot_shards(self.fitness_class, 2)
+        self.assertTrue(reserve_slots(stale).success)
+        self.assertEqual(stale.slot_shard_count, 2)
+        self.assertEqual(shard_availability([stale.pk], cached=False)[stale.pk], 2)
+        self.assertEqual(FitnessClass.objects.get(pk=stale.pk).available_slots, 3)
+
+        configure_slot_shards(self.fitness_class, 0)
+        self.assertTrue(reserve_slots(stale).success)
+        self.assertEqual(stale.available_slots, 1)
+        self.assertTrue(reserve_slots(self.fitness_class.pk).success)
+        self.assertEqual(reserve_slots(self.fitness_class.pk).status, SOLD_OUT)
+
+    def test_sharded_release_after_shrink(self):
+        """Test cancelling in a class shrunk below its bookings frees no seat beyond its total."""
+        configure_slot_shards(self.fitness_class, 2)
+        bookings = [reserve_slots(self.fitness_class.pk).booking for _ in range(3)]
+        FitnessClass.objects.filter(pk=self.fitness_class.pk).update(total_slots=2)
+        self.fitness_class.refresh_from_db()
+        configure_slot_shards(self.fitness_class, 2)
+
+        release_booking(bookings[0])
+        self.assertEqual(shard_availability([self.fitness_class.pk], cached=False)[self.fitness_class.pk], 0)
+        release_booking(bookings[1])
+        self.assertEqual(shard_availability([self.fitness_class.pk], cached=False)[self.fitness_class.pk], 1)
+
+    def test_unshard_restores_class_row(self):
+        """Test folding shards back keeps the remaining capacity."""
+        configure_slot_shards(self.fitness_class, 3)
+        reserve_slots(self.fitness_class)
+        configure_slot_shards(self.fitness_class, 0)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 2)
+        self.assertFalse(ClassSlotShard.objects.exists())
+
+
+class ReservationConcurrencyTests(TransactionTestCase):
+    """Stress test firing parallel bookings at a single class."""
+
+    workers = 16
+    attempts = 60
+    capacity = 25
+
+    def _reserve(self, class_id):
+        try:
+            while True:
+                try:
+                    return reserve_slots(class_id).status
+                except OperationalError:
+                    # SQLite reports writer contention instead of blocking.
+                    time.sleep(0.001)
+        finally:
+            connection.close()
+
+    def _create_class(self):
+        return FitnessClass.objects.create(
+            name="HIIT",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="John Doe",
+            total_slots=self.capacity,
+            available_slots=self.capacity,
+            duration="45 min",
+            Location="Studio A"
+        )
+
+    def _book_in_parallel(self, fitness_class):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            statuses = list(pool.map(self._reserve, [fitness_class.pk] * self.attempts))
+        self.assertEqual(statuses.count(RESERVED), self.capacity)
+        self.assertEqual(statuses.count(SOLD_OUT), self.attempts - self.capacity)
+        self.assertEqual(Booking.objects.filter(fitness_class=fitness_class).count(), self.capacity)
+
+    def test_parallel_bookings_never_oversell(self):
+        """Test the slot count stays exact under parallel claims."""
+        fitness_class = self._create_class()
+        self._book_in_parallel(fitness_class)
+        fitness_class.refresh_from_db()
+        self.assertEqual(fitness_class.available_slots, 0)
+
+    def test_parallel_sharded_bookings_never_oversell(self):
+        """Test sharded capacity stays exact under parallel claims."""
+        fitness_class = self._create_class()
+        configure_slot_shards(fitness_class, 4)
+        self._book_in_parallel(fitness_class)
+        self.assertEqual(shard_availability([fitness_class.pk], cached=False)[fitness_class.pk], 0)
+
+
+class CatalogueCacheTests(TestCase):
+    """Tests for the cached upcoming-class catalogue."""
+
+    def setUp(self):
+        catalogue.reset_backend()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fitness_class = FitnessClass.objects.create(
+                name="YOGA",
+                date_time=timezone.now() + timedelta(days=1),
+                instructor="John Doe",
+                total_slots=10,
+                available_slots=10,
+                duration="60 min",
+                Location="Studio B"
+            )
+
+    def test_repeat_requests_skip_database(self):
+        """Test a cached catalogue is served without any query."""
+        first = self.client.get(reverse('class-list'), {'timezone': 'Asia/Kolkata'})
+        # Class lookup, duplicate check, savepoint, claim, insert, release, slot refresh.
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('class-list'), {'timezone': 'Asia/Kolkata'})
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(json.loads(second.content)[0]['instructor'], 'John Doe')
+
+    def test_if_none_match_returns_304(self):
+        """Test a matching ETag is answered with 304 and no body."""
+        etag = self.client.get(reverse('class-list'))['ETag']
+        # Class lookup, duplicate check, savepoint, claim, insert, release, slot refresh.
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('class-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_class_filter_is_part_of_key(self):
+        """Test each class type filter gets its own entry."""
+        self.assertEqual(len(json.loads(self.client.get(reverse('class-list')).content)), 1)
+        response = self.client.get(reverse('class-list'), {'fitnessclass_type': 'HIIT'})
+        self.assertEqual(json.loads(response.content), [])
+
+    def test_writes_invalidate_catalogue(self):
+        """Test new classes and slot changes bump the catalogue version."""
+        etag = self.client.get(reverse('class-list'))['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_slots(self.fitness_class)
+        response = self.client.get(reverse('class-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)[0]['available_slots'], 9)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FitnessClass.objects.create(
+                name="HIIT",
+                date_time=timezone.now() + timedelta(days=2),
+                instructor="Jane Smith",
+                total_slots=5,
+                available_slots=5,
+                duration="30 min",
+                Location="Studio A"
+            )
+        self.assertEqual(len(json.loads(self.client.get(reverse('class-list')).content)), 2)
+
+    def test_per_process_cache_warning(self):
+        """Test ``check --deploy`` warns when the catalogue version is local to each process."""
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CATALOGUE_CACHE={'BACKEND': 'locmem'}, CACHES=shared):
+            self.assertEqual([warning.id for warning in catalogue.check_catalogue_cache(None)], ['booking.W001'])
+        with override_settings(CATALOGUE_CACHE={'BACKEND': 'django'}, CACHES=local):
+            self.assertEqual([warning.id for warning in catalogue.check_catalogue_cache(None)], ['booking.W001'])
+        with override_settings(CATALOGUE_CACHE={'BACKEND': 'django'}, CACHES=shared):
+            self.assertEqual(catalogue.check_catalogue_cache(None), [])
+
+
+class PaginationTests(TestCase):
+    """Tests for keyset pagination and field projection on list endpoints."""
+
+    def setUp(self):
+        catalogue.reset_backend()
+        self.client = APIClient()
+        start = timezone.now() + timedelta(days=1)
+        self.classes = FitnessClass.objects.bulk_create([
+            FitnessClass(
+                name="YOGA",
+                date_time=start + timedelta(hours=index // 2),
+                instructor=f"Instructor {index}",
+                total_slots=10,
+                available_slots=10,
+                duration="60 min",
+                Location="Studio B"
+            )
+            for index in range(5)
+        ])
+        self.user = User.objects.create_user(username='member', password='secret')
+        self.profile = UserProfile.objects.create(user=self.user)
+
+    def _walk(self, url, params):
+        ids, cursor = [], None
+        while True:
+            page_params = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = self.client.get(url, page_params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            body = json.loads(response.content)
+            ids.extend(row['id'] for row in body['results'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_class_pages_cover_list_in_order(self):
+        """Test walking the cursor returns every class once, in order, with ties on date_time."""
+        ids = self._walk(reverse('class-list'), {'page_size': 2})
+        self.assertEqual(ids, list(FitnessClass.objects.order_by('date_time', 'id').values_list('id', flat=True)))
+
+    def test_class_field_projection(self):
+        """Test fields= narrows the rendered keys and the selected columns."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('class-list'), {'page_size': 10, 'fields': 'id,class_type'})
+        row = json.loads(response.content)['results'][0]
+        self.assertEqual(set(row), {'id', 'class_type'})
+        self.assertEqual(row['class_type'], 'Yoga')
+        self.assertNotIn('instructor', queries.captured_queries[0]['sql'])
+
+    def test_page_size_is_capped(self):
+        """Test page_size above the cap is clamped."""
+        FitnessClass.objects.bulk_create([
+            FitnessClass(
+                name="HIIT",
+                date_time=timezone.now() + timedelta(days=2, minutes=index),
+                instructor="Bulk",
+                total_slots=5,
+                available_slots=5
+            )
+            for index in range(MAX_PAGE_SIZE)
+        ])
+        response = self.client.get(reverse('class-list'), {'page_size': MAX_PAGE_SIZE * 5})
+        self.assertEqual(len(json.loads(response.content)['results']), MAX_PAGE_SIZE)
+
+    def test_invalid_parameters(self):
+        """Test malformed cursors and unknown fields are rejected."""
+        response = self.client.get(reverse('class-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse('class-list'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_booking_pages_and_projection(self):
+        """Test booking history paginates on class time and honours fields=."""
+        Booking.objects.bulk_create([
+            Booking(fitness_class=fitness_class, user_details=self.profile)
+            for fitness_class in self.classes
+        ])
+        self.client.force_authenticate(user=self.user)
+        ids = self._walk(reverse('booking-list'), {'page_size': 2, 'fields': 'id,booking_time'})
+        self.assertEqual(len(ids), 5)
+        response = self.client.get(reverse('booking-list'), {'page_size': 1, 'fields': 'id,class_id'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'class_id'})
+
+
+class QueryPlanTests(TestCase):
+    """Fail if a hot query regresses to a full table scan on a realistic dataset."""
+
+    classes = 5000
+    members = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() - timedelta(days=30)
+        FitnessClass.objects.bulk_create(
+            (
+                FitnessClass(
+                    name=('YOGA', 'ZUMBA', 'HIIT')[index % 3],
+                    date_time=start + timedelta(minutes=30 * index),
+                    instructor=f"Instructor {index % 25}",
+                    total_slots=20,
+                    available_slots=20,
+                    duration="60 min",
+                    Location="Studio A"
+                )
+                for index in range(cls.classes)
+            ),
+            batch_size=1000,
+        )
+        users = User.objects.bulk_create(User(username=f"member{index}") for index in range(cls.members))
+        profiles = UserProfile.objects.bulk_create(UserProfile(user=user) for user in users)
+        class_ids = list(FitnessClass.objects.values_list('id', flat=True))
+        Booking.objects.bulk_create(
+            (
+                Booking(fitness_class_id=class_ids[(index * 37) % len(class_ids)], user_details=profile)
+                for index, profile in enumerate(profiles * 10)
+            ),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        cls.profile = profiles[0]
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def assertNoFullScan(self, queryset, table):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+            self.assertNotIn(f'Seq Scan on {table}', plan, plan)
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            self.assertIsNone(re.search(rf'\bSCAN {table}\b(?! USING)', plan), plan)
+        else:
+            self.skipTest(f"No plan check for {connection.vendor}")
+
+    def test_catalogue_query(self):
+        """Test the upcoming catalogue is read through the keyset index."""
+        self.assertNoFullScan(
+            FitnessClass.objects.filter(date_time__gt=timezone.now()).order_by('date_time'),
+            'booking_fitnessclass'
+        )
+
+    def test_catalogue_type_query(self):
+        """Test the class-type filter uses the composite type index."""
+        self.assertNoFullScan(
+            FitnessClass.objects.filter(date_time__gt=timezone.now(), name='HIIT').order_by('date_time'),
+            'booking_fitnessclass'
+        )
+
+    def test_catalogue_keyset_page(self):
+        """Test a deep keyset page does not scan the class table."""
+        middle = FitnessClass.objects.order_by('date_time', 'id')[self.classes // 2]
+        queryset = FitnessClass.objects.filter(date_time__gt=timezone.now()).filter(
+            models.Q(date_time__gt=middle.date_time) | models.Q(date_time=middle.date_time, pk__gt=middle.pk)
+        ).order_by('date_time', 'pk')[:51]
+        self.assertNoFullScan(queryset, 'booking_fitnessclass')
+
+    def test_member_bookings_query(self):
+        """Test booking history is looked up by member, joining classes by key."""
+        queryset = Booking.objects.filter(user_details__user=self.profile.user).select_related('fitness_class')
+        self.assertNoFullScan(queryset, 'booking_booking')
+        self.assertNoFullScan(queryset, 'booking_fitnessclass')
+        self.assertNoFullScan(queryset, 'userprofile_userprofile')
+
+    def test_duplicate_booking_query(self):
+        """Test the duplicate check is served by the unique index."""
+        fitness_class = Booking.objects.filter(user_details=self.profile).first().fitness_class
+        self.assertNoFullScan(
+            Booking.objects.filter(fitness_class=fitness_class, user_details=self.profile),
+            'booking_booking'
+        )
+
+
+class BulkSchedulingTests(TestCase):
+    """Tests for bulk and recurring class scheduling."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.trainer = User.objects.create_user(username='trainer', password='secret')
+        UserProfile.objects.create(user=self.trainer, role='trainer')
+        self.client.force_authenticate(user=self.trainer)
+        self.next_monday = (timezone.now() + timedelta(days=7 - timezone.now().weekday())).date()
+
+    def test_recurrence_expands_weekly(self):
+        """Test a two-week Monday/Wednesday rule creates four classes at local time."""
+        response = self.client.post(reverse('class-bulk'), {
+            "recurrence": {
+                "name": "YOGA",
+                "instructor": "John Doe",
+                "total_slots": 12,
+                "weekdays": ["MON", "WED"],
+                "time": "07:30",
+                "start_date": self.next_monday.isoformat(),
+                "end_date": (self.next_monday + timedelta(days=13)).isoformat(),
+                "timezone": "Asia/Kolkata"
+            }
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 4)
+        classes = FitnessClass.objects.filter(id__in=response.data['ids']).order_by('date_time')
+        self.assertEqual([c.date_time.weekday() for c in classes], [0, 2, 0, 2])
+        self.assertEqual(classes[0].date_time.astimezone(pytz.timezone('Asia/Kolkata')).strftime('%H:%M'), '07:30')
+        self.assertTrue(all(c.available_slots == 12 for c in classes))
+
+    def test_class_list_is_all_or_nothing(self):
+        """Test one invalid class rejects the whole batch with indexed errors."""
+        future = (timezone.now() + timedelta(days=1)).isoformat()
+        response = self.client.post(reverse('class-bulk'), {
+            "classes": [
+                {"name": "HIIT", "date_time": future, "instructor": "Jane", "total_slots": 8},
+                {"name": "PILATES", "date_time": future, "instructor": "Jane", "total_slots": 0},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data['errors'][1]), {'name', 'total_slots'})
+        self.assertEqual(FitnessClass.objects.count(), 0)
+
+    def test_batch_fields_checked_like_single_create(self):
+        """Test malformed names are field errors and numeric strings count as slots, as for a single class."""
+        future = (timezone.now() + timedelta(days=1)).isoformat()
+        response = self.client.post(reverse('class-bulk'), {
+            "classes": [
+                {"name": ["HIIT"], "date_time": future, "instructor": "Jane"},
+                {"name": {"type": "HIIT"}, "date_time": future, "instructor": "Jane"},
+                {"name": "HIIT", "date_time": future, "instructor": "Jane", "total_slots": "twelve"},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [set(response.data['errors'][index]) for index in range(3)], [{'name'}, {'name'}, {'total_slots'}]
+        )
+
+        response = self.client.post(reverse('class-bulk'), {
+            "classes": [{"name": "HIIT", "date_time": future, "instructor": "Jane", "total_slots": "12"}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(FitnessClass.objects.get().available_slots, 12)
+
+    def test_large_batch_in_few_queries(self):
+        """Test a batch is inserted in chunks rather than row by row."""
+        future = timezone.now() + timedelta(days=1)
+        classes = [
+            {"name": "ZUMBA", "date_time": (future + timedelta(hours=i)).isoformat(), "instructor": "Jane"}
+            for i in range(1200)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('class-bulk'), {"classes": classes}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(FitnessClass.objects.count(), 1200)
+        self.assertLess(len(queries), len(classes) // 50)
+
+    def test_non_trainer_forbidden(self):
+        """Test members cannot bulk create classes."""
+        member = User.objects.create_user(username='member', password='secret')
+        UserProfile.objects.create(user=member, role='member')
+        self.client.force_authenticate(user=member)
+        response = self.client.post(reverse('class-bulk'), {"classes": []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BookingQueryBudgetTests(TestCase):
+    """Enforce a fixed query budget for booking validation and rendering."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret')
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        start = timezone.now() + timedelta(days=1)
+        self.classes = FitnessClass.objects.bulk_create([
+            FitnessClass(
+                name="ZUMBA",
+                date_time=start + timedelta(hours=index),
+                instructor="John Doe",
+                total_slots=10,
+                available_slots=10,
+                duration="60 min",
+                Location="Studio C"
+            )
+            for index in range(30)
+        ])
+
+    def _validate(self, class_id):
+        serializer = BookingSerializer(
+            data={'class_id': class_id},
+            context={'request': SimpleNamespace(user=self.user)}
+        )
+        return serializer.is_valid(), serializer
+
+    def test_list_is_one_query_for_any_length(self):
+        """Test booking history renders in one query regardless of size."""
+        for count in (1, 30):
+            Booking.objects.all().delete()
+            Booking.objects.bulk_create(
+                Booking(fitness_class=fitness_class, user_details=self.profile)
+                for fitness_class in self.classes[:count]
+            )
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse('booking-list'))
+            self.assertEqual(len(response.data), count)
+
+    def test_validation_is_at_most_two_queries(self):
+        """Test validating a new booking costs the class lookup and duplicate check only."""
+        with self.assertNumQueries(2):
+            valid, serializer = self._validate(self.classes[0].pk)
+        self.assertTrue(valid, serializer.errors)
+
+    def test_duplicate_detected_for_current_user(self):
+        """Test a second booking of the same class by the same user is rejected."""
+        Booking.objects.create(fitness_class=self.classes[0], user_details=self.profile)
+        valid, serializer = self._validate(self.classes[0].pk)
+        self.assertFalse(valid)
+        self.assertIn("This user has already booked this class", serializer.errors['non_field_errors'])
+
+    def test_upcoming_filter_is_evaluated_live(self):
+        """Test a class that has started since import time is no longer bookable."""
+        FitnessClass.objects.filter(pk=self.classes[0].pk).update(
+            date_time=timezone.now() - timedelta(minutes=1)
+        )
+        valid, serializer = self._validate(self.classes[0].pk)
+        self.assertFalse(valid)
+        self.assertIn('class_id', serializer.errors)
+
+    def test_create_query_budget(self):
+        """Test the whole booking POST stays within its fixed budget."""
+        # Class lookup, duplicate check, savepoint, claim, insert, release, slot refresh.
+        with self.assertNumQueries(7):
+            response = self.client.post(
+                reverse('booking-list'), {'class_id': self.classes[0].pk, 'slots': 2}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['fitness_class_details']['available_slots'], 8)
+
+
+def _create_members(count, prefix='member'):
+    users = User.objects.bulk_create(User(username=f"{prefix}{index}") for index in range(count))
+    return UserProfile.objects.bulk_create(UserProfile(user=user) for user in users)
+
+
+class WaitlistTests(TestCase):
+    """Tests for the waitlist and FIFO promotion."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.fitness_class = FitnessClass.objects.create(
+            name="HIIT",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="John Doe",
+            total_slots=2,
+            available_slots=2,
+            duration="45 min",
+            Location="Studio A"
+        )
+        self.members = _create_members(5)
+        self.bookings = [reserve_slots(self.fitness_class, member).booking for member in self.members[:2]]
+
+    def test_join_requires_full_class(self):
+        """Test members are told to book directly while slots remain."""
+        release_booking(self.bookings[0])
+        self.fitness_class.refresh_from_db()
+        with self.assertRaises(WaitlistError):
+            join_waitlist(self.fitness_class, self.members[2])
+
+    def test_positions_and_fifo_promotion(self):
+        """Test cancellation promotes the oldest entry and moves everyone up."""
+        entries = [join_waitlist(self.fitness_class, member) for member in self.members[2:]]
+        self.assertEqual([entry.position for entry in entries], [1, 2, 3])
+
+        cancelled, promoted = cancel_booking(self.bookings[0])
+        self.assertTrue(cancelled)
+        self.assertEqual([entry.pk for entry in promoted], [entries[0].pk])
+        self.assertTrue(Booking.objects.filter(fitness_class=self.fitness_class, user_details=self.members[2]).exists())
+
+        self.client.force_authenticate(user=self.members[3].user)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('waitlist'))
+        self.assertEqual(response.data[0]['position'], 1)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 0)
+
+    def test_head_that_does_not_fit_blocks_queue(self):
+        """Test a multi-slot head entry is not skipped by smaller ones behind it."""
+        join_waitlist(self.fitness_class, self.members[2], slots=2)
+        join_waitlist(self.fitness_class, self.members[3])
+        cancelled, promoted = cancel_booking(self.bookings[0])
+        self.assertTrue(cancelled)
+        self.assertEqual(promoted, [])
+        cancelled, promoted = cancel_booking(self.bookings[1])
+        self.assertEqual([entry.user_details_id for entry in promoted], [self.members[2].pk])
+
+    def test_withdrawn_entries_are_skipped(self):
+        """Test members who left the queue are never promoted."""
+        first = join_waitlist(self.fitness_class, self.members[2])
+        second = join_waitlist(self.fitness_class, self.members[3])
+        self.assertTrue(leave_waitlist(first))
+        self.assertFalse(leave_waitlist(first))
+        cancelled, promoted = cancel_booking(self.bookings[0])
+        self.assertEqual([entry.pk for entry in promoted], [second.pk])
+
+    def test_waitlist_endpoint(self):
+        """Test joining and leaving through the API."""
+        self.client.force_authenticate(user=self.members[2].user)
+        response = self.client.post(reverse('waitlist'), {'class_id': self.fitness_class.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['position'], 1)
+        response = self.client.post(reverse('waitlist'), {'class_id': self.fitness_class.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        entry_id = WaitlistEntry.objects.get().pk
+        response = self.client.delete(reverse('waitlist'), {'id': entry_id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(WaitlistEntry.objects.get().status, WaitlistEntry.WITHDRAWN)
+
+    def test_class_edit_keeps_counters(self):
+        """Test a class edit racing a booking and a waitlist join leaves their counters alone."""
+        trainer = User.objects.create_user(username='trainer', password='secret')
+        UserProfile.objects.create(user=trainer, role='trainer')
+        self.client.force_authenticate(user=trainer)
+        release_booking(self.bookings[1])
+        validate = FitnessClassSerializer.is_valid
+
+        def book_during_edit(serializer, *args, **kwargs):
+            reserve_slots(self.fitness_class.pk, self.members[2])
+            join_waitlist(FitnessClass.objects.get(pk=self.fitness_class.pk), self.members[3])
+            return validate(serializer, *args, **kwargs)
+
+        with mock.patch.object(FitnessClassSerializer, 'is_valid', book_during_edit):
+            response = self.client.put(
+                reverse('class-list', args=[self.fitness_class.pk]),
+                {'instructor': 'Jane Smith', 'available_slots': 2}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(
+            (self.fitness_class.instructor, self.fitness_class.available_slots, self.fitness_class.waitlist_issued),
+            ('Jane Smith', 0, 1),
+        )
+        self.assertEqual(join_waitlist(self.fitness_class, self.members[4]).sequence, 2)
+
+        response = self.client.put(
+            reverse('class-list', args=[self.fitness_class.pk]), {'total_slots': 3}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual((self.fitness_class.available_slots, self.fitness_class.waitlist_issued), (1, 2))
+
+
+class WaitlistConcurrencyTests(TransactionTestCase):
+    """Parallel cancellations must promote each waitlisted member exactly once."""
+
+    capacity = 8
+
+    def _cancel(self, booking):
+        try:
+            while True:
+                try:
+                    return cancel_booking(booking)[1]
+                except OperationalError:
+                    # SQLite reports writer contention instead of blocking.
+                    time.sleep(0.001)
+        finally:
+            connection.close()
+
+    def test_parallel_cancellations_promote_once(self):
+        """Test every freed slot goes to exactly one waiting member, in order."""
+        fitness_class = FitnessClass.objects.create(
+            name="YOGA",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="John Doe",
+            total_slots=self.capacity,
+            available_slots=self.capacity,
+            duration="60 min",
+            Location="Studio B"
+        )
+        members = _create_members(self.capacity * 2)
+        bookings = [reserve_slots(fitness_class, member).booking for member in members[:self.capacity]]
+        fitness_class.refresh_from_db()
+        entries = [join_waitlist(fitness_class, member) for member in members[self.capacity:]]
+
+        with ThreadPoolExecutor(max_workers=self.capacity) as pool:
+            promoted = [entry.pk for batch in pool.map(self._cancel, bookings) for entry in batch]
+
+        self.assertEqual(sorted(promoted), sorted(entry.pk for entry in entries))
+        self.assertEqual(
+            WaitlistEntry.objects.filter(status=WaitlistEntry.PROMOTED).count(), self.capacity
+        )
+        fitness_class.refresh_from_db()
+        self.assertEqual(fitness_class.available_slots, 0)
+        self.assertEqual(fitness_class.waitlist_served, fitness_class.waitlist_issued)
+        self.assertEqual(Booking.objects.filter(fitness_class=fitness_class).count(), self.capacity)
+
+    def test_parallel_cancellations_keep_head_first(self):
+        """Test seats freed in parallel go to a multi-slot head, not to entries behind it."""
+        fitness_class = FitnessClass.objects.create(
+            name="HIIT",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="John Doe",
+            total_slots=2,
+            available_slots=2,
+            duration="45 min",
+            Location="Studio A"
+        )
+        members = _create_members(4, prefix='head')
+        bookings = [reserve_slots(fitness_class, member).booking for member in members[:2]]
+        fitness_class.refresh_from_db()
+        head = join_waitlist(fitness_class, members[2], slots=2)
+        join_waitlist(fitness_class, members[3])
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            promoted = [entry.pk for batch in pool.map(self._cancel, bookings) for entry in batch]
+
+        self.assertEqual(promoted, [head.pk])
+        self.assertEqual(
+            list(WaitlistEntry.objects.order_by('sequence').values_list('status', flat=True)),
+            [WaitlistEntry.PROMOTED, WaitlistEntry.WAITING],
+        )
+        fitness_class.refresh_from_db()
+        self.assertEqual(fitness_class.waitlist_served, head.sequence)
+
+
+class ThrottleTests(TestCase):
+    """Tests for the token-bucket throttles on booking and catalogue endpoints."""
+
+    def setUp(self):
+        throttling.reset_backend()
+        self.client = APIClient()
+        self.fitness_class = FitnessClass.objects.create(
+            name="YOGA",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="Jane Doe",
+            total_slots=50,
+            available_slots=50,
+            duration="60 min",
+            Location="Studio A"
+        )
+        self.member = User.objects.create_user(username='member', email='member@example.com')
+        UserProfile.objects.create(user=self.member, role='member')
+
+    def tearDown(self):
+        throttling.reset_backend()
+
+    def test_token_bucket_refill(self):
+        """Test a bucket allows a burst, then one request per refill interval."""
+        state = None
+        for _ in range(3):
+            allowed, wait, state = throttling.take_token(state, 3, 0.5, now=0)
+            self.assertTrue(allowed)
+        allowed, wait, state = throttling.take_token(state, 3, 0.5, now=0)
+        self.assertFalse(allowed)
+        self.assertEqual(wait, 2)
+        allowed, wait, state = throttling.take_token(state, 3, 0.5, now=2)
+        self.assertTrue(allowed)
+
+    @override_settings(THROTTLING={'RATES': {'booking_write': '2/min'}})
+    def test_booking_writes_throttled_per_user(self):
+        """Test booking POSTs share one budget per user and reads are not counted."""
+        self.client.force_authenticate(user=self.member)
+        payload = {"class_id": self.fitness_class.id, "client_name": "Member", "client_email": "member@example.com"}
+        self.client.post(reverse('booking-list'), payload, format='json')
+        self.client.get(reverse('booking-list'))
+        self.client.delete(reverse('booking-list') + '?booking_id=999999')
+        response = self.client.post(reverse('booking-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+        other = User.objects.create_user(username='other', email='other@example.com')
+        UserProfile.objects.create(user=other, role='member')
+        self.client.force_authenticate(user=other)
+        response = self.client.post(reverse('booking-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(THROTTLING={'RATES': {'catalogue_read': '2/min'}})
+    def test_catalogue_reads_throttled_per_ip(self):
+        """Test anonymous reads are keyed on the client address."""
+        for _ in range(2):
+            self.assertEqual(self.client.get(reverse('class-list')).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('class-list')).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        response = self.client.get(reverse('class-list'), REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle-tests'}},
+        THROTTLING={'BACKEND': 'django', 'RATES': {'catalogue_read': '1/min'}},
+    )
+    def test_shared_cache_backend(self):
+        """Test buckets kept in the Django cache survive a backend reset."""
+        self.assertEqual(self.client.get(reverse('class-list')).status_code, status.HTTP_200_OK)
+        throttling.reset_backend()
+        self.assertEqual(self.client.get(reverse('class-list')).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(THROTTLING={'RATES': {'catalogue_read': None}})
+    def test_disabled_scope(self):
+        """Test a scope without a rate is not throttled."""
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse('class-list')).status_code, status.HTTP_200_OK)
+
+class AsyncViewTests(TestCase):
+    """Tests for the async catalogue and booking views served under ASGI."""
+
+    def setUp(self):
+        throttling.reset_backend()
+        catalogue.reset_backend()
+        self.client = APIClient()
+        now = timezone.now()
+        self.classes = [
+            FitnessClass.objects.create(
+                name=name,
+                date_time=now + timedelta(days=i + 1),
+                instructor="Jane Doe",
+                total_slots=10,
+                available_slots=10,
+                duration="60 min",
+                Location="Studio A"
+            )
+            for i, name in enumerate(["YOGA", "HIIT", "ZUMBA"])
+        ]
+        self.member = User.objects.create_user(username='member', email='member@example.com')
+        self.profile = UserProfile.objects.create(user=self.member, role='member')
+        for fitness_class in self.classes[:2]:
+            Booking.objects.create(fitness_class=fitness_class, user_details=self.profile)
+        self.token = f"Bearer {AccessToken.for_user(self.member)}"
+
+    def tearDown(self):
+        throttling.reset_backend()
+        catalogue.reset_backend()
+
+    def _both(self, path):
+        """Fetch ``path`` from the sync and then the async views, without the catalogue cache."""
+        responses = []
+        for urlconf in ('fitness_studio.urls', 'fitness_studio.async_urls'):
+            catalogue.reset_backend()
+            with self.settings(ROOT_URLCONF=urlconf):
+                responses.append(self.client.get(path))
+        return responses
+
+    def test_catalogue_matches_sync(self):
+        """Test the async catalogue renders the same bytes as the sync view."""
+        for path in ('/api/classes/', '/api/classes/?fields=id,name&page_size=2&timezone=UTC'):
+            sync, async_ = self._both(path)
+            self.assertEqual(async_.status_code, status.HTTP_200_OK)
+            self.assertEqual(async_.content, sync.content)
+            self.assertEqual(async_['ETag'], sync['ETag'])
+
+    def test_booking_list_matches_sync(self):
+        """Test the async booking list, paginated or not, matches the sync view."""
+        self.client.force_authenticate(user=self.member)
+        for path in ('/api/bookings/', '/api/bookings/?page_size=1', '/api/bookings/?fields=id,class_id'):
+            sync, async_ = self._both(path)
+            self.assertEqual(async_.status_code, status.HTTP_200_OK)
+            self.assertEqual(async_.json(), sync.json())
+
+    @override_settings(ROOT_URLCONF='fitness_studio.async_urls')
+    async def test_served_by_asgi_handler(self):
+        """Test reads and writes through the ASGI request handler with a bearer token."""
+        headers = {'Authorization': self.token}
+        response = await self.async_client.get('/api/classes/', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(response.content)), 3)
+        cached = await self.async_client.get(
+            '/api/classes/', headers={**headers, 'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = await self.async_client.post(
+            '/api/bookings/', {"class_id": self.classes[2].id},
+            content_type='application/json', headers=headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        booking_id = json.loads(response.content)['id']
+        response = await self.async_client.get('/api/bookings/', headers=headers)
+        self.assertEqual(len(json.loads(response.content)), 3)
+
+        response = await self.async_client.delete(
+            '/api/bookings/', {"id": booking_id}, content_type='application/json', headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await Booking.objects.filter(pk=booking_id).aexists())
+
+    @override_settings(ROOT_URLCONF='fitness_studio.async_urls')
+    async def test_permissions_apply(self):
+        """Test the async views keep the sync views' permissions."""
+        response = await self.async_client.get('/api/bookings/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await self.async_client.post(
+            '/api/classes/', {"name": "YOGA"}, content_type='application/json',
+            headers={'Authorization': self.token},
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+@override_settings(REPLICA_ROUTING={'ENABLED': True, 'STICKY_SECONDS': 60})
+class ReplicaRoutingTests(TransactionTestCase):
+    """Tests for sending catalogue and history reads to the read replica."""
+    databases = {'default', db_router.REPLICA}
+
+    def setUp(self):
+        throttling.reset_backend()
+        catalogue.reset_backend()
+        db_router.health.reset()
+        cache.clear()
+        self.client = APIClient()
+        self.fitness_class = FitnessClass.objects.create(
+            name="YOGA",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="Jane Doe",
+            total_slots=10,
+            available_slots=10,
+            duration="60 min",
+            Location="Studio A"
+        )
+        self.member = User.objects.create_user(username='member', email='member@example.com')
+        UserProfile.objects.create(user=self.member, role='member')
+        self.client.force_authenticate(user=self.member)
+        cache.clear()
+
+    def tearDown(self):
+        db_router.health.reset()
+        cache.clear()
+
+    def _queries(self, method, *args, **kwargs):
+        """Return ``(response, primary_queries, replica_queries)`` for one request."""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections[db_router.REPLICA]) as replica:
+                response = getattr(self.client, method)(*args, **kwargs)
+        return response, len(primary), len(replica)
+
+    def test_router(self):
+        """Test only reads inside ``reading_from_replica`` are routed, and the replica is never migrated."""
+        router = db_router.ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Booking))
+        with db_router.reading_from_replica():
+            self.assertEqual(router.db_for_read(Booking), db_router.REPLICA)
+            self.assertIsNone(router.db_for_write(Booking))
+        self.assertFalse(router.allow_migrate(db_router.REPLICA, 'booking'))
+        self.assertTrue(router.allow_migrate('default', 'booking'))
+
+    def test_history_reads_use_replica(self):
+        """Test booking history and the catalogue are read from the replica."""
+        response, primary, replica = self._queries('get', reverse('booking-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        _, primary, replica = self._queries('get', reverse('class-list'))
+        self.assertEqual((primary, replica), (0, 1))
+
+    def test_reads_stick_to_primary_after_write(self):
+        """Test a user's reads go to the primary right after they write, others' do not."""
+        response = self.client.post(reverse('booking-list'), {"class_id": self.fitness_class.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response, primary, replica = self._queries('get', reverse('booking-list'))
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(replica, 0)
+        # The booking changed the catalogue, so its next render comes from the primary too.
+        self.client.force_authenticate(user=None)
+        _, primary, replica = self._queries('get', reverse('class-list'))
+        self.assertEqual((primary, replica), (1, 0))
+
+        other = User.objects.create_user(username='other')
+        UserProfile.objects.create(user=other, role='member')
+        self.client.force_authenticate(user=other)
+        _, primary, replica = self._queries('get', reverse('booking-list'))
+        self.assertEqual(primary, 0)
+
+    def test_falls_back_when_replica_lags_or_is_missing(self):
+        """Test reads stay on the primary while the replica lags or cannot be reached."""
+        for lag in (10.0, None):
+            db_router.health.reset()
+            with mock.patch.object(db_router, 'replica_lag', return_value=lag) as probe:
+                _, primary, replica = self._queries('get', reverse('booking-list'))
+                self._queries('get', reverse('booking-list'))
+            self.assertEqual(replica, 0)
+            self.assertGreater(primary, 0)
+            self.assertEqual(probe.call_count, 1)
+
+    @override_settings(REPLICA_ROUTING={'ENABLED': False})
+    def test_disabled_without_replica(self):
+        """Test nothing is routed or pinned when no replica is configured."""
+        _, primary, replica = self._queries('get', reverse('booking-list'))
+        self.assertEqual(replica, 0)
+        db_router.pin('catalogue')
+        self.assertFalse(db_router.is_pinned('catalogue'))
+
+    def test_pins_need_shared_cache(self):
+        """Test the system check refuses routing whose pins would stay in one process."""
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(REPLICA_ROUTING={'ENABLED': True}, CACHES=local):
+            self.assertEqual([error.id for error in db_router.check_pin_cache(None)], ['fitness_studio.E001'])
+        with override_settings(REPLICA_ROUTING={'ENABLED': True}, CACHES=shared):
+            self.assertEqual(db_router.check_pin_cache(None), [])
+        with override_settings(REPLICA_ROUTING={'ENABLED': False}, CACHES=local):
+            self.assertEqual(db_router.check_pin_cache(None), [])
+
+    @override_settings(ROOT_URLCONF='fitness_studio.async_urls')
+    def test_async_views_use_replica(self):
+        """Test the async booking list routes its async ORM reads to the replica."""
+        token = f"Bearer {AccessToken.for_user(self.member)}"
+        with CaptureQueriesContext(connections[db_router.REPLICA]) as replica:
+            response = async_to_sync(self.async_client.get)('/api/bookings/', headers={'Authorization': token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(len(replica), 0)
+
+
+class DatabasePoolTests(TestCase):
+    """Tests for the connection pool statistics endpoint."""
+
+    def setUp(self):
+        throttling.reset_backend()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        UserProfile.objects.create(user=self.admin, role='admin')
+        self.member = User.objects.create_user(username='member', email='member@example.com')
+        UserProfile.objects.create(user=self.member, role='member')
+
+    def test_staff_only(self):
+        """Test accounts without staff status, admin role or not, cannot read the pool statistics."""
+        for user in (self.member, User.objects.create_user(username='role-admin', email='role-admin@example.com')):
+            UserProfile.objects.get_or_create(user=user, defaults={'role': 'admin'})
+            self.client.force_authenticate(user=user)
+            response = self.client.get(reverse('db-pool-stats'))
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unpooled_database(self):
+        """Test a database without a pool reports only that, and persistent connections are health-checked."""
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('db-pool-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'alias': 'default', 'pooled': False})
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+
+    def test_pool_stats(self):
+        """Test checked-out connections and the average wait are derived from the pool's counters."""
+        pool = SimpleNamespace(min_size=2, max_size=10, get_stats=lambda: {
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 6, 'pool_available': 1,
+            'requests_waiting': 3, 'requests_num': 40, 'requests_queued': 8, 'requests_wait_ms': 100,
+            'requests_errors': 1, 'connections_num': 7, 'connections_lost': 1, 'returns_bad': 1,
+        })
+        self.client.force_authenticate(user=self.admin)
+        with mock.patch.object(db_pool, 'connection_pool', return_value=pool):
+            stats = self.client.get(reverse('db-pool-stats')).json()
+        self.assertTrue(stats['pooled'])
+        self.assertEqual(stats['checked_out'], 5)
+        self.assertEqual(stats['waiting'], 3)
+        self.assertEqual(stats['wait_ms_avg'], 12.5)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['connections_lost'], 2)
+
+
+class InstrumentationTests(TestCase):
+    """Tests for request timings, Server-Timing headers and the metrics endpoint."""
+
+    def setUp(self):
+        throttling.reset_backend()
+        catalogue.reset_backend()
+        instrumentation.registry.reset()
+        self.client = APIClient()
+        FitnessClass.objects.create(
+            name="YOGA",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="Jane Doe",
+            total_slots=10,
+            available_slots=10,
+            duration="60 min",
+            Location="Studio A"
+        )
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', is_staff=True)
+        UserProfile.objects.create(user=self.admin, role='admin')
+        self.member = User.objects.create_user(username='member', email='member@example.com')
+        UserProfile.objects.create(user=self.member, role='member')
+
+    def tearDown(self):
+        instrumentation.registry.reset()
+
+    def _server_timing(self, response):
+        return dict(
+            (entry.split(';')[0], entry) for entry in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_header(self):
+        """Test a catalogue render reports its queries, serialization and total time."""
+        response = self.client.get(reverse('class-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        timing = self._server_timing(response)
+        self.assertRegex(timing['db'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"$')
+        self.assertIn('serialize', timing)
+        self.assertIn('total', timing)
+
+    def test_nested_phases_are_exclusive(self):
+        """Test queries run while serializing count as db time only."""
+        with instrumentation.measure() as timings:
+            with instrumentation.timed('serialize'):
+                time.sleep(0.02)
+                with instrumentation.timed('db', queries=1):
+                    time.sleep(0.05)
+        self.assertEqual(timings.queries, 1)
+        self.assertGreaterEqual(timings.phases['db'], 0.05)
+        self.assertLess(timings.phases['serialize'], 0.05)
+        self.assertAlmostEqual(sum(timings.phases.values()), timings.total, places=3)
+
+    def test_histogram_quantiles(self):
+        """Test quantiles are interpolated within the bucket holding their rank."""
+        histogram = instrumentation.Histogram((0.1, 0.2, 0.4))
+        for value in [0.05] * 50 + [0.15] * 40 + [0.3] * 10:
+            histogram.observe(value)
+        self.assertAlmostEqual(histogram.quantile(0.5), 0.1)
+        self.assertAlmostEqual(histogram.quantile(0.95), 0.3)
+        self.assertEqual(list(histogram.cumulative()), [50, 90, 100, 100])
+
+    def test_metrics_staff_only(self):
+        """Test accounts without staff status, admin role or not, cannot read the metrics."""
+        self.member.profile.role = 'admin'
+        self.member.profile.save()
+        self.client.force_authenticate(user=self.member)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_exposition(self):
+        """Test requests are folded into per-endpoint histograms and quantiles."""
+        for _ in range(3):
+            self.client.get(reverse('class-list'))
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        labels = 'endpoint="class-list",method="GET"'
+        self.assertIn(f'fitness_request_duration_seconds_count{{{labels},phase="total"}} 3', body)
+        self.assertIn(f'fitness_request_duration_seconds_bucket{{{labels},phase="db",le="+Inf"}} 3', body)
+        self.assertIn(f'fitness_request_duration_quantile_seconds{{{labels},phase="total",quantile="0.99"}}', body)
+        self.assertIn(f'fitness_requests_total{{{labels},status="200"}} 3', body)
+        self.assertRegex(body, rf'fitness_request_db_queries_total{{{labels}}} [1-9]')
+
+    @override_settings(INSTRUMENTATION={'METRICS_TOKEN': 'scrape-secret'})
+    def test_metrics_token(self):
+        """Test scrapers authenticate with the metrics token, and a wrong token is refused."""
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(INSTRUMENTATION={'ENABLED': False})
+    def test_disabled(self):
+        """Test nothing is measured when instrumentation is off."""
+        response = self.client.get(reverse('class-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(instrumentation.registry.snapshot(), [])
+
+
+class RenderingTests(TestCase):
+    """The row renderers must produce the serializers' bytes exactly."""
+
+    def setUp(self):
+        start = timezone.now().replace(microsecond=123456) + timedelta(days=1)
+        rows = [
+            ('YOGA', 'Jane Doe', '60 min', 'Studio A'),
+            ('ZUMBA', 'Zoë Ñúñez \u2028 "quoted" \\ 日本', None, None),
+            ('HIIT', '', '', 'Studio \u2029 B'),
+            ('PILATES', 'Unlisted type', '45 min', 'Studio C'),
+        ]
+        self.classes = FitnessClass.objects.bulk_create([
+            FitnessClass(
+                name=name, date_time=start + timedelta(hours=index), instructor=instructor,
+                total_slots=20, available_slots=20 - index, duration=duration, Location=location
+            )
+            for index, (name, instructor, duration, location) in enumerate(rows)
+        ])
+        configure_slot_shards(self.classes[0], 4)
+        ClassSlotShard.objects.filter(fitness_class=self.classes[0], index=0).update(available_slots=1)
+        profile = UserProfile.objects.create(user=User.objects.create_user(username='member', password='secret'))
+        Booking.objects.bulk_create([
+            Booking(fitness_class=fitness_class, user_details=profile, booking_time=start - timedelta(days=index))
+            for index, fitness_class in enumerate(self.classes)
+        ])
+
+    def _projections(self, names):
+        return [None, list(names)[::-1]] + [[name] for name in names]
+
+    def _assert_classes_match(self):
+        for fields in self._projections(CLASS_FIELDS):
+            instances = apply_shard_availability(list(FitnessClass.objects.order_by('date_time')))
+            expected = JSONRenderer().render(FitnessClassSerializer(instances, many=True, fields=fields).data)
+            rows = list(FitnessClass.objects.order_by('date_time').values_list(*class_columns(fields)))
+            self.assertEqual(dumps(class_data(rows, fields, class_availability(rows, fields))), expected, fields)
+
+    def _assert_bookings_match(self):
+        for fields in self._projections(BOOKING_FIELDS):
+            bookings = Booking.objects.order_by('id')
+            expected = JSONRenderer().render(
+                BookingSerializer(bookings.select_related('fitness_class'), many=True, fields=fields).data
+            )
+            rows = bookings.values_list(*booking_columns(fields))
+            self.assertEqual(dumps(booking_data(rows, fields)), expected, fields)
+
+    def test_classes_match_serializer(self):
+        """Test every projection of the class list, including labels, nulls, escapes and shards."""
+        self._assert_classes_match()
+        rows = FitnessClass.objects.order_by('date_time').values_list(*class_columns())
+        self.assertEqual(class_data(rows, available=class_availability(rows))[0]['available_slots'], 16)
+
+    def test_bookings_match_serializer(self):
+        """Test every projection of the booking list, including the nested class."""
+        self._assert_bookings_match()
+
+    def test_time_zone_and_format(self):
+        """Test datetimes follow the active time zone and DATETIME_FORMAT."""
+        with timezone.override('Asia/Kolkata'):
+            self._assert_classes_match()
+            self._assert_bookings_match()
+        for output_format in ('iso-8601', '%d/%m/%Y %H:%M', None):
+            with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DATETIME_FORMAT': output_format}):
+                self._assert_classes_match()
+                self._assert_bookings_match()
+
+    def test_catalogue_response(self):
+        """Test the catalogue endpoint serves the serializer's rendering of its page."""
+        catalogue.reset_backend()
+        response = APIClient().get(reverse('class-list'), {'page_size': 2})
+        instances = apply_shard_availability(list(FitnessClass.objects.order_by('date_time', 'id')[:2]))
+        body = json.loads(response.content)
+        with timezone.override(get_zone('Asia/Kolkata')):
+            expected = JSONRenderer().render({
+                'results': FitnessClassSerializer(instances, many=True).data,
+                'next_cursor': body['next_cursor'],
+            })
+        self.assertEqual(response.content, expected)
+
+
+class TimezoneRenderingTests(TestCase):
+    """Tests for rendering class times in the requested zone."""
+
+    zones = ('Europe/London', 'America/New_York', 'Australia/Lord_Howe', 'Asia/Kolkata', 'UTC')
+
+    def _times(self, start, count, step):
+        return [start + step * index for index in range(count)]
+
+    def test_zone_lookup_is_memoised(self):
+        """Test zones are looked up once per name and unknown names are rejected."""
+        self.assertIs(get_zone('Europe/Paris'), get_zone('Europe/Paris'))
+        for name in ('Invalid/Timezone', '../etc/passwd', ''):
+            with self.assertRaises(UnknownTimeZoneError):
+                get_zone(name)
+
+    def test_segments_across_dst(self):
+        """Test every time gets the zone's own offset and name around DST transitions."""
+        start = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        values = self._times(start, 24 * 4 * 300, timedelta(minutes=15))
+        for name in self.zones:
+            zone = get_zone(name)
+            segments = ZoneSegments(zone, values)
+            for value in values:
+                local = value.astimezone(zone)
+                self.assertEqual(segments.offset(value), (local.utcoffset(), local.tzname()), (name, value))
+
+    def test_one_offset_computation_per_segment(self):
+        """Test 10k times over two transitions resolve the zone rules a few dozen times, not per row."""
+        zone = get_zone('Europe/London')
+        values = self._times(datetime(2025, 10, 20, tzinfo=dt_timezone.utc), 10000, timedelta(minutes=30))
+        with mock.patch.object(timezones, '_offset', wraps=timezones._offset) as compute:
+            segments = ZoneSegments(zone, reversed(values))
+        self.assertEqual([name for _, name in segments.offsets], ['BST', 'GMT', 'BST'])
+        self.assertEqual(segments.starts[1:], [
+            datetime(2025, 10, 26, 1, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 29, 1, tzinfo=dt_timezone.utc),
+        ])
+        self.assertLess(compute.call_count, 100)
+
+    def test_catalogue_in_requested_zone(self):
+        """Test the catalogue shows class times in the requested zone, across its DST changes."""
+        start = timezone.now().replace(minute=30, second=0, microsecond=0) + timedelta(days=1)
+        FitnessClass.objects.bulk_create([
+            FitnessClass(
+                name='YOGA', date_time=value, instructor='Jane Doe', total_slots=10, available_slots=10,
+                duration='60 min', Location='Studio A'
+            )
+            for value in self._times(start, 2 * 370, timedelta(hours=12))
+        ])
+        instances = list(FitnessClass.objects.order_by('date_time'))
+        for name in self.zones:
+            catalogue.reset_backend()
+            response = APIClient().get(reverse('class-list'), {'timezone': name})
+            with timezone.override(get_zone(name)):
+                expected = JSONRenderer().render(FitnessClassSerializer(instances, many=True).data)
+            self.assertEqual(response.content, expected, name)
+        first = json.loads(response.content)[0]['date_time']
+        self.assertTrue(first.endswith(' UTC'), first)
+
+    def test_new_york_times(self):
+        """Test wall-clock times and abbreviations either side of a spring-forward gap."""
+        zone = get_zone('America/New_York')
+        values = self._times(datetime(2026, 3, 8, 6, 30, tzinfo=dt_timezone.utc), 2, timedelta(hours=1))
+        rows = [(index, value, 0) for index, value in enumerate(values)]
+        self.assertEqual(
+            [item['date_time'] for item in class_data(rows, ['date_time'], zone=zone)],
+            ['2026-03-08 01:30:00 EST', '2026-03-08 03:30:00 EDT'],
+        )
+
+
+class ScheduleTests(TestCase):
+    """Tests for the per-member schedule projection and its endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret')
+        self.profile = UserProfile.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        start = timezone.now() + timedelta(days=1)
+        self.classes = FitnessClass.objects.bulk_create([
+            FitnessClass(
+                name=name, date_time=start + timedelta(hours=index), instructor='Jane Doe',
+                total_slots=2, available_slots=2, duration='60 min', Location='Studio A'
+            )
+            for index, name in enumerate(['YOGA', 'YOGA', 'HIIT', 'ZUMBA'])
+        ])
+
+    def _book(self, fitness_class, profile=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return reserve_slots(fitness_class, profile or self.profile).booking
+
+    def _schedule(self):
+        response = self.client.get(reverse('schedule'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def _rebuild(self, *args):
+        out = StringIO()
+        call_command('rebuild_schedule', *args, stdout=out)
+        return out.getvalue()
+
+    def test_booking_and_cancellation_update_schedule(self):
+        """Test bookings appear with their class details and counts, and leave on cancellation."""
+        bookings = [self._book(fitness_class) for fitness_class in self.classes[:3]]
+        data = self._schedule()
+        self.assertEqual([session['booking_id'] for session in data['upcoming']], [b.pk for b in bookings])
+        first = data['upcoming'][0]
+        self.assertEqual(
+            (first['class_id'], first['name'], first['class_type'], first['instructor'], first['slots']),
+            (self.classes[0].pk, 'YOGA', 'Yoga', 'Jane Doe', 1),
+        )
+        self.assertEqual(data['counts'], {'HIIT': {'booked': 1, 'upcoming': 1}, 'YOGA': {'booked': 2, 'upcoming': 2}})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_booking(bookings[2])
+        data = self._schedule()
+        self.assertEqual(len(data['upcoming']), 2)
+        self.assertEqual(data['counts'], {'YOGA': {'booked': 2, 'upcoming': 2}})
+        self.assertIn('consistent', self._rebuild('--check'))
+
+    def test_past_sessions_only_counted(self):
+        """Test classes that have started drop out of the upcoming list but stay in the counts."""
+        self._book(self.classes[0])
+        self._book(self.classes[3])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.classes[0].date_time = timezone.now() - timedelta(hours=1)
+            # Bypass full_clean, which rejects classes in the past; the signal still fires.
+            super(FitnessClass, self.classes[0]).save()
+        data = self._schedule()
+        self.assertEqual([session['name'] for session in data['upcoming']], ['ZUMBA'])
+        self.assertEqual(data['counts'], {'YOGA': {'booked': 1, 'upcoming': 0}, 'ZUMBA': {'booked': 1, 'upcoming': 1}})
+
+    def test_class_changes_propagate(self):
+        """Test editing a class updates the sessions and counts of its members."""
+        self._book(self.classes[0])
+        self.classes[0].name, self.classes[0].instructor = 'HIIT', 'John Roe'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.classes[0].save()
+        data = self._schedule()
+        self.assertEqual((data['upcoming'][0]['name'], data['upcoming'][0]['instructor']), ('HIIT', 'John Roe'))
+        self.assertEqual(data['counts'], {'HIIT': {'booked': 1, 'upcoming': 1}})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.classes[0].delete()
+        self.assertEqual(self._schedule(), {'upcoming': [], 'counts': {}})
+
+    def test_waitlist_promotion_enters_schedule(self):
+        """Test a member promoted from the waitlist gets the session in their schedule."""
+        others = _create_members(2, prefix='other')
+        taken = [self._book(self.classes[0], profile) for profile in others]
+        join_waitlist(self.classes[0], self.profile)
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_booking(taken[0])
+        self.assertEqual([session['class_id'] for session in self._schedule()['upcoming']], [self.classes[0].pk])
+
+    def test_read_cost_does_not_grow_with_history(self):
+        """Test the schedule reads the same queries and rows whatever the history length."""
+        self._book(self.classes[3])
+        past = FitnessClass.objects.bulk_create([
+            FitnessClass(
+                name='YOGA', date_time=timezone.now() - timedelta(days=index + 1), instructor='Jane Doe',
+                total_slots=5, available_slots=4
+            )
+            for index in range(50)
+        ])
+        Booking.objects.bulk_create(Booking(fitness_class=fitness_class, user_details=self.profile) for fitness_class in past)
+        self._rebuild()
+        # Upcoming entries and summaries.
+        with self.assertNumQueries(2):
+            data = self._schedule()
+        self.assertEqual(len(data['upcoming']), 1)
+        self.assertEqual(data['counts']['YOGA'], {'booked': 50, 'upcoming': 0})
+
+    def test_refresh_cost_does_not_grow_with_history(self):
+        """Test a booking refresh adjusts the summaries instead of recounting the member's bookings."""
+        past = FitnessClass.objects.bulk_create([
+            FitnessClass(
+                name='YOGA', date_time=timezone.now() - timedelta(days=index + 1), instructor='Jane Doe',
+                total_slots=5, available_slots=4
+            )
+            for index in range(50)
+        ])
+        Booking.objects.bulk_create(Booking(fitness_class=fitness_class, user_details=self.profile) for fitness_class in past)
+        self._rebuild()
+        booking_id = Booking.objects.create(fitness_class=self.classes[0], user_details=self.profile).pk
+        with CaptureQueriesContext(connection) as queries:
+            schedule.refresh_booking(booking_id, self.profile.pk)
+        self.assertFalse([query['sql'] for query in queries if 'COUNT(' in query['sql'].upper()])
+
+        # Refreshing twice changes nothing more, before or after the cancellation.
+        schedule.refresh_booking(booking_id, self.profile.pk)
+        self.assertEqual(BookingSummary.objects.get(class_type='YOGA').booked, 51)
+        Booking.objects.filter(pk=booking_id).delete()
+        schedule.refresh_booking(booking_id, self.profile.pk)
+        schedule.refresh_booking(booking_id, self.profile.pk)
+        self.assertEqual(BookingSummary.objects.get(class_type='YOGA').booked, 50)
+        self.assertIn('consistent', self._rebuild('--check'))
+
+    def test_rebuild_reconciles_drift(self):
+        """Test the rebuild command reports and repairs missing, stale and orphaned rows."""
+        booking = self._book(self.classes[0])
+        Booking.objects.bulk_create([Booking(fitness_class=self.classes[1], user_details=self.profile)])
+        ScheduleEntry.objects.filter(pk=booking.pk).update(instructor='Someone else')
+        BookingSummary.objects.create(user_details=self.profile, class_type='ZUMBA', booked=3)
+
+        with self.assertRaises(CommandError):
+            self._rebuild('--check')
+        self.assertEqual(ScheduleEntry.objects.count(), 1)
+        output = self._rebuild()
+        self.assertIn('entries fixed: 1 missing, 1 stale, 0 orphaned', output)
+        self.assertIn('summaries fixed: 0 missing, 1 stale, 1 orphaned', output)
+        self.assertIn('consistent', self._rebuild('--check'))
+        self.assertEqual(self._schedule()['counts'], {'YOGA': {'booked': 2, 'upcoming': 2}})
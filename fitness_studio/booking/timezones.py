@@ -0,0 +1,71 @@
+"""
+Time zone lookup and batched conversion of class times.
+
+Catalogue pages are rendered in the zone the client asks for. Zones are
+looked up once per name, and a page's times are not converted through the
+zone rules row by row: ``ZoneSegments`` computes the offset at both ends of
+the sorted times and bisects until every part has a single offset, so a
+page costs about one offset computation per DST segment and each row is
+shifted by a fixed offset.
+"""
+from bisect import bisect_right
+from datetime import timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = 'Asia/Kolkata'
+
+# A range no longer than this with the same offset at both ends is taken as
+# one segment: zones do not change their offset and back within a week.
+SEGMENT_SPAN = timedelta(days=7)
+
+
+class UnknownTimeZoneError(ValueError):
+    """Raised for a time zone name the zone database does not know."""
+
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    """Return the ``ZoneInfo`` for ``name``; only known zones are cached."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        raise UnknownTimeZoneError(name)
+
+
+def _offset(zone, value):
+    local = value.astimezone(zone)
+    return local.utcoffset(), local.tzname()
+
+
+class ZoneSegments:
+    """
+    The ``(utcoffset, tzname)`` of ``zone`` over a batch of aware datetimes.
+
+    ``offset(value)`` is only defined for the values the batch was built from.
+    """
+
+    def __init__(self, zone, values):
+        self.starts = []
+        self.offsets = []
+        values = sorted(set(values))
+        if values:
+            self._split(zone, values, 0, len(values) - 1, _offset(zone, values[0]), _offset(zone, values[-1]))
+
+    def _add(self, value, offset):
+        if not self.offsets or self.offsets[-1] != offset:
+            self.starts.append(value)
+            self.offsets.append(offset)
+
+    def _split(self, zone, values, lo, hi, lo_offset, hi_offset):
+        self._add(values[lo], lo_offset)
+        if hi - lo <= 1 or (lo_offset == hi_offset and values[hi] - values[lo] <= SEGMENT_SPAN):
+            self._add(values[hi], hi_offset)
+            return
+        mid = (lo + hi) // 2
+        mid_offset = _offset(zone, values[mid])
+        self._split(zone, values, lo, mid, lo_offset, mid_offset)
+        self._split(zone, values, mid, hi, mid_offset, hi_offset)
+
+    def offset(self, value):
+        return self.offsets[bisect_right(self.starts, value) - 1]
@@ -2,10 +2,13 @@
 URL configuration for booking app.
 """
 from django.urls import path
-from .views import FitnessClassView, BookingView
+from .views import FitnessClassView, FitnessClassBulkView, BookingView, ScheduleView, WaitlistView
 
 urlpatterns = [
     path('classes/', FitnessClassView.as_view(), name='class-list'),
     path('classes/<int:pk>/', FitnessClassView.as_view(), name='class-list'),
+    path('classes/bulk/', FitnessClassBulkView.as_view(), name='class-bulk'),
     path('bookings/', BookingView.as_view(), name='booking-list'),
+    path('schedule/', ScheduleView.as_view(), name='schedule'),
+    path('waitlist/', WaitlistView.as_view(), name='waitlist'),
 ]
\ No newline at end of file
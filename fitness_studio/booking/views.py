@@ -6,36 +6,141 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from django.db import transaction
-from .models import FitnessClass, Booking
-from .serializers import FitnessClassSerializer, BookingSerializer
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from dataclasses import dataclass
+from fitness_studio.db_router import replica_reads
+from fitness_studio.instrumentation import timed
+from fitness_studio.throttling import BookingWriteThrottle, CatalogueReadThrottle
+from userprofile.permissions import IsMember, IsTrainer, ReadOnly
+from . import catalogue
+from .models import FitnessClass, Booking, WaitlistEntry
+from .reservations import (
+    reserve_slots,
+    configure_slot_shards,
+)
+from .pagination import (
+    PaginationError,
+    paginate,
+    parse_list_params,
+)
+from .rendering import (
+    BOOKING_FIELDS,
+    CLASS_FIELDS,
+    booking_columns,
+    booking_data,
+    booking_key,
+    class_availability,
+    class_columns,
+    class_data,
+    class_key,
+    dumps,
+)
+from .schedule import schedule_data
+from .scheduling import BatchError, expand_recurrence, validate_batch, create_batch
+from .serializers import FitnessClassSerializer, BookingSerializer, WaitlistEntrySerializer
+from .timezones import DEFAULT_TIMEZONE, UnknownTimeZoneError, get_zone
+from .waitlist import WaitlistError, cancel_booking, join_waitlist, leave_waitlist
 import logging
-import pytz
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class CatalogueParams:
+    """Validated query parameters of a catalogue request."""
+
+    timezone_name: str
+    user_timezone: object
+    fitnessclass_type: str
+    fields: list
+    paginated: bool
+    cursor: str
+    page_size: int
+
+    @property
+    def key(self):
+        return (
+            self.fitnessclass_type, self.timezone_name,
+            self.fields and ','.join(self.fields), self.cursor, self.page_size,
+        )
+
+
+def catalogue_request(query_params):
+    """Validate catalogue parameters; returns ``(params, None)`` or ``(None, error_response)``."""
+    timezone_name = query_params.get('timezone', DEFAULT_TIMEZONE)
+    try:
+        user_timezone = get_zone(timezone_name)
+    except UnknownTimeZoneError:
+        logger.warning(f"Invalid timezone provided: {timezone_name}")
+        return None, Response(
+            {"error": "Invalid timezone"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        fields, paginated, cursor, page_size = parse_list_params(query_params, CLASS_FIELDS)
+    except PaginationError as e:
+        return None, Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return CatalogueParams(
+        timezone_name, user_timezone, query_params.get('fitnessclass_type', None),
+        fields, paginated, cursor, page_size,
+    ), None
+
+
+def catalogue_queryset(params):
+    """Rows of the upcoming classes matching ``params``, unordered and unpaginated."""
+    classes = FitnessClass.objects.filter(date_time__gt=timezone.now())
+    if params.fitnessclass_type is not None:
+        classes = classes.filter(name=params.fitnessclass_type)
+    return classes.values_list(*class_columns(params.fields))
+
+
+@timed('serialize')
+def render_catalogue(params, rows, next_cursor, available=None):
+    """Render one catalogue page to the JSON bytes that are cached and served."""
+    data = class_data(rows, params.fields, available, params.user_timezone)
+    if params.paginated:
+        data = {'results': data, 'next_cursor': next_cursor}
+    return dumps(data)
+
+
+def bookings_queryset(user, fields):
+    """Rows of the bookings of ``user`` with their classes, loading only what ``fields`` renders."""
+    return Booking.objects.filter(user_details__user=user).values_list(*booking_columns(fields))
+
+
+@timed('serialize')
+def bookings_data(rows, fields):
+    return booking_data(rows, fields)
+
 class FitnessClassView(APIView):
     """Handles CRUD operations for fitness classes."""
+    permission_classes = [ReadOnly | IsTrainer]
+    throttle_classes = [CatalogueReadThrottle]
 
+    @replica_reads('catalogue')
     def get(self, request):
         """Retrieve upcoming fitness classes with optional timezone filtering."""
         try:
-            timezone_name = request.query_params.get('timezone', 'Asia/Kolkata')
-            fitnessclass_type= request.query_params.get('fitnessclass_type', None)
-            try:
-                user_timezone = pytz.timezone(timezone_name)
-            except pytz.exceptions.UnknownTimeZoneError:
-                logger.warning(f"Invalid timezone provided: {timezone_name}")
-                return Response(
-                    {"error": "Invalid timezone"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            params, error = catalogue_request(request.query_params)
+            if error:
+                return error
 
-            classes = FitnessClass.objects.filter(date_time__gt=timezone.now()).order_by('date_time')
-            if fitnessclass_type is not None:
-                classes = classes.filter(name=fitnessclass_type)
-            serializer = FitnessClassSerializer(classes, many=True, context={'timezone': user_timezone})
-            logger.info(f"Retrieved {len(classes)} classes for timezone {timezone_name}")
-            return Response(serializer.data)
+            cache_key = catalogue.catalogue_key(*params.key)
+            entry = catalogue.get_entry(cache_key)
+            if entry is None:
+                rows = catalogue_queryset(params)
+                if params.paginated:
+                    rows, next_cursor = paginate(rows, 'date_time', params.cursor, params.page_size, class_key)
+                else:
+                    rows, next_cursor = list(rows.order_by('date_time')), None
+                entry = catalogue.store(
+                    cache_key,
+                    render_catalogue(params, rows, next_cursor, class_availability(rows, params.fields)),
+                    valid_until=class_key(rows[0])[0] if rows else None,
+                )
+                logger.info(f"Rendered {len(rows)} classes for timezone {params.timezone_name}")
+            return catalogue.respond(request, entry)
 
         except Exception as e:
             logger.error(f"Error retrieving classes: {str(e)}", exc_info=True)
@@ -48,16 +153,11 @@ class FitnessClassView(APIView):
         """Create a new fitness class."""
         try:
             serializer = FitnessClassSerializer(data=request.data)
-            user_role=request.user.profile.role
-            if user_role !='trainer':
-                logger.warning("Unauthorized attempt to create class by non-trainer user")
-                return Response(
-                    {"error": "Only trainers can create fitness classes"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
             if serializer.is_valid():
                 with transaction.atomic():
-                    serializer.save()
+                    fitness_class = serializer.save()
+                    if fitness_class.slot_shard_count:
+                        configure_slot_shards(fitness_class, fitness_class.slot_shard_count)
                     logger.info(f"Created fitness class: {request.data.get('name')}")
                     return Response(serializer.data, status=status.HTTP_201_CREATED)
             logger.warning(f"Class creation failed: {serializer.errors}")
@@ -81,23 +181,33 @@ class FitnessClassView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            try:
-                fitness_class = FitnessClass.objects.get(id=class_id)
-            except FitnessClass.DoesNotExist:
-                logger.warning(f"Class not found: ID {class_id}")
-                return Response(
-                    {"error": "Class not found"},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+            with transaction.atomic():
+                # The row lock makes bookings and waitlist joins wait for this edit,
+                # and the serializer writes back only the edited columns, so the
+                # slot and waitlist counters are never overwritten with stale values.
+                fitness_class = FitnessClass.objects.select_for_update().filter(id=class_id).first()
+                if fitness_class is None:
+                    logger.warning(f"Class not found: ID {class_id}")
+                    return Response(
+                        {"error": "Class not found"},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
 
-            serializer = FitnessClassSerializer(fitness_class, data=request.data, partial=True)
-            if serializer.is_valid():
-                with transaction.atomic():
-                    if 'total_slots' in request.data:
-                        current_bookings = fitness_class.bookings.count()
-                        new_total_slots = int(request.data['total_slots'])
-                        fitness_class.available_slots = max(0, new_total_slots - current_bookings)
+                serializer = FitnessClassSerializer(fitness_class, data=request.data, partial=True)
+                if serializer.is_valid():
+                    # Remaining seats are derived from the bookings, never taken from the client.
+                    serializer.validated_data.pop('available_slots', None)
+                    if 'total_slots' in serializer.validated_data:
+                        current_bookings = fitness_class.bookings.aggregate(
+                            booked=Coalesce(Sum('slots'), 0)
+                        )['booked']
+                        new_total_slots = serializer.validated_data['total_slots']
+                        serializer.validated_data['available_slots'] = max(0, new_total_slots - current_bookings)
                     serializer.save()
+                    if 'slot_shard_count' in request.data or (
+                        fitness_class.slot_shard_count and 'total_slots' in request.data
+                    ):
+                        configure_slot_shards(fitness_class, fitness_class.slot_shard_count)
                     logger.info(f"Updated fitness class: {request.data.get('name', fitness_class.name)}")
                     return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -111,16 +221,66 @@ class FitnessClassView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class FitnessClassBulkView(APIView):
+    """Schedules many fitness classes, or a recurring series, in one request."""
+    permission_classes = [IsTrainer]
+
+    def post(self, request):
+        """Create a batch of classes from a list or a weekly recurrence rule."""
+        try:
+            try:
+                if 'recurrence' in request.data:
+                    items = expand_recurrence(request.data['recurrence'])
+                elif isinstance(request.data.get('classes'), list):
+                    items = request.data['classes']
+                else:
+                    raise BatchError("Provide either 'classes' or 'recurrence'")
+                instances, errors = validate_batch(items)
+            except BatchError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if errors:
+                logger.warning(f"Bulk class creation failed for {len(errors)} of {len(items)} classes")
+                return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+            if not instances:
+                return Response({"error": "No classes to create"}, status=status.HTTP_400_BAD_REQUEST)
+
+            ids = create_batch(instances)
+            logger.info(f"Bulk created {len(ids)} fitness classes")
+            return Response({"created": len(ids), "ids": ids}, status=status.HTTP_201_CREATED)
+
+        except Exception as e:
+            logger.error(f"Error bulk creating fitness classes: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class BookingView(APIView):
     """Handles CRUD operations for bookings."""
+    permission_classes = [IsMember]
+    throttle_classes = [BookingWriteThrottle]
 
+    @replica_reads()
     def get(self, request):
-        """Retrieve bookings for a specific email."""
+        """Retrieve the bookings of the authenticated user."""
         try:
+            try:
+                fields, paginated, cursor, page_size = parse_list_params(
+                    request.query_params, BOOKING_FIELDS
+                )
+            except PaginationError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            bookings = Booking.objects.filter(user_details=request.user.profile).select_related('fitness_class')
-            serializer = BookingSerializer(bookings, many=True)
-            return Response(serializer.data)
+            bookings = bookings_queryset(request.user, fields)
+            if not paginated:
+                return Response(bookings_data(bookings, fields))
+
+            bookings, next_cursor = paginate(bookings, 'fitness_class__date_time', cursor, page_size, booking_key)
+            return Response({
+                'results': bookings_data(bookings, fields),
+                'next_cursor': next_cursor,
+            })
 
         except Exception as e:
             logger.error(f"Error retrieving bookings: {str(e)}", exc_info=True)
@@ -134,19 +294,30 @@ class BookingView(APIView):
         try:
             serializer = BookingSerializer(data=request.data, context={'request': request})
             if serializer.is_valid():
-                with transaction.atomic():
-                    fitness_class = serializer.validated_data['fitness_class']
-                    if fitness_class.available_slots <= 0:
-                        raise serializers.ValidationError("No available slots for this class")
-                    if request.data['slots'] > fitness_class.available_slots:
-                        raise serializers.ValidationError("Requested slots exceed available slots")
-                    fitness_class.available_slots -= request.data.get('slots', 1)
-                    fitness_class.save()
-                    booking = serializer.save()
-                    booking.user_details = request.user.profile if request.user.is_authenticated else None
-                    booking.save()
-                    logger.info(f"Created booking: {booking.id}")
-                    return Response(serializer.data, status=status.HTTP_201_CREATED)
+                try:
+                    slots = int(request.data.get('slots', 1))
+                except (TypeError, ValueError):
+                    slots = 0
+                if slots < 1:
+                    return Response(
+                        {"slots": ["Slots must be a positive integer"]},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                result = reserve_slots(
+                    serializer.validated_data['fitness_class'],
+                    user_profile=request.user.profile,
+                    slots=slots,
+                    booking_time=serializer.validated_data.get('booking_time'),
+                )
+                if not result.success:
+                    logger.warning(f"Booking rejected: {result.status}")
+                    return Response(
+                        {"error": result.message},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                logger.info(f"Created booking: {result.booking.id}")
+                return Response(BookingSerializer(result.booking).data, status=status.HTTP_201_CREATED)
             logger.warning(f"Booking creation failed: {serializer.errors}")
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -177,11 +348,9 @@ class BookingView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            with transaction.atomic():
-                booking.fitness_class.available_slots += 1
-                booking.fitness_class.save()
-                booking.delete()
-                logger.info(f"Cancelled booking {booking_id} for {booking.user_details}")
+            cancelled, promoted = cancel_booking(booking)
+            if cancelled:
+                logger.info(f"Cancelled booking {booking_id}, promoted {len(promoted)} from waitlist")
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         except Exception as e:
@@ -189,4 +358,91 @@ class BookingView(APIView):
             return Response(
                 {"error": "Internal server error"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+class ScheduleView(APIView):
+    """Upcoming sessions and per-type booking counts, read from the schedule projection."""
+    permission_classes = [IsMember]
+
+    @replica_reads()
+    def get(self, request):
+        """Retrieve the upcoming schedule of the authenticated user."""
+        try:
+            return Response(schedule_data(request.user))
+
+        except Exception as e:
+            logger.error(f"Error retrieving schedule: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class WaitlistView(APIView):
+    """Handles joining, inspecting and leaving class waitlists."""
+    permission_classes = [IsMember]
+    throttle_classes = [BookingWriteThrottle]
+
+    def get(self, request):
+        """Retrieve the authenticated user's waitlist entries with their positions."""
+        try:
+            entries = WaitlistEntry.objects.filter(
+                user_details__user=request.user
+            ).select_related('fitness_class').order_by('-created_at')
+            return Response(WaitlistEntrySerializer(entries, many=True).data)
+
+        except Exception as e:
+            logger.error(f"Error retrieving waitlist: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def post(self, request):
+        """Join the waitlist of a full class."""
+        try:
+            serializer = WaitlistEntrySerializer(data=request.data)
+            if serializer.is_valid():
+                try:
+                    entry = join_waitlist(
+                        serializer.validated_data['fitness_class'],
+                        request.user.profile,
+                        serializer.validated_data.get('slots', 1),
+                    )
+                except WaitlistError as e:
+                    return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                logger.info(f"Waitlisted entry {entry.id} at position {entry.position}")
+                return Response(WaitlistEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        except Exception as e:
+            logger.error(f"Error joining waitlist: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def delete(self, request):
+        """Leave a waitlist."""
+        try:
+            entry_id = request.data.get('id')
+            if not entry_id:
+                return Response(
+                    {"error": "Waitlist entry ID is required"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                entry = WaitlistEntry.objects.get(id=entry_id, user_details__user=request.user)
+            except WaitlistEntry.DoesNotExist:
+                return Response(
+                    {"error": "Waitlist entry not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            leave_waitlist(entry)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        except Exception as e:
+            logger.error(f"Error leaving waitlist: {str(e)}", exc_info=True)
+            return Response(
+                {"error": "Internal server error"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
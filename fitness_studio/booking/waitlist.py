@@ -0,0 +1,124 @@
+"""
+Waitlist for full classes with FIFO promotion on cancellation.
+
+Each class hands out increasing sequence numbers (``waitlist_issued``) and
+records the sequence of the last promoted entry (``waitlist_served``), so a
+member's place in the queue is a subtraction rather than a count. Entries
+that withdraw keep their ticket until the queue passes them, which makes the
+position an upper bound when someone ahead has left.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import FitnessClass, WaitlistEntry
+from .reservations import (
+    reserve_slots,
+    release_booking,
+    shard_availability,
+    CLASS_NOT_FOUND,
+    CLASS_STARTED,
+    SOLD_OUT,
+)
+
+
+class WaitlistError(ValueError):
+    """Raised when a member cannot join or leave a waitlist."""
+
+
+def join_waitlist(fitness_class, user_profile, slots=1):
+    """Queue ``user_profile`` for ``slots`` seats in a full class."""
+    if slots < 1:
+        raise WaitlistError("Slots must be a positive integer")
+    available = fitness_class.available_slots
+    if fitness_class.slot_shard_count:
+        available = shard_availability([fitness_class.pk], cached=False)[fitness_class.pk]
+    if available >= slots:
+        raise WaitlistError("Slots are still available; book the class directly")
+
+    try:
+        with transaction.atomic():
+            FitnessClass.objects.filter(pk=fitness_class.pk).update(
+                waitlist_issued=F('waitlist_issued') + 1
+            )
+            issued, served = FitnessClass.objects.filter(pk=fitness_class.pk).values_list(
+                'waitlist_issued', 'waitlist_served'
+            ).get()
+            entry = WaitlistEntry.objects.create(
+                fitness_class=fitness_class,
+                user_details=user_profile,
+                slots=slots,
+                sequence=issued,
+            )
+    except IntegrityError:
+        raise WaitlistError("Already on the waitlist for this class")
+    fitness_class.waitlist_issued = issued
+    fitness_class.waitlist_served = served
+    entry.fitness_class = fitness_class
+    return entry
+
+
+def leave_waitlist(entry):
+    """Withdraw a waiting entry; returns ``False`` if it already left the queue."""
+    return bool(
+        WaitlistEntry.objects.filter(pk=entry.pk, status=WaitlistEntry.WAITING).update(
+            status=WaitlistEntry.WITHDRAWN
+        )
+    )
+
+
+def _lock_class(fitness_class_id):
+    """Serialise promotions of one class behind its row lock."""
+    list(FitnessClass.objects.select_for_update().filter(pk=fitness_class_id).values_list('pk'))
+
+
+def promote_waitlist(fitness_class_id):
+    """
+    Turn waiting entries into bookings, oldest first, while their slots fit.
+
+    Promotions of a class run one at a time under the class row lock, so
+    concurrent cancellations never promote the same member twice or pass
+    over the head of the queue. Promotion stops at the first entry that does
+    not fit, keeping the queue strictly FIFO.
+    """
+    promoted = []
+    with transaction.atomic():
+        _lock_class(fitness_class_id)
+        while True:
+            entry = (
+                WaitlistEntry.objects.select_for_update()
+                .select_related('user_details')
+                .filter(fitness_class_id=fitness_class_id, status=WaitlistEntry.WAITING)
+                .order_by('sequence')
+                .first()
+            )
+            if entry is None:
+                break
+
+            result = reserve_slots(fitness_class_id, entry.user_details, entry.slots)
+            if result.status in (SOLD_OUT, CLASS_STARTED, CLASS_NOT_FOUND):
+                break
+            if result.success:
+                entry.status = WaitlistEntry.PROMOTED
+                entry.booking = result.booking
+                promoted.append(entry)
+            else:
+                # The member booked the class some other way.
+                entry.status = WaitlistEntry.WITHDRAWN
+            entry.save(update_fields=['status', 'booking'])
+            FitnessClass.objects.filter(pk=fitness_class_id).update(waitlist_served=entry.sequence)
+    return promoted
+
+
+def cancel_booking(booking):
+    """
+    Cancel ``booking`` and promote waitlisted members into the freed slots.
+
+    Both happen in one transaction, with the class row locked before the
+    slots are released so promotions queue in the order seats are freed.
+    Returns ``(cancelled, promoted_entries)``.
+    """
+    with transaction.atomic():
+        _lock_class(booking.fitness_class_id)
+        if not release_booking(booking):
+            return False, []
+        return True, promote_waitlist(booking.fitness_class_id)
@@ -2,6 +2,8 @@
 ASGI config for fitness_studio project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Unless ``ASYNC_VIEWS`` is set, it serves the async views
+(``fitness_studio.async_urls``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -12,5 +14,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitness_studio.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,69 @@
+"""
+Statistics for the ``default`` database's connection pool.
+
+With ``DB_POOL=True`` on Postgres, Django hands each request a connection
+from a psycopg ``ConnectionPool`` and returns it when the request finishes.
+The pool lives in the worker process, so ``pool_stats`` and the endpoint
+describe the worker that served the call::
+
+    GET /api/internal/db-pool/
+
+    {
+        "alias": "default",
+        "pooled": true,
+        "min_size": 2, "max_size": 10, "size": 4,
+        "available": 1, "checked_out": 3,
+        "waiting": 0, "requests": 1520, "queued": 12,
+        "wait_ms_total": 310, "wait_ms_avg": 25.8,
+        "timeouts": 0, "connections_opened": 4, "connections_lost": 0
+    }
+
+Without a pool the response only says ``"pooled": false``.
+"""
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+def connection_pool(alias='default'):
+    """The psycopg pool behind ``alias``, or ``None`` when it is not pooled."""
+    return getattr(connections[alias], 'pool', None)
+
+
+def pool_stats(alias='default'):
+    pool = connection_pool(alias)
+    if pool is None:
+        return {'alias': alias, 'pooled': False}
+
+    stats = pool.get_stats()
+    size, available = stats.get('pool_size', 0), stats.get('pool_available', 0)
+    queued, wait_ms = stats.get('requests_queued', 0), stats.get('requests_wait_ms', 0)
+    return {
+        'alias': alias,
+        'pooled': True,
+        'min_size': stats.get('pool_min', pool.min_size),
+        'max_size': stats.get('pool_max', pool.max_size),
+        'size': size,
+        'available': available,
+        'checked_out': size - available,
+        'waiting': stats.get('requests_waiting', 0),
+        'requests': stats.get('requests_num', 0),
+        'queued': queued,
+        'wait_ms_total': wait_ms,
+        'wait_ms_avg': round(wait_ms / queued, 1) if queued else 0.0,
+        'timeouts': stats.get('requests_errors', 0),
+        'connections_opened': stats.get('connections_num', 0),
+        'connections_lost': stats.get('connections_lost', 0) + stats.get('returns_bad', 0),
+    }
+
+
+class DatabasePoolView(APIView):
+    """Pool statistics of the worker serving the request; staff accounts only."""
+
+    # Gated on Django's ``is_staff`` rather than the studio role: this is an
+    # operator endpoint, not part of the studio's permissions.
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_stats())
@@ -0,0 +1,266 @@
+"""
+Read-replica routing for the catalogue and history reads.
+
+Views opt in by decorating a read handler with ``replica_reads``; every
+other query, and every write, stays on ``default``. A decorated handler
+still reads from the primary when:
+
+- the user wrote within ``STICKY_SECONDS`` (read-your-writes), or a scope
+  named by the handler was pinned, e.g. ``'catalogue'`` after a class or
+  booking change, so a cached page is never rendered from stale rows;
+- the replica is unreachable or lags by more than ``MAX_LAG`` seconds.
+  Health is probed at most every ``CHECK_INTERVAL`` seconds per process.
+
+Configured with the ``REPLICA_ROUTING`` setting; the replica itself is the
+``replica`` database, built from ``DATABASE_REPLICA_URL``::
+
+    REPLICA_ROUTING = {
+        'ENABLED': True,         # False without DATABASE_REPLICA_URL
+        'ALIAS': 'default',      # Django cache alias holding the pins
+        'STICKY_SECONDS': 5,
+        'MAX_LAG': 2.0,
+        'CHECK_INTERVAL': 1.0,
+    }
+
+Pins live in the Django cache, so workers only see each other's writes when
+that cache is shared; a system check refuses routing with a cache that is
+local to each process.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+import os
+import threading
+import time
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+
+REPLICA = 'replica'
+
+DEFAULTS = {
+    'ENABLED': False,
+    'ALIAS': 'default',
+    'STICKY_SECONDS': 5,
+    'MAX_LAG': 2.0,
+    'CHECK_INTERVAL': 1.0,
+}
+
+# Cache backends whose entries other processes cannot see.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_PIN_KEY = 'db_router:pin:{}'
+_SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_reading_replica = ContextVar('reading_replica', default=False)
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'REPLICA_ROUTING', {})}
+
+
+def is_process_local(alias):
+    """Whether the cache ``alias`` keeps its entries per process, out of other workers' sight."""
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_CACHES
+
+
+@checks.register(checks.Tags.database)
+def check_pin_cache(app_configs, **kwargs):
+    """Replica routing needs its pins in a cache every worker shares."""
+    options = _options()
+    if options['ENABLED'] and is_process_local(options['ALIAS']):
+        return [checks.Error(
+            f"Replica routing keeps read-your-writes pins in the '{options['ALIAS']}' cache, "
+            "which is local to each process, so a write on one worker does not pin reads on another.",
+            hint="Set CACHE_URL to a cache shared by all workers, or unset DATABASE_REPLICA_URL.",
+            id='fitness_studio.E001',
+        )]
+    return []
+
+
+class ReplicaRouter:
+    """Sends reads to the replica inside ``reading_from_replica``; nothing else changes."""
+
+    def db_for_read(self, model, **hints):
+        if _reading_replica.get():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary.
+        return db != REPLICA
+
+
+@contextmanager
+def reading_from_replica():
+    """Route the reads in this block, including threads it hands off to, to the replica."""
+    token = _reading_replica.set(True)
+    try:
+        yield
+    finally:
+        _reading_replica.reset(token)
+
+
+def user_scope(user):
+    return f"user:{user.pk}"
+
+
+def pin(*scopes):
+    """Keep reads for ``scopes`` on the primary for ``STICKY_SECONDS``."""
+    options = _options()
+    if options['ENABLED'] and scopes:
+        caches[options['ALIAS']].set_many(
+            {_PIN_KEY.format(scope): 1 for scope in scopes}, options['STICKY_SECONDS']
+        )
+
+
+def is_pinned(*scopes):
+    return bool(scopes) and bool(
+        caches[_options()['ALIAS']].get_many([_PIN_KEY.format(scope) for scope in scopes])
+    )
+
+
+def replica_lag():
+    """Seconds the replica is behind the primary, or ``None`` when it cannot be read."""
+    replica = connections[REPLICA]
+    try:
+        if replica.vendor == 'sqlite':
+            return _sqlite_lag(replica)
+        with replica.cursor() as cursor:
+            if replica.vendor == 'postgresql':
+                # Caught up when everything received has been replayed, even if the primary is idle.
+                cursor.execute(
+                    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                )
+                return float(cursor.fetchone()[0])
+            cursor.execute("SELECT 1")
+        return 0.0
+    except (DatabaseError, OSError):
+        return None
+
+
+def _sqlite_lag(replica):
+    """
+    Lag of a SQLite file copied from the primary by ``sync_replica``.
+
+    The copy has every write made before it was taken. Once the primary has
+    changed since, the replica is behind by the time since that copy.
+    """
+    primary_name = connections['default'].settings_dict['NAME']
+    replica_name = replica.settings_dict['NAME']
+    if str(primary_name) == str(replica_name):
+        return 0.0
+    if not os.path.exists(replica_name):
+        return None
+    copied_at = os.path.getmtime(replica_name)
+    if os.path.getmtime(primary_name) <= copied_at:
+        return 0.0
+    return time.time() - copied_at
+
+
+class ReplicaHealth:
+    """Remembers the last lag probe for ``CHECK_INTERVAL`` seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._lag = None
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = None
+
+    def stale(self):
+        checked_at = self._checked_at
+        return checked_at is None or time.monotonic() - checked_at >= _options()['CHECK_INTERVAL']
+
+    def healthy(self):
+        if self.stale():
+            lag = replica_lag()
+            with self._lock:
+                self._lag, self._checked_at = lag, time.monotonic()
+        return self._lag is not None and self._lag <= _options()['MAX_LAG']
+
+
+health = ReplicaHealth()
+
+
+def use_replica(request, scopes=()):
+    """Whether a decorated read for ``request`` may go to the replica."""
+    if not _options()['ENABLED']:
+        return False
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        scopes = (*scopes, user_scope(user))
+    return not is_pinned(*scopes) and health.healthy()
+
+
+def replica_reads(*scopes):
+    """Decorate a sync or async view handler whose reads may come from the replica."""
+    def decorator(handler):
+        if iscoroutinefunction(handler):
+            @wraps(handler)
+            async def async_wrapper(view, request, *args, **kwargs):
+                if not _options()['ENABLED'] or not await sync_to_async(use_replica)(request, scopes):
+                    return await handler(view, request, *args, **kwargs)
+                with reading_from_replica():
+                    return await handler(view, request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            if not use_replica(request, scopes):
+                return handler(view, request, *args, **kwargs)
+            with reading_from_replica():
+                return handler(view, request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _pin_after_write(request, response):
+    user = getattr(request, 'user', None)
+    if response.status_code < 400 and user is not None and user.is_authenticated:
+        pin(user_scope(user))
+
+
+class StickyPrimaryMiddleware:
+    """Pins a user to the primary after a successful write (the view authenticates them)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if request.method not in _SAFE_METHODS:
+            _pin_after_write(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in _SAFE_METHODS:
+            # request.user may still be a lazy session lookup.
+            await sync_to_async(_pin_after_write)(request, response)
+        return response
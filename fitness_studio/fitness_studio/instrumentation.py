@@ -0,0 +1,281 @@
+"""
+Per-request timing: where a request's wall time went, per endpoint.
+
+``InstrumentationMiddleware`` measures every request and splits its wall
+time into phases:
+
+- ``db``: executing queries, with the query count;
+- ``serialize``: code marked with ``timed('serialize')``, i.e. the JSON
+  renderer and the catalogue and booking list serializers;
+- ``external``: code marked with ``timed('external')``, i.e. model calls;
+- ``app``: everything else.
+
+A phase's time excludes the phases nested in it, so queries run while
+serializing count as ``db``. Each response carries the split as a
+``Server-Timing`` header, and the timings are folded into per-endpoint
+histograms that ``fitness_studio.metrics`` serves in Prometheus text format,
+with estimated p50/p95/p99 alongside. Background work can be measured the
+same way with ``measure('<name>')``. A streamed response is measured up to
+its headers.
+
+Configured with the ``INSTRUMENTATION`` setting::
+
+    INSTRUMENTATION = {
+        'ENABLED': True,
+        'SERVER_TIMING': True,   # add the Server-Timing header
+        'METRICS_TOKEN': '',     # bearer token for metrics scrapers
+        'BUCKETS': (0.005, 0.01, 0.025, ..., 120.0),
+    }
+
+The histograms live in the worker process, so each worker reports its own
+requests.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from inspect import iscoroutinefunction
+import threading
+import time
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.renderers import JSONRenderer
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    'METRICS_TOKEN': '',
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+}
+
+PHASES = ('db', 'serialize', 'external', 'app')
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current = ContextVar('request_timings', default=None)
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'INSTRUMENTATION', {})}
+
+
+class Timings:
+    """Phase durations of one request; phases may be timed from several threads."""
+
+    __slots__ = ('phases', 'queries', 'total', '_lock', '_open')
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+        # Per thread, the time spent in phases nested in each open phase.
+        self._open = {}
+
+    def enter(self):
+        self._open.setdefault(threading.get_ident(), []).append(0.0)
+
+    def exit(self, phase, elapsed, queries=0):
+        stack = self._open[threading.get_ident()]
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self._lock:
+            self.phases[phase] += elapsed - nested
+            self.queries += queries
+
+    def finish(self, elapsed):
+        self.total = elapsed
+        self.phases['app'] = max(elapsed - sum(self.phases[phase] for phase in PHASES if phase != 'app'), 0.0)
+
+    def server_timing(self):
+        entries = []
+        for phase in PHASES:
+            if phase == 'db' and self.queries:
+                entries.append(f'db;dur={self.phases[phase] * 1000:.1f};desc="{self.queries} queries"')
+            elif self.phases[phase]:
+                entries.append(f'{phase};dur={self.phases[phase] * 1000:.1f}')
+        entries.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def timed(phase, queries=0):
+    """Count the enclosed code, or decorated function, as ``phase`` of the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    timings.enter()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.exit(phase, time.perf_counter() - started, queries)
+
+
+def _time_query(execute, sql, params, many, context):
+    if _current.get() is None:
+        return execute(sql, params, many, context)
+    with timed('db', queries=1):
+        return execute(sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """Time the queries of ``connection``; done for every connection as it is opened."""
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(install)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is +Inf.
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for count in self.counts:
+            running += count
+            yield running
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile by interpolating within its bucket, like ``histogram_quantile``."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for upper, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (upper - lower) * (rank - seen) / count
+            lower, seen = upper, seen + count
+        return self.buckets[-1]
+
+
+class EndpointStats:
+    __slots__ = ('histograms', 'queries', 'statuses')
+
+    def __init__(self, buckets):
+        self.histograms = {phase: Histogram(buckets) for phase in ('total', *PHASES)}
+        self.queries = 0
+        self.statuses = {}
+
+
+class Registry:
+    """Timings folded per ``(endpoint, method)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def record(self, endpoint, method, status_code, timings):
+        key = (endpoint, method)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = EndpointStats(tuple(_options()['BUCKETS']))
+            stats.histograms['total'].observe(timings.total)
+            for phase in PHASES:
+                stats.histograms[phase].observe(timings.phases[phase])
+            stats.queries += timings.queries
+            stats.statuses[status_code] = stats.statuses.get(status_code, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return sorted(self._stats.items())
+
+
+registry = Registry()
+
+
+@contextmanager
+def measure(endpoint=None, method=''):
+    """
+    Time the enclosed code as one request; yields its ``Timings``.
+
+    With an ``endpoint`` the result is recorded under it, otherwise the
+    caller records it once it knows the endpoint.
+    """
+    timings = Timings()
+    token = _current.set(timings)
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield timings
+        outcome = 'ok'
+    finally:
+        timings.finish(time.perf_counter() - started)
+        _current.reset(token)
+        if endpoint is not None:
+            registry.record(endpoint, method, outcome, timings)
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class InstrumentationMiddleware:
+    """Measures each request, adds ``Server-Timing`` and records it in ``registry``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported.
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _options()['ENABLED']:
+            return self.get_response(request)
+        with measure() as timings:
+            response = self.get_response(request)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not _options()['ENABLED']:
+            return await self.get_response(request)
+        with measure() as timings:
+            response = await self.get_response(request)
+        return self._finish(request, response, timings)
+
+    def _finish(self, request, response, timings):
+        registry.record(endpoint_name(request), request.method, response.status_code, timings)
+        if _options()['SERVER_TIMING']:
+            response['Server-Timing'] = timings.server_timing()
+        return response
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` whose work counts as ``serialize``."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return super().render(data, accepted_media_type, renderer_context)
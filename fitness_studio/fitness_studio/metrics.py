@@ -0,0 +1,120 @@
+"""
+Prometheus text exposition of the request timings and the database pool.
+
+``GET /api/internal/metrics/`` is readable by staff accounts and by scrapers sending
+``Authorization: Bearer <METRICS_TOKEN>`` (``INSTRUMENTATION['METRICS_TOKEN']``).
+Per endpoint and method it serves the ``fitness_request_duration_seconds``
+histograms of ``fitness_studio.instrumentation`` (phase ``total``, ``db``,
+``serialize``, ``external`` and ``app``), quantiles estimated from them,
+query and status counters, and the pool gauges of ``fitness_studio.db_pool``.
+"""
+import hmac
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.permissions import BasePermission, IsAdminUser
+from rest_framework.views import APIView
+
+from userprofile.authentication import ProfileJWTAuthentication
+
+from .db_pool import pool_stats
+from .instrumentation import QUANTILES, registry
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """The registry, and the database pool when there is one, in Prometheus text format."""
+    snapshot = registry.snapshot()
+    lines = [
+        '# HELP fitness_request_duration_seconds Request wall time and its phases.',
+        '# TYPE fitness_request_duration_seconds histogram',
+    ]
+    for (endpoint, method), stats in snapshot:
+        for phase, histogram in stats.histograms.items():
+            labels = _labels(endpoint=endpoint, method=method, phase=phase)
+            for bound, count in zip((*histogram.buckets, '+Inf'), histogram.cumulative()):
+                lines.append(f'fitness_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'fitness_request_duration_seconds_sum{{{labels}}} {_number(histogram.sum)}')
+            lines.append(f'fitness_request_duration_seconds_count{{{labels}}} {histogram.count}')
+
+    lines += [
+        '# HELP fitness_request_duration_quantile_seconds Quantiles estimated from the histogram buckets.',
+        '# TYPE fitness_request_duration_quantile_seconds gauge',
+    ]
+    for (endpoint, method), stats in snapshot:
+        for phase, histogram in stats.histograms.items():
+            for q in QUANTILES:
+                labels = _labels(endpoint=endpoint, method=method, phase=phase, quantile=q)
+                lines.append(
+                    f'fitness_request_duration_quantile_seconds{{{labels}}} {_number(histogram.quantile(q))}'
+                )
+
+    lines += [
+        '# HELP fitness_request_db_queries_total Database queries run by requests.',
+        '# TYPE fitness_request_db_queries_total counter',
+    ]
+    for (endpoint, method), stats in snapshot:
+        lines.append(f'fitness_request_db_queries_total{{{_labels(endpoint=endpoint, method=method)}}} {stats.queries}')
+
+    lines += [
+        '# HELP fitness_requests_total Requests by response status.',
+        '# TYPE fitness_requests_total counter',
+    ]
+    for (endpoint, method), stats in snapshot:
+        for status_code, count in sorted(stats.statuses.items(), key=lambda item: str(item[0])):
+            labels = _labels(endpoint=endpoint, method=method, status=status_code)
+            lines.append(f'fitness_requests_total{{{labels}}} {count}')
+
+    pool = pool_stats()
+    if pool['pooled']:
+        for name in ('size', 'available', 'checked_out', 'waiting'):
+            lines += [f'# TYPE fitness_db_pool_{name} gauge', f'fitness_db_pool_{name} {pool[name]}']
+        for name in ('requests', 'queued', 'timeouts', 'connections_opened', 'connections_lost'):
+            lines += [f'# TYPE fitness_db_pool_{name}_total counter', f'fitness_db_pool_{name}_total {pool[name]}']
+        lines += [
+            '# TYPE fitness_db_pool_wait_seconds_total counter',
+            f'fitness_db_pool_wait_seconds_total {_number(pool["wait_ms_total"] / 1000)}',
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsScrape:
+    """``request.auth`` of a scraper that presented ``METRICS_TOKEN``."""
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """Accepts ``Authorization: Bearer <METRICS_TOKEN>``; other credentials fall through."""
+
+    def authenticate(self, request):
+        token = getattr(settings, 'INSTRUMENTATION', {}).get('METRICS_TOKEN', '')
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return AnonymousUser(), MetricsScrape()
+        return None
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="metrics"'
+
+
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        return isinstance(request.auth, MetricsScrape)
+
+
+class MetricsView(APIView):
+    """Prometheus metrics of the worker serving the request."""
+
+    authentication_classes = [MetricsTokenAuthentication, ProfileJWTAuthentication]
+    permission_classes = [HasMetricsToken | IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,6 @@
 from pathlib import Path
 from datetime import timedelta
+import json
 import os
 import dj_database_url
 from decouple import config
@@ -53,10 +54,12 @@ INSTALLED_APPS = [
     'booking',
     'userprofile',
     'presionalized_assistance',
+    'benchmarks',
 ]
 
 
 MIDDLEWARE = [
+    'fitness_studio.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -65,9 +68,12 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'fitness_studio.db_router.StickyPrimaryMiddleware',
 ]
 
-ROOT_URLCONF = 'fitness_studio.urls'
+# Serve the async views; asgi.py turns this on unless the environment says otherwise.
+ASYNC_VIEWS = config('ASYNC_VIEWS', 'False') == 'True'
+ROOT_URLCONF = 'fitness_studio.async_urls' if ASYNC_VIEWS else 'fitness_studio.urls'
 
 TEMPLATES = [
     {
@@ -90,8 +96,54 @@ WSGI_APPLICATION = 'fitness_studio.wsgi.application'
 DATABASE_URL =config('DATABASE_URL')
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set")
+# Under ASGI each request runs its ORM calls on its own thread, so persistent connections would pile up.
+CONN_MAX_AGE = 0 if ASYNC_VIEWS else 600
 DATABASES = {
-    'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600, ssl_require=False)
+    'default': dj_database_url.parse(DATABASE_URL, conn_max_age=CONN_MAX_AGE, ssl_require=False)
+}
+# Persistent connections are pinged before their first query in a request, so
+# one dropped while idle is replaced instead of failing that query.
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Optional psycopg pool for Postgres. Each worker process keeps between
+# DB_POOL_MIN_SIZE and DB_POOL_MAX_SIZE connections and hands them to requests,
+# checking each one before it is lent out (CONN_HEALTH_CHECKS); see fitness_studio.db_pool.
+DB_POOL = config('DB_POOL', False, cast=bool)
+if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # Requests return their connection to the pool.
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', 2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', 10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', 10.0, cast=float),
+        'max_idle': config('DB_POOL_MAX_IDLE', 300.0, cast=float),
+        'max_lifetime': config('DB_POOL_MAX_LIFETIME', 3600.0, cast=float),
+    }
+
+# Cache shared by every worker: replica pins, auth snapshots and the 'django'
+# throttle and catalogue backends rely on it. redis://host:6379/0, or
+# file:///path for workers on one host; unset keeps a cache per process.
+CACHE_URL = config('CACHE_URL', '')
+if CACHE_URL.startswith('file://'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_URL[len('file://'):],
+    }}
+elif CACHE_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+
+# Optional read replica for the catalogue and history reads. Without a URL the
+# alias points at the primary and routing stays off; tests mirror it onto default.
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', '')
+DATABASES['replica'] = dj_database_url.parse(
+    DATABASE_REPLICA_URL or DATABASE_URL, conn_max_age=CONN_MAX_AGE, ssl_require=False
+)
+DATABASES['replica']['CONN_HEALTH_CHECKS'] = True
+DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['fitness_studio.db_router.ReplicaRouter']
+REPLICA_ROUTING = {
+    'ENABLED': bool(DATABASE_REPLICA_URL),
+    'STICKY_SECONDS': config('REPLICA_STICKY_SECONDS', 5, cast=int),
+    'MAX_LAG': config('REPLICA_MAX_LAG', 2.0, cast=float),
 }
 
 # DATABASES = {
@@ -128,23 +180,41 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'fitness_studio.instrumentation.TimedJSONRenderer',
     ],
     'DATETIME_FORMAT': '%Y-%m-%d %H:%M:%S %Z',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'userprofile.authentication.ProfileJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Adjusted for public endpoints
     ],
 }
 
+# Per-request timings in Server-Timing headers and at /api/internal/metrics/ (admins,
+# or scrapers sending "Authorization: Bearer <METRICS_TOKEN>").
+INSTRUMENTATION = {
+    'ENABLED': config('INSTRUMENTATION_ENABLED', 'True') == 'True',
+    'SERVER_TIMING': config('SERVER_TIMING_HEADER', 'True') == 'True',
+    'METRICS_TOKEN': config('METRICS_TOKEN', ''),
+}
+
+# Rendered upcoming-class catalogue; use the 'django' backend to share it between workers.
+CATALOGUE_CACHE = {
+    'BACKEND': config('CATALOGUE_CACHE_BACKEND', 'locmem'),
+    'TIMEOUT': config('CATALOGUE_CACHE_TIMEOUT', 300, cast=int),
+}
+
+# Seconds a user/profile snapshot may serve authentication; 0 loads it on every request.
+AUTH_PROFILE_CACHE_TIMEOUT = config('AUTH_PROFILE_CACHE_TIMEOUT', 30, cast=int)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'userprofile.serializers.RoleTokenObtainPairSerializer',
 }
 
 LOGGING = {
@@ -161,4 +231,36 @@ LOGGING = {
             'level': 'DEBUG' if DEBUG else 'INFO',
         },
     },
-}
\ No newline at end of file
+}
+
+# Fitness plan generation
+PLAN_MODEL_CLIENT = config('PLAN_MODEL_CLIENT', 'presionalized_assistance.llm.GeminiClient')
+PLAN_MODEL_CLIENT_OPTIONS = config('PLAN_MODEL_CLIENT_OPTIONS', '{}', cast=json.loads)
+PLAN_JOB_WORKERS = config('PLAN_JOB_WORKERS', 4, cast=int)
+PLAN_JOB_MAX_ATTEMPTS = config('PLAN_JOB_MAX_ATTEMPTS', 3, cast=int)
+PLAN_JOB_TIMEOUT = config('PLAN_JOB_TIMEOUT', 120, cast=int)
+PLAN_JOBS_IN_PROCESS = config('PLAN_JOBS_IN_PROCESS', 'True') == 'True'
+# Longest plan a member may request; each PLAN_CHUNK_DAYS of it is one model call.
+PLAN_MAX_DURATION = config('PLAN_MAX_DURATION', 180, cast=int)
+PLAN_CHUNKED_MIN_DURATION = config('PLAN_CHUNKED_MIN_DURATION', 28, cast=int)
+PLAN_CHUNK_DAYS = config('PLAN_CHUNK_DAYS', 7, cast=int)
+PLAN_CHUNK_WORKERS = config('PLAN_CHUNK_WORKERS', 4, cast=int)
+PLAN_CACHE = {
+    'ENABLED': config('PLAN_CACHE_ENABLED', 'True') == 'True',
+    'TIMEOUT': config('PLAN_CACHE_TIMEOUT', 86400, cast=int),
+    'MAX_ENTRIES': config('PLAN_CACHE_MAX_ENTRIES', 256, cast=int),
+    'BUDGET_BUCKET': config('PLAN_CACHE_BUDGET_BUCKET', 50, cast=int),
+}
+PLAN_JOB_MAX_IN_FLIGHT = config('PLAN_JOB_MAX_IN_FLIGHT', 2, cast=int)
+# Open plan streams count towards the cap in the default cache; the count lapses after this long.
+PLAN_STREAM_SLOT_SECONDS = config('PLAN_STREAM_SLOT_SECONDS', 900, cast=int)
+
+# Token-bucket throttles per user (or IP when anonymous); use the 'django' backend to share buckets between workers.
+THROTTLING = {
+    'BACKEND': config('THROTTLING_BACKEND', 'locmem'),
+    'RATES': {
+        'ai_generation': config('THROTTLE_AI_GENERATION', '10/hour'),
+        'booking_write': config('THROTTLE_BOOKING_WRITE', '60/min'),
+        'catalogue_read': config('THROTTLE_CATALOGUE_READ', '300/min'),
+    },
+}
@@ -0,0 +1,167 @@
+"""
+Token-bucket throttles for the expensive endpoints.
+
+Each scope has its own bucket per client: the user ID when authenticated,
+otherwise the client IP. A bucket holds up to N tokens and refills at N per
+period, so a client can burst N requests and then continues at the average
+rate. Denied requests get ``429`` with a ``Retry-After`` header for when the
+next token is due. Configured with the ``THROTTLING`` setting::
+
+    THROTTLING = {
+        'BACKEND': 'locmem',   # or 'django' to share buckets between workers
+        'ALIAS': 'default',    # Django cache alias used by the 'django' backend
+        'RATES': {
+            'ai_generation': '10/hour',
+            'booking_write': '60/min',
+            'catalogue_read': '300/min',
+        },
+        'MAX_ENTRIES': 10000,  # locmem only
+    }
+
+A scope missing from ``RATES`` or set to ``None`` is not throttled.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'BACKEND': 'locmem',
+    'ALIAS': 'default',
+    'RATES': {
+        'ai_generation': '10/hour',
+        'booking_write': '60/min',
+        'catalogue_read': '300/min',
+    },
+    'MAX_ENTRIES': 10000,
+}
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'THROTTLING', {})}
+
+
+def parse_rate(rate):
+    """Turn ``"N/period"`` into ``(capacity, tokens_per_second)``; ``None`` disables."""
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period.lower()]
+
+
+def take_token(state, capacity, refill, now):
+    """
+    Refill a bucket and try to take one token.
+
+    ``state`` is ``(tokens, updated_at)`` or ``None`` for a full bucket.
+    Returns ``(allowed, wait_seconds, new_state)``.
+    """
+    tokens, updated_at = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated_at) * refill)
+    if tokens >= 1:
+        return True, 0.0, (tokens - 1, now)
+    return False, (1 - tokens) / refill, (tokens, now)
+
+
+class LocalMemoryBackend:
+    """Per-process buckets; limits apply per worker."""
+
+    def __init__(self, options):
+        self.max_entries = options['MAX_ENTRIES']
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill):
+        with self._lock:
+            allowed, wait, state = take_token(self._buckets.get(key), capacity, refill, time.monotonic())
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, wait
+
+
+class DjangoCacheBackend:
+    """
+    Buckets in a shared Django cache, so limits hold across workers.
+
+    The read-modify-write is not atomic, so simultaneous requests from one
+    client can occasionally both take the last token.
+    """
+
+    def __init__(self, options):
+        self.cache = caches[options['ALIAS']]
+
+    def consume(self, key, capacity, refill):
+        allowed, wait, state = take_token(self.cache.get(key), capacity, refill, time.time())
+        # Once the bucket would be full again the entry carries no information.
+        self.cache.set(key, state, timeout=int((capacity - state[0]) / refill) + 1)
+        return allowed, wait
+
+
+_BACKENDS = {
+    'locmem': LocalMemoryBackend,
+    'django': DjangoCacheBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                options = _options()
+                _backend = _BACKENDS[options['BACKEND']](options)
+    return _backend
+
+
+def reset_backend():
+    """Forget every bucket; the next request re-reads settings."""
+    global _backend
+    _backend = None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base class; subclasses set ``scope`` and the HTTP methods they apply to."""
+
+    scope = None
+    methods = ('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+    def allow_request(self, request, view):
+        self._wait = None
+        if request.method not in self.methods:
+            return True
+        rate = parse_rate(_options()['RATES'].get(self.scope))
+        if rate is None:
+            return True
+        user_id = getattr(request.user, 'pk', None) if request.user and request.user.is_authenticated else None
+        ident = f"user:{user_id}" if user_id is not None else f"ip:{self.get_ident(request)}"
+        allowed, self._wait = get_backend().consume(f"throttle:{self.scope}:{ident}", *rate)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class AIGenerationThrottle(TokenBucketThrottle):
+    scope = 'ai_generation'
+    methods = ('POST',)
+
+
+class BookingWriteThrottle(TokenBucketThrottle):
+    scope = 'booking_write'
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class CatalogueReadThrottle(TokenBucketThrottle):
+    scope = 'catalogue_read'
+    methods = ('GET', 'HEAD')
@@ -4,11 +4,15 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
+from .db_pool import DatabasePoolView
+from .metrics import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/internal/db-pool/', DatabasePoolView.as_view(), name='db-pool-stats'),
+    path('api/internal/metrics/', MetricsView.as_view(), name='metrics'),
     path('api/',include('booking.urls')),
     path('api/',include('userprofile.urls')),
     path('api/', include('presionalized_assistance.urls')),
@@ -0,0 +1,36 @@
+"""
+Gunicorn settings for both deployment modes, picked up from the working directory.
+
+    gunicorn                     # WSGI, sync workers, sync views
+    ASYNC_VIEWS=True gunicorn    # ASGI, uvicorn workers, async views
+
+A sync worker serves one request at a time, so there are enough of them to
+cover requests waiting on the database or the model. An ASGI worker
+interleaves requests on its event loop and needs only one per core. The
+timeout leaves room for a streamed plan (``PLAN_JOB_TIMEOUT``); for uvicorn
+workers it only bounds a blocked event loop.
+
+Environment: ``PORT``, ``WEB_CONCURRENCY`` (workers), ``GUNICORN_TIMEOUT``.
+"""
+import multiprocessing
+import os
+
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+CPUS = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+if ASYNC_VIEWS:
+    wsgi_app = 'fitness_studio.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    workers = int(os.environ.get('WEB_CONCURRENCY', CPUS))
+else:
+    wsgi_app = 'fitness_studio.wsgi:application'
+    worker_class = 'sync'
+    workers = int(os.environ.get('WEB_CONCURRENCY', 2 * CPUS + 1))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 130))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot accumulate.
+max_requests = 2000
+max_requests_jitter = 200
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PresionalizedAssistanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'presionalized_assistance'
+
+    def ready(self):
+        from . import throttles  # noqa: F401
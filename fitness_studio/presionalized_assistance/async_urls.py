@@ -0,0 +1,12 @@
+from django.urls import path
+from .async_views import AsyncAI_Assistance_List_View, AsyncAI_Assistance_Stream_View, AsyncPlanGenerationJobView, AsyncFitnessPlanListView, AsyncFitnessPlanDaysView, AsyncFitnessPlanDateDetailView
+
+urlpatterns = [
+    path('ai-assistance/', AsyncAI_Assistance_List_View.as_view(), name='generate-plan'),
+    path('ai-assistance/stream/', AsyncAI_Assistance_Stream_View.as_view(), name='generate-plan-stream'),
+    path('ai-assistance/jobs/<int:job_id>/', AsyncPlanGenerationJobView.as_view(), name='plan-job-detail'),
+    path('fitness-plans/', AsyncFitnessPlanListView.as_view(), name='list-plans'),
+    path('fitness-plans/<int:plan_id>/days/', AsyncFitnessPlanDaysView.as_view(), name='plan-days'),
+    path('fitness-plans/<int:plan_id>/<str:target_date>/', AsyncFitnessPlanDateDetailView.as_view(), name='plan-date-detail'),
+
+]
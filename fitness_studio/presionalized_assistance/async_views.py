@@ -0,0 +1,134 @@
+"""
+Async versions of the plan views for ASGI deployments.
+
+The streaming view awaits the model through the client's ``astream``, so a
+slow generation holds an event-loop task instead of a worker thread. The
+other views read through Django's async ORM; queueing a job and saving a
+finished plan need a transaction and run in a thread.
+"""
+from adrf.views import APIView
+from asgiref.sync import sync_to_async
+from rest_framework.response import Response
+from rest_framework import status
+from django.conf import settings
+from django.urls import reverse
+from fitness_studio.db_router import replica_reads
+from .models import PersonalizedFitnessPlan, PlanDay, PlanGenerationJob
+from .serializers import FitnessPlanSummarySerializer, PlanGenerationJobSerializer
+from .plan_days import create_plan
+from .planner import astream_plan
+from .renderers import sse_event
+from .throttles import PlanJobConcurrencyThrottle, acquire_stream, hold_stream
+from .views import (
+    AI_Assistance_List_View,
+    AI_Assistance_Stream_View,
+    FitnessPlanDateDetailView,
+    FitnessPlanDaysView,
+    FitnessPlanListView,
+    PlanGenerationJobView,
+    _plan_request,
+    create_job,
+    plan_days_queryset,
+    stream_response,
+)
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAI_Assistance_List_View(APIView, AI_Assistance_List_View):
+
+    async def post(self, request):
+        params, error = _plan_request(request.data)
+        if error:
+            return error
+
+        job = await sync_to_async(create_job)(request.user, params)
+        if job is None:
+            self.throttled(request, PlanJobConcurrencyThrottle().wait())
+        return Response({
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": reverse('plan-job-detail', args=[job.id]),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class AsyncAI_Assistance_Stream_View(APIView, AI_Assistance_Stream_View):
+    """Stream a plan's days as Server-Sent Events without holding a worker thread."""
+
+    async def post(self, request):
+        params, error = _plan_request(request.data)
+        if error:
+            return error
+        if not await sync_to_async(acquire_stream)(request.user):
+            self.throttled(request, PlanJobConcurrencyThrottle().wait())
+        user_id = request.user.id
+
+        async def events():
+            plan_details = []
+            try:
+                async for day in astream_plan(
+                    params["goal"], params["start_date"], params["duration"], params["hours"],
+                    params["budget"], timeout=getattr(settings, 'PLAN_JOB_TIMEOUT', 120),
+                    fresh=params["fresh"],
+                ):
+                    plan_details.append(day)
+                    yield sse_event('day', day)
+                plan = await sync_to_async(create_plan)(
+                    user_id, params["goal"], params["start_date"], params["duration"],
+                    params["budget"], plan_details
+                )
+            except Exception as e:
+                logger.exception(f"Error streaming fitness plan: {str(e)}")
+                yield sse_event('error', {"error": "Failed to generate plan.", "days": len(plan_details)})
+                return
+            yield sse_event('done', {"plan_id": plan.id, "days": len(plan_details)})
+
+        return stream_response(hold_stream(events(), user_id))
+
+
+class AsyncPlanGenerationJobView(APIView, PlanGenerationJobView):
+
+    async def get(self, request, job_id):
+        try:
+            job = await PlanGenerationJob.objects.select_related('plan').aget(id=job_id, user=request.user)
+        except PlanGenerationJob.DoesNotExist:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PlanGenerationJobSerializer(job).data)
+
+
+class AsyncFitnessPlanListView(APIView, FitnessPlanListView):
+
+    @replica_reads()
+    async def get(self, request):
+        plans = PersonalizedFitnessPlan.objects.filter(user=request.user).defer('plan_details')
+        return Response(FitnessPlanSummarySerializer([plan async for plan in plans], many=True).data)
+
+
+class AsyncFitnessPlanDaysView(APIView, FitnessPlanDaysView):
+
+    async def get(self, request, plan_id):
+        if not await PersonalizedFitnessPlan.objects.filter(id=plan_id, user=request.user).aexists():
+            return Response({"error": "Plan not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            days = plan_days_queryset(plan_id, request.query_params)
+        except ValueError:
+            return Response({"error": "from and to must use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response([day.as_dict() async for day in days])
+
+
+class AsyncFitnessPlanDateDetailView(APIView, FitnessPlanDateDetailView):
+
+    async def get(self, request, plan_id, target_date):
+        try:
+            date = datetime.date.fromisoformat(target_date)
+        except ValueError:
+            date = None
+        if date is not None:
+            day = await PlanDay.objects.filter(plan_id=plan_id, plan__user=request.user, date=date).afirst()
+            if day is not None:
+                return Response(day.as_dict())
+        if not await PersonalizedFitnessPlan.objects.filter(id=plan_id, user=request.user).aexists():
+            return Response({"error": "Plan not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"error": "No plan found for the given date."}, status=status.HTTP_404_NOT_FOUND)
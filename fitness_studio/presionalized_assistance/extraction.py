@@ -0,0 +1,151 @@
+"""
+Incremental extraction of day objects from model output.
+
+The model answers with a JSON list of day objects, possibly surrounded by
+prose or code fences. ``DayStreamParser`` is fed the text in arbitrary pieces
+and returns each day object as soon as its closing brace arrives;
+``extract_days`` runs it over a whole response and keeps the longest list.
+Complete objects go to the C JSON decoder and only the structural characters
+of the rest are visited, so the cost is one pass over the text whatever it
+contains.
+"""
+from dataclasses import dataclass, field
+import json
+import re
+
+_STRUCTURAL = re.compile(r'[\[\]{}"]')
+_STRING_END = re.compile(r'["\\]')
+_decoder = json.JSONDecoder()
+
+
+class DayStreamParser:
+    """Single-pass parser for a JSON list of objects delivered in pieces."""
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.skipped = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._pending = []
+        self.end = None
+
+    def feed(self, text, start=0):
+        """Consume the next piece of output from ``start`` and return the objects it completed."""
+        days = []
+        pos = start
+        # Start of the current object within ``text``; ``start`` if it began in an earlier piece.
+        object_start = start
+        end = len(text)
+        while pos < end and not self.finished:
+            if self._escaped:
+                self._escaped = False
+                pos += 1
+                continue
+            if self._in_string:
+                match = _STRING_END.search(text, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == '\\':
+                    pos += 1
+                    self._escaped = pos > end
+                else:
+                    self._in_string = False
+                continue
+
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+            if not self.started:
+                self.started = char == '['
+            elif char == '"':
+                self._in_string = True
+            elif char in '[{':
+                if self._depth == 0:
+                    # Whole objects inside this piece go straight to the C decoder;
+                    # the character scan only handles pieces that end mid-object
+                    # and entries that are not valid JSON.
+                    try:
+                        day, day_end = _decoder.raw_decode(text, match.start())
+                    except ValueError:
+                        pass
+                    else:
+                        pos = day_end
+                        if isinstance(day, dict):
+                            days.append(day)
+                        else:
+                            self.skipped += 1
+                        continue
+                    object_start = match.start()
+                    self._pending = []
+                self._depth += 1
+            elif self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pending.append(text[object_start:pos])
+                    day = self._decode(''.join(self._pending))
+                    self._pending = []
+                    if day is not None:
+                        days.append(day)
+            elif char == ']':
+                self.finished = True
+                self.end = pos
+
+        if self._depth:
+            self._pending.append(text[object_start:])
+        return days
+
+    @property
+    def incomplete(self):
+        """Whether the output stopped inside an object or before the list closed."""
+        return not self.finished
+
+    def _decode(self, raw):
+        try:
+            day = json.loads(raw)
+        except ValueError:
+            day = None
+        if not isinstance(day, dict):
+            self.skipped += 1
+            return None
+        return day
+
+
+@dataclass
+class ExtractionResult:
+    """Days recovered from one response."""
+
+    days: list = field(default_factory=list)
+    complete: bool = False
+    skipped: int = 0
+
+    @property
+    def salvaged(self):
+        return len(self.days)
+
+
+def extract_days(text):
+    """
+    Recover the longest list of day objects from a complete model response.
+
+    Every top-level list in the text is parsed, so a bracket in surrounding
+    prose or an echoed format example does not hide the real answer; on a
+    tie the later complete list wins. A list
+    cut off mid-object keeps the days before the cut, and entries that are
+    not valid objects are skipped and counted.
+    """
+    best = ExtractionResult()
+    pos = 0
+    while pos < len(text):
+        parser = DayStreamParser()
+        days = parser.feed(text, pos)
+        if len(days) > len(best.days) or (len(days) == len(best.days) and parser.finished):
+            best = ExtractionResult(days, parser.finished, parser.skipped)
+        if not parser.finished:
+            break
+        pos = parser.end
+    return best
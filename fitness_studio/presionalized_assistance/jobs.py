@@ -0,0 +1,135 @@
+"""
+Background execution of fitness plan generation jobs.
+
+Jobs are rows in ``PlanGenerationJob``. A bounded thread pool in the web
+process picks them up after the request commits, or, with
+``PLAN_JOBS_IN_PROCESS = False``, the ``run_plan_jobs`` management command
+drains the queue from a separate worker. A job is claimed with a conditional
+UPDATE, so it runs exactly once even if several workers see it.
+
+Settings (all optional):
+
+- ``PLAN_JOB_WORKERS``: concurrent model calls per process (default 4)
+- ``PLAN_JOB_MAX_ATTEMPTS``: tries per job before it fails (default 3)
+- ``PLAN_JOB_TIMEOUT``: seconds allowed per model call (default 120)
+- ``PLAN_JOB_RETRY_DELAY``: base backoff in seconds, doubled per retry (default 2)
+- ``PLAN_JOBS_IN_PROCESS``: run jobs in the web process (default True)
+- ``PLAN_JOBS_EAGER``: run jobs synchronously on commit, for tests (default False)
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from fitness_studio.instrumentation import measure
+
+from .models import PlanGenerationJob
+from .plan_days import create_plan
+from .planner import generate_plan_with_gemini
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_setting('PLAN_JOB_WORKERS', 4),
+                    thread_name_prefix='plan-job',
+                )
+    return _executor
+
+
+def enqueue(job):
+    """Schedule ``job`` to run once the current transaction commits."""
+    if _setting('PLAN_JOBS_EAGER', False):
+        transaction.on_commit(lambda: run_job(job.pk))
+    elif _setting('PLAN_JOBS_IN_PROCESS', True):
+        transaction.on_commit(lambda: get_executor().submit(_run_in_thread, job.pk))
+
+
+def _run_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def claim(job_id):
+    """Move a queued job to running; returns ``False`` if another worker has it."""
+    return bool(
+        PlanGenerationJob.objects.filter(pk=job_id, status=PlanGenerationJob.QUEUED).update(
+            status=PlanGenerationJob.RUNNING
+        )
+    )
+
+
+def run_job(job_id):
+    """Generate the plan for a queued job, retrying with backoff, and record the outcome."""
+    if not claim(job_id):
+        return
+    with measure('plan-job'):
+        _run_claimed(job_id)
+
+
+def _run_claimed(job_id):
+    job = PlanGenerationJob.objects.get(pk=job_id)
+    max_attempts = _setting('PLAN_JOB_MAX_ATTEMPTS', 3)
+    timeout = _setting('PLAN_JOB_TIMEOUT', 120)
+    retry_delay = _setting('PLAN_JOB_RETRY_DELAY', 2)
+
+    for attempt in range(1, max_attempts + 1):
+        PlanGenerationJob.objects.filter(pk=job_id).update(attempts=F('attempts') + 1)
+        try:
+            plan_details = generate_plan_with_gemini(
+                job.goal,
+                job.start_date.isoformat(),
+                job.duration,
+                job.daily_workout_hours,
+                job.budget,
+                timeout=timeout,
+                fresh=job.fresh,
+            )
+        except Exception as e:
+            logger.warning("Plan job %s attempt %s failed: %s", job_id, attempt, e)
+            if attempt == max_attempts:
+                PlanGenerationJob.objects.filter(pk=job_id).update(
+                    status=PlanGenerationJob.FAILED, error=str(e) or e.__class__.__name__
+                )
+                return
+            time.sleep(retry_delay * 2 ** (attempt - 1))
+            continue
+
+        with transaction.atomic():
+            plan = create_plan(
+                job.user_id, job.goal, job.start_date, job.duration, job.budget, plan_details
+            )
+            PlanGenerationJob.objects.filter(pk=job_id).update(
+                status=PlanGenerationJob.SUCCEEDED, plan=plan, error=''
+            )
+        logger.info("Plan job %s succeeded after %s attempt(s)", job_id, attempt)
+        return
+
+
+def run_pending(limit=None):
+    """Run queued jobs through the worker pool; returns how many were dispatched."""
+    queued = PlanGenerationJob.objects.filter(status=PlanGenerationJob.QUEUED).order_by('created_at')
+    job_ids = list(queued.values_list('pk', flat=True)[:limit])
+    futures = [get_executor().submit(_run_in_thread, job_id) for job_id in job_ids]
+    for future in futures:
+        future.result()
+    return len(job_ids)
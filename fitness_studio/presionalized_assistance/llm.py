@@ -0,0 +1,152 @@
+"""
+Language model clients used to generate fitness plans.
+
+The active client is chosen with the ``PLAN_MODEL_CLIENT`` setting (a dotted
+path) and ``PLAN_MODEL_CLIENT_OPTIONS`` (constructor keyword arguments), so
+the Gemini backend can be swapped for ``StubClient`` in tests and load tests.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class ModelTimeout(TimeoutError):
+    """Raised when the model does not answer within the allowed time."""
+
+
+class GeminiClient:
+    """Google Gemini backend."""
+
+    def __init__(self, model_name='models/gemini-1.5-flash'):
+        import google.generativeai as genai
+
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.model = genai.GenerativeModel(model_name=model_name)
+
+    def generate(self, prompt, timeout=None):
+        from google.api_core import exceptions
+
+        request_options = {'timeout': timeout} if timeout else None
+        try:
+            response = self.model.generate_content(prompt, request_options=request_options)
+        except exceptions.DeadlineExceeded as e:
+            raise ModelTimeout(str(e))
+        return response.text
+
+    def stream(self, prompt, timeout=None):
+        """Yield the response text piece by piece as the model produces it."""
+        from google.api_core import exceptions
+
+        request_options = {'timeout': timeout} if timeout else None
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True, request_options=request_options):
+                yield chunk.text
+        except exceptions.DeadlineExceeded as e:
+            raise ModelTimeout(str(e))
+
+    async def astream(self, prompt, timeout=None):
+        """Async ``stream`` over the SDK's asyncio transport, for the ASGI views."""
+        from google.api_core import exceptions
+
+        request_options = {'timeout': timeout} if timeout else None
+        try:
+            response = await self.model.generate_content_async(
+                prompt, stream=True, request_options=request_options
+            )
+            async for chunk in response:
+                yield chunk.text
+        except exceptions.DeadlineExceeded as e:
+            raise ModelTimeout(str(e))
+
+
+class StubClient:
+    """
+    Offline stand-in answering every prompt with a well-formed plan.
+
+    Each call sleeps ``latency`` seconds plus ``latency_per_day`` per requested
+    day to mimic the model round trip, and fails with probability
+    ``failure_rate`` to exercise retries. ``stream`` and ``astream`` spread
+    the per-day part over pieces of ``chunk_size`` characters.
+    """
+
+    def __init__(self, latency=0.0, latency_per_day=0.0, failure_rate=0.0, chunk_size=64):
+        self.latency = latency
+        self.latency_per_day = latency_per_day
+        self.failure_rate = failure_rate
+        self.chunk_size = chunk_size
+
+    def _days(self, prompt):
+        match = re.search(r'list of (\d+) objects', prompt)
+        return int(match.group(1)) if match else 1
+
+    def _text(self, days):
+        if self.failure_rate and random.random() < self.failure_rate:
+            return '[{"mealPlan": "truncated'
+        return json.dumps([
+            {"mealPlan": f"Stub meal plan {day + 1}", "exercisePlan": f"Stub workout {day + 1}"}
+            for day in range(days)
+        ])
+
+    def generate(self, prompt, timeout=None):
+        days = self._days(prompt)
+        latency = self.latency + self.latency_per_day * days
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise ModelTimeout(f"Stub model exceeded {timeout}s")
+        time.sleep(latency)
+        return self._text(days)
+
+    def _pieces(self, prompt):
+        days = self._days(prompt)
+        text = self._text(days)
+        pieces = [text[start:start + self.chunk_size] for start in range(0, len(text), self.chunk_size)]
+        return pieces, self.latency_per_day * days / len(pieces)
+
+    def stream(self, prompt, timeout=None):
+        pieces, delay = self._pieces(prompt)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        time.sleep(self.latency)
+        for piece in pieces:
+            if deadline is not None and time.monotonic() > deadline:
+                raise ModelTimeout(f"Stub model exceeded {timeout}s")
+            yield piece
+            time.sleep(delay)
+
+    async def astream(self, prompt, timeout=None):
+        pieces, delay = self._pieces(prompt)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        await asyncio.sleep(self.latency)
+        for piece in pieces:
+            if deadline is not None and time.monotonic() > deadline:
+                raise ModelTimeout(f"Stub model exceeded {timeout}s")
+            yield piece
+            await asyncio.sleep(delay)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the configured model client, built once per process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                client_class = import_string(getattr(
+                    settings, 'PLAN_MODEL_CLIENT', 'presionalized_assistance.llm.GeminiClient'
+                ))
+                _client = client_class(**getattr(settings, 'PLAN_MODEL_CLIENT_OPTIONS', {}))
+    return _client
+
+
+def reset_client():
+    """Drop the cached client so the next call re-reads settings."""
+    global _client
+    _client = None
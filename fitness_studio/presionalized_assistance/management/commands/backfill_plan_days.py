@@ -0,0 +1,19 @@
+"""
+Copy day entries from existing plans' ``plan_details`` JSON into ``PlanDay``.
+
+Safe to re-run: plans that already have day rows are skipped.
+"""
+from django.core.management.base import BaseCommand
+
+from presionalized_assistance.plan_days import backfill, BACKFILL_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Backfill per-day plan rows from the plan_details JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, help="Plans per batch")
+
+    def handle(self, *args, **options):
+        plans, days = backfill(options['batch_size'])
+        self.stdout.write(f"Backfilled {days} day(s) across {plans} plan(s)")
@@ -0,0 +1,87 @@
+"""
+Benchmark plan reads with 365-day plans: JSON blob scan versus ``PlanDay`` rows.
+
+Seeds one member's plans inside a transaction that is rolled back at the end.
+Measures the old date lookup (load ``plan_details``, scan for the date)
+against the indexed row fetch, and the full-blob plan list against summaries.
+"""
+import datetime
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from presionalized_assistance.models import PersonalizedFitnessPlan, PlanDay
+from presionalized_assistance.plan_days import store_days
+from presionalized_assistance.serializers import FitnessPlanSerializer, FitnessPlanSummarySerializer
+
+
+class Command(BaseCommand):
+    help = "Compare JSON-scan and per-day-row plan lookups on 365-day plans."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plans', type=int, default=50, help="Plans for the benchmark member")
+        parser.add_argument('--days', type=int, default=365, help="Days per plan")
+        parser.add_argument('--repeat', type=int, default=200, help="Lookups per measurement")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(username='bench-plan-days')
+            start = datetime.date(2030, 1, 1)
+            plan_ids = []
+            for index in range(options['plans']):
+                plan = PersonalizedFitnessPlan.objects.create(
+                    user=user,
+                    plan_name=f"Benchmark plan {index}",
+                    start_date=start,
+                    duration=options['days'],
+                    price=100,
+                    plan_details=[
+                        {
+                            "date": (start + datetime.timedelta(days=day)).isoformat(),
+                            "mealPlan": "Oats, eggs, rice, lentils and vegetables. " * 4,
+                            "exercisePlan": "Squats 4x8, bench 4x8, rows 4x10, 20 min zone 2. " * 4,
+                        }
+                        for day in range(options['days'])
+                    ],
+                )
+                store_days(plan)
+                plan_ids.append(plan.id)
+
+            targets = [
+                (random.choice(plan_ids), (start + datetime.timedelta(days=random.randrange(options['days']))).isoformat())
+                for _ in range(options['repeat'])
+            ]
+
+            def json_scan(plan_id, target_date):
+                plan = PersonalizedFitnessPlan.objects.get(id=plan_id, user=user)
+                return next(day for day in plan.plan_details if day.get("date") == target_date)
+
+            def row_fetch(plan_id, target_date):
+                return PlanDay.objects.filter(
+                    plan_id=plan_id, plan__user=user, date=datetime.date.fromisoformat(target_date)
+                ).first().as_dict()
+
+            for label, lookup in (("json scan", json_scan), ("day row", row_fetch)):
+                self.stdout.write(f"date lookup, {label:>9}: {self._measure(lookup, targets) * 1000:8.3f} ms")
+
+            full = self._time(lambda: FitnessPlanSerializer(
+                PersonalizedFitnessPlan.objects.filter(user=user), many=True
+            ).data)
+            summary = self._time(lambda: FitnessPlanSummarySerializer(
+                PersonalizedFitnessPlan.objects.filter(user=user).defer('plan_details'), many=True
+            ).data)
+            self.stdout.write(f"plan list,   full blobs: {full * 1000:8.3f} ms")
+            self.stdout.write(f"plan list,    summaries: {summary * 1000:8.3f} ms")
+            transaction.set_rollback(True)
+
+    def _measure(self, lookup, targets):
+        return statistics.median(self._time(lambda: lookup(*target)) for target in targets)
+
+    def _time(self, func):
+        started = time.perf_counter()
+        func()
+        return time.perf_counter() - started
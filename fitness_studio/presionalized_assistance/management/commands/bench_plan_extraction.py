@@ -0,0 +1,67 @@
+"""
+Benchmark day extraction on multi-megabyte model responses.
+
+Compares the previous greedy regex plus ``json.loads`` with ``extract_days``
+on a well-formed response wrapped in a code fence, the same response with a
+bracketed note after the fence, and the response cut off mid-object. The
+regex recovers nothing from the last two.
+"""
+import json
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from presionalized_assistance.extraction import extract_days
+
+_GREEDY_LIST = re.compile(r'\[\s*{.*}\s*\]', re.DOTALL)
+
+
+def regex_extract(text):
+    match = _GREEDY_LIST.search(text)
+    if not match:
+        return []
+    try:
+        return json.loads(match.group(0))
+    except ValueError:
+        return []
+
+
+class Command(BaseCommand):
+    help = "Compare regex and single-pass day extraction on large responses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,4,16', help="Comma separated response sizes in MB")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        for size in (float(size) for size in options['sizes'].split(',')):
+            text = self._response(int(size * 1024 * 1024))
+            bodies = (
+                ("complete", text),
+                ("note", text + " Swap foods from [{your pantry}] as needed."),
+                ("truncated", text[:len(text) * 2 // 3]),
+            )
+            for label, body in bodies:
+                row = []
+                for name, extract in (("regex", regex_extract), ("extract_days", lambda t: extract_days(t).days)):
+                    elapsed, days = self._measure(extract, body, options['repeat'])
+                    row.append(f"{name} {elapsed * 1000:9.1f} ms ({len(days)} days)")
+                self.stdout.write(f"{size:5.1f} MB {label:>9}: " + ", ".join(row))
+
+    def _response(self, size):
+        day = {
+            "mealPlan": "Breakfast: oats {steel cut} with \"berries\"; lunch: rice [brown], dal. " * 3,
+            "exercisePlan": "Warm-up 10 min; squats 4x8 @ RPE 7; rows 4x10; \\ cooldown. " * 3,
+        }
+        count = max(1, size // len(json.dumps(day)))
+        return "Here is your plan:\n```json\n" + json.dumps([day] * count, indent=2) + "\n```\nStay hydrated!"
+
+    def _measure(self, extract, text, repeat):
+        best, days = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            days = extract(text)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, days
@@ -0,0 +1,68 @@
+"""
+Benchmark plan generation, one prompt for the whole plan versus week chunks.
+
+Runs against ``StubClient`` so no API key is needed; its latency grows with
+the number of requested days, like a real model's output time does.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from presionalized_assistance.llm import StubClient
+from presionalized_assistance.planner import generate_plan_chunked, generate_plan_single, stream_plan
+
+
+class Command(BaseCommand):
+    help = "Compare end-to-end plan generation time, single prompt against parallel chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=int, default=90, help="Plan length in days")
+        parser.add_argument('--latency', type=float, default=0.5, help="Fixed seconds per model call")
+        parser.add_argument('--latency-per-day', type=float, default=0.05, help="Extra seconds per requested day")
+        parser.add_argument('--failure-rate', type=float, default=0.0, help="Chance a chunk comes back truncated")
+        parser.add_argument('--chunk-days', type=int, default=7, help="Days per chunk")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent chunk requests")
+
+    def handle(self, *args, **options):
+        client = StubClient(
+            latency=options['latency'],
+            latency_per_day=options['latency_per_day'],
+            failure_rate=options['failure_rate'],
+        )
+        duration = options['duration']
+        start_date = '2030-01-01'
+
+        started = time.perf_counter()
+        try:
+            generate_plan_single('strength', start_date, duration, 1, 100, client=client)
+            single = f"{time.perf_counter() - started:.2f}s"
+        except ValueError as e:
+            single = f"failed ({e})"
+        self.stdout.write(f"single prompt: {single}")
+
+        started = time.perf_counter()
+        first_day = None
+        try:
+            for _ in stream_plan('strength', start_date, duration, 1, 100, client=client, fresh=True):
+                if first_day is None:
+                    first_day = time.perf_counter() - started
+            streamed = f"first day after {first_day:.2f}s, all after {time.perf_counter() - started:.2f}s"
+        except ValueError as e:
+            streamed = f"failed ({e})"
+        self.stdout.write(f"streamed: {streamed}")
+
+        started = time.perf_counter()
+        plan, reports = generate_plan_chunked(
+            'strength', start_date, duration, 1, 100, client=client,
+            chunk_days=options['chunk_days'], max_workers=options['workers'],
+        )
+        elapsed = time.perf_counter() - started
+        for report in reports:
+            self.stdout.write(
+                f"  days {report.first_day + 1:>3}-{report.first_day + report.days:<3} "
+                f"{report.latency:.2f}s, {report.attempts} attempt(s)"
+            )
+        self.stdout.write(
+            f"chunked ({options['workers']} workers): {elapsed:.2f}s for {len(plan)} days"
+        )
+
@@ -0,0 +1,42 @@
+"""
+Worker process draining the fitness plan generation queue.
+
+Use with ``PLAN_JOBS_IN_PROCESS = False`` to keep model calls out of the web
+workers entirely, or alongside it to pick up jobs left behind by a restart.
+"""
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from presionalized_assistance.jobs import run_pending
+from presionalized_assistance.models import PlanGenerationJob
+
+
+class Command(BaseCommand):
+    help = "Run queued fitness plan generation jobs with bounded concurrency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between queue polls")
+        parser.add_argument(
+            '--requeue-after', type=int, default=900,
+            help="Requeue jobs stuck in 'running' for this many seconds"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stale = timezone.now() - timedelta(seconds=options['requeue_after'])
+            requeued = PlanGenerationJob.objects.filter(
+                status=PlanGenerationJob.RUNNING, updated_at__lt=stale
+            ).update(status=PlanGenerationJob.QUEUED)
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+            dispatched = run_pending()
+            if dispatched:
+                self.stdout.write(f"Ran {dispatched} job(s)")
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
@@ -14,3 +14,63 @@ class PersonalizedFitnessPlan(models.Model):
 
     def __str__(self):
         return f"{self.plan_name} ({self.user.username})"
+
+
+class PlanDay(models.Model):
+    """One day of a plan, so a date lookup is an indexed row fetch instead of a JSON scan."""
+
+    plan = models.ForeignKey(PersonalizedFitnessPlan, on_delete=models.CASCADE, related_name="days")
+    date = models.DateField()
+    meal_plan = models.TextField(blank=True)
+    exercise_plan = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ('plan', 'date')
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.plan_id} {self.date}"
+
+    def as_dict(self):
+        """Render the day in the shape of a ``plan_details`` entry."""
+        return {
+            "date": self.date.isoformat(),
+            "mealPlan": self.meal_plan,
+            "exercisePlan": self.exercise_plan,
+        }
+
+
+class PlanGenerationJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="plan_jobs")
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    goal = models.TextField()
+    start_date = models.DateField()
+    duration = models.IntegerField(help_text="Duration in days")
+    daily_workout_hours = models.IntegerField()
+    budget = models.DecimalField(max_digits=10, decimal_places=2)
+    fresh = models.BooleanField(default=False, help_text="Skip the plan template cache")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    plan = models.ForeignKey(
+        PersonalizedFitnessPlan, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'], name='plan_job_queue_idx')]
+
+    def __str__(self):
+        return f"Plan job {self.pk} ({self.status})"
@@ -0,0 +1,115 @@
+"""
+Cache of generated plan templates for near-identical requests.
+
+Members asking for the same goal, duration, daily hours and budget band get
+the same day list, so it is stored once without dates and re-dated to each
+request's start date on a hit. Configured with the ``PLAN_CACHE`` setting::
+
+    PLAN_CACHE = {
+        'ENABLED': True,
+        'TIMEOUT': 86400,      # seconds a template may be reused
+        'MAX_ENTRIES': 256,    # least recently used templates are evicted
+        'BUDGET_BUCKET': 50,   # budgets are grouped into bands this wide
+    }
+"""
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+import re
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TIMEOUT': 86400,
+    'MAX_ENTRIES': 256,
+    'BUDGET_BUCKET': 50,
+}
+
+
+def _options():
+    return {**DEFAULTS, **getattr(settings, 'PLAN_CACHE', {})}
+
+
+def normalise_goal(goal):
+    """Lower-case the goal and collapse punctuation and whitespace."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(goal).lower()).split())
+
+
+def template_key(goal, duration, hours, budget):
+    """Key a request by its normalised inputs; ``None`` if the budget is not a number."""
+    try:
+        bucket = int(Decimal(str(budget)) // _options()['BUDGET_BUCKET'])
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return (normalise_goal(goal), int(duration), int(hours), bucket)
+
+
+class PlanTemplateCache:
+    """Thread-safe LRU store of undated day lists with a per-entry TTL."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, days):
+        with self._lock:
+            self._entries[key] = (days, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide template cache, or ``None`` when disabled."""
+    global _cache
+    options = _options()
+    if not options['ENABLED']:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PlanTemplateCache(options['MAX_ENTRIES'], options['TIMEOUT'])
+    return _cache
+
+
+def reset_cache():
+    """Drop every template and counter; the next call re-reads settings."""
+    global _cache
+    _cache = None
@@ -0,0 +1,74 @@
+"""
+Per-day rows for fitness plans.
+
+``PersonalizedFitnessPlan.plan_details`` keeps the generated JSON list as
+before; every day is also stored as a ``PlanDay`` row keyed by (plan, date),
+which is what the date and day-range endpoints read. Plans created before the
+table existed are filled in by the ``backfill_plan_days`` command.
+"""
+import datetime
+
+from django.db import transaction
+
+from .models import PersonalizedFitnessPlan, PlanDay
+
+BACKFILL_BATCH_SIZE = 200
+
+
+def build_days(plan, plan_details):
+    """Turn ``plan_details`` entries into unsaved ``PlanDay`` rows, skipping undated ones."""
+    days = []
+    for entry in plan_details or []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            date = datetime.date.fromisoformat(str(entry.get("date")))
+        except ValueError:
+            continue
+        days.append(PlanDay(
+            plan=plan,
+            date=date,
+            meal_plan=entry.get("mealPlan", ""),
+            exercise_plan=entry.get("exercisePlan", ""),
+        ))
+    return days
+
+
+def store_days(plan):
+    """Write the day rows for ``plan``; existing dates are left untouched."""
+    return len(PlanDay.objects.bulk_create(
+        build_days(plan, plan.plan_details), ignore_conflicts=True
+    ))
+
+
+def create_plan(user_id, goal, start_date, duration, budget, plan_details):
+    """Save a generated plan together with its day rows."""
+    with transaction.atomic():
+        plan = PersonalizedFitnessPlan.objects.create(
+            user_id=user_id,
+            plan_name=f"{goal.capitalize()} Plan ({start_date})",
+            description=f"{goal.capitalize()} plan generated with Gemini AI.",
+            start_date=start_date,
+            duration=duration,
+            price=budget,
+            plan_details=plan_details
+        )
+        store_days(plan)
+    return plan
+
+
+def backfill(batch_size=BACKFILL_BATCH_SIZE):
+    """Create day rows for every plan that has none yet; returns ``(plans, days)``."""
+    plans = days = 0
+    queryset = PersonalizedFitnessPlan.objects.filter(days__isnull=True).only('id', 'plan_details')
+    while True:
+        batch = list(queryset.order_by('id')[:batch_size])
+        if not batch:
+            return plans, days
+        rows = [day for plan in batch for day in build_days(plan, plan.plan_details)]
+        with transaction.atomic():
+            PlanDay.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        plans += len(batch)
+        days += len(rows)
+        # Plans without any usable dates would be picked up again forever.
+        queryset = queryset.filter(id__gt=batch[-1].id)
@@ -0,0 +1,300 @@
+"""
+Fitness plan generation: prompt construction and response parsing.
+
+Long plans are requested in week-sized chunks through a bounded thread pool,
+so each model response stays small, a truncated answer only costs one chunk,
+and the chunks are generated concurrently.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
+from dataclasses import dataclass
+import datetime
+import logging
+import time
+
+from django.conf import settings
+
+from fitness_studio.instrumentation import timed
+
+from . import plan_cache
+from .extraction import DayStreamParser, extract_days
+from .llm import get_client
+
+logger = logging.getLogger(__name__)
+
+
+def build_prompt(goal, start_date, duration, hours, budget, part=None):
+    """
+    Build the plan prompt; ``part`` is ``(first_day, last_day, total_days)``
+    when only a chunk of a longer plan is requested.
+    """
+    continuation = ""
+    if part is not None:
+        first_day, last_day, total_days = part
+        continuation = (
+            f"\n    These are days {first_day} to {last_day} of a {total_days}-day plan;"
+            f" keep the progression consistent with that position in the plan.\n"
+        )
+    return f"""
+    I want you to create a personalized fitness plan.
+    Goal: {goal}
+    Start Date: {start_date}
+    Duration: {duration} days
+    Daily Workout Hours: {hours}
+    Budget: {budget}
+    {continuation}
+    For each day, provide:
+    - Meal Plan
+    - Workout Plan
+
+    Output ONLY the following JSON list format:
+    [
+      {{
+        "mealPlan": "...",
+        "exercisePlan": "..."
+      }},
+      ...
+    ]
+    Only give me a list of {duration} objects. Don't include anything else like notes or comments.
+    """
+
+
+def parse_days(raw_text):
+    """Extract the list of day objects from a model response."""
+    result = extract_days(raw_text)
+    if not result.days:
+        raise ValueError("No valid JSON found in Gemini response.")
+    return result.days
+
+
+def _date_day(base_date, index, day):
+    current_date = base_date + datetime.timedelta(days=index)
+    return {
+        "date": current_date.strftime("%Y-%m-%d"),
+        "mealPlan": day.get("mealPlan", ""),
+        "exercisePlan": day.get("exercisePlan", "")
+    }
+
+
+def date_days(parsed_days, start_date):
+    """Attach consecutive dates, starting at ``start_date``, to parsed day objects."""
+    base_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+    return [_date_day(base_date, i, day) for i, day in enumerate(parsed_days)]
+
+
+@dataclass
+class ChunkReport:
+    """Timing of one chunk of a chunked generation."""
+
+    first_day: int
+    days: int
+    attempts: int = 0
+    latency: float = 0.0
+    error: str = ''
+
+
+def _generate_chunk(client, goal, start_date, duration, hours, budget, report, timeout):
+    base_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+    chunk_start = (base_date + datetime.timedelta(days=report.first_day)).strftime("%Y-%m-%d")
+    prompt = build_prompt(
+        goal, chunk_start, report.days, hours, budget,
+        part=(report.first_day + 1, report.first_day + report.days, duration),
+    )
+    started = time.perf_counter()
+    try:
+        with timed('external'):
+            raw_text = client.generate(prompt, timeout=timeout)
+        parsed_days = parse_days(raw_text)
+        if len(parsed_days) < report.days:
+            raise ValueError(f"Expected {report.days} days, got {len(parsed_days)}")
+        return parsed_days[:report.days]
+    finally:
+        report.latency = time.perf_counter() - started
+
+
+def generate_plan_chunked(goal, start_date, duration, hours, budget, client=None, timeout=None,
+                          chunk_days=7, max_workers=4, max_attempts=3):
+    """
+    Generate a plan in ``chunk_days`` pieces concurrently and stitch them in order.
+
+    Only chunks that fail are requested again, up to ``max_attempts`` times
+    each. Returns ``(plan_data, reports)`` with one ``ChunkReport`` per chunk.
+    """
+    client = client or get_client()
+    reports = [
+        ChunkReport(first_day=first_day, days=min(chunk_days, duration - first_day))
+        for first_day in range(0, duration, chunk_days)
+    ]
+    chunks = {}
+    pending = reports
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='plan-chunk') as pool:
+        for _ in range(max_attempts):
+            futures = {}
+            for report in pending:
+                report.attempts += 1
+                # Each chunk runs in a copy of the caller's context, so its model call is timed.
+                futures[pool.submit(
+                    contextvars.copy_context().run, _generate_chunk, client, goal, start_date, duration, hours, budget, report, timeout
+                )] = report
+            failed = []
+            for future in as_completed(futures):
+                report = futures[future]
+                try:
+                    chunks[report.first_day] = future.result()
+                    report.error = ''
+                except Exception as e:
+                    report.error = str(e) or e.__class__.__name__
+                    failed.append(report)
+            pending = failed
+            if not pending:
+                break
+
+    for report in reports:
+        logger.info(
+            "Plan chunk days %s-%s: %.2fs over %s attempt(s)%s",
+            report.first_day + 1, report.first_day + report.days, report.latency, report.attempts,
+            f" (failed: {report.error})" if report.error else "",
+        )
+    if pending:
+        raise ValueError(
+            f"Failed to generate {len(pending)} of {len(reports)} plan chunks: {pending[0].error}"
+        )
+
+    parsed_days = [day for first_day in sorted(chunks) for day in chunks[first_day]]
+    return date_days(parsed_days, start_date), reports
+
+
+def generate_plan_single(goal, start_date, duration, hours, budget, client=None, timeout=None):
+    """
+    Request the whole plan in one prompt and return the dated day list.
+
+    If the answer is cut short, the days before the cut are kept and only the
+    missing ones are requested again.
+    """
+    client = client or get_client()
+    with timed('external'):
+        raw_text = client.generate(build_prompt(goal, start_date, duration, hours, budget), timeout=timeout)
+    logger.debug("Gemini Response: %s", raw_text)
+
+    result = extract_days(raw_text)
+    if not result.days:
+        logger.warning("Gemini Parsing Error: no day objects in a %s character response", len(raw_text))
+        raise ValueError("Failed to parse JSON from Gemini response.")
+    parsed_days = result.days[:duration]
+    if len(parsed_days) < duration:
+        logger.warning(
+            "Salvaged %s of %s days (%s skipped); regenerating the rest",
+            result.salvaged, duration, result.skipped,
+        )
+        report = ChunkReport(first_day=len(parsed_days), days=duration - len(parsed_days))
+        try:
+            parsed_days += _generate_chunk(client, goal, start_date, duration, hours, budget, report, timeout)
+        except Exception as e:
+            logger.warning("Gemini Parsing Error: %s", e)
+            raise ValueError("Failed to parse JSON from Gemini response.")
+    return date_days(parsed_days, start_date)
+
+
+def _generate(goal, start_date, duration, hours, budget, client, timeout):
+    if duration < getattr(settings, 'PLAN_CHUNKED_MIN_DURATION', 28):
+        return generate_plan_single(goal, start_date, duration, hours, budget, client, timeout)
+    plan_data, _ = generate_plan_chunked(
+        goal, start_date, duration, hours, budget, client=client, timeout=timeout,
+        chunk_days=getattr(settings, 'PLAN_CHUNK_DAYS', 7),
+        max_workers=getattr(settings, 'PLAN_CHUNK_WORKERS', 4),
+    )
+    return plan_data
+
+
+def _template_lookup(goal, duration, hours, budget, fresh):
+    """Return ``(cache, key, cached_days)`` for a request; the cache part may be ``None``."""
+    cache = plan_cache.get_cache()
+    key = plan_cache.template_key(goal, duration, hours, budget) if cache else None
+    if key is None:
+        return None, None, None
+    days = None if fresh else cache.get(key)
+    if days is not None:
+        logger.info("Plan template cache hit for %s", key)
+    return cache, key, days
+
+
+def _store_template(cache, key, plan_data):
+    if key is not None:
+        cache.set(key, [
+            {"mealPlan": day["mealPlan"], "exercisePlan": day["exercisePlan"]} for day in plan_data
+        ])
+
+
+def generate_plan_with_gemini(goal, start_date, duration, hours, budget, client=None, timeout=None,
+                              fresh=False):
+    """
+    Generate the dated day list for a plan.
+
+    A cached template for the same normalised inputs is re-dated to
+    ``start_date`` instead of calling the model, unless ``fresh`` is set.
+    Plans of at least ``PLAN_CHUNKED_MIN_DURATION`` days are generated in
+    chunks; shorter ones are requested in a single prompt.
+    """
+    cache, key, days = _template_lookup(goal, duration, hours, budget, fresh)
+    if days is not None:
+        return date_days(days, start_date)
+
+    plan_data = _generate(goal, start_date, duration, hours, budget, client, timeout)
+    _store_template(cache, key, plan_data)
+    return plan_data
+
+
+class _DayCollector:
+    """Dates days as the stream parser completes them, up to ``duration``."""
+
+    def __init__(self, start_date, duration):
+        self.base_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
+        self.duration = duration
+        self.parser = DayStreamParser()
+        self.plan_data = []
+
+    def feed(self, piece):
+        for day in self.parser.feed(piece):
+            if len(self.plan_data) < self.duration:
+                self.plan_data.append(_date_day(self.base_date, len(self.plan_data), day))
+                yield self.plan_data[-1]
+
+    def finish(self):
+        if len(self.plan_data) < self.duration:
+            raise ValueError(f"Gemini stream ended after {len(self.plan_data)} of {self.duration} days.")
+        return self.plan_data
+
+
+def stream_plan(goal, start_date, duration, hours, budget, client=None, timeout=None, fresh=False):
+    """
+    Yield dated days one at a time as the model's streamed answer completes them.
+
+    A cached template is replayed immediately. Raises ``ValueError`` if the
+    stream ends before ``duration`` days have arrived.
+    """
+    cache, key, days = _template_lookup(goal, duration, hours, budget, fresh)
+    if days is not None:
+        yield from date_days(days, start_date)
+        return
+
+    client = client or get_client()
+    collector = _DayCollector(start_date, duration)
+    for piece in client.stream(build_prompt(goal, start_date, duration, hours, budget), timeout=timeout):
+        yield from collector.feed(piece)
+    _store_template(cache, key, collector.finish())
+
+
+async def astream_plan(goal, start_date, duration, hours, budget, client=None, timeout=None, fresh=False):
+    """Async ``stream_plan`` reading the model through the client's ``astream``."""
+    cache, key, days = _template_lookup(goal, duration, hours, budget, fresh)
+    if days is not None:
+        for day in date_days(days, start_date):
+            yield day
+        return
+
+    client = client or get_client()
+    collector = _DayCollector(start_date, duration)
+    async for piece in client.astream(build_prompt(goal, start_date, duration, hours, budget), timeout=timeout):
+        for day in collector.feed(piece):
+            yield day
+    _store_template(cache, key, collector.finish())
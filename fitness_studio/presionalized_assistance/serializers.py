@@ -1,8 +1,47 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
-from .models import PersonalizedFitnessPlan
+from .models import PersonalizedFitnessPlan, PlanGenerationJob
 
 class FitnessPlanSerializer(serializers.ModelSerializer):
     class Meta:
         model = PersonalizedFitnessPlan
         fields = '__all__'
-        read_only_fields = ('created_at',)
\ No newline at end of file
+        read_only_fields = ('created_at',)
+
+class FitnessPlanSummarySerializer(serializers.ModelSerializer):
+    """Plan without its day list; days are fetched from ``days_url``."""
+    days_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PersonalizedFitnessPlan
+        exclude = ('plan_details',)
+
+    def get_days_url(self, obj):
+        return reverse('plan-days', args=[obj.id])
+
+class PlanGenerationJobSerializer(serializers.ModelSerializer):
+    plan = FitnessPlanSerializer(read_only=True)
+
+    class Meta:
+        model = PlanGenerationJob
+        fields = ['id', 'status', 'attempts', 'error', 'plan', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class PlanRequestSerializer(serializers.Serializer):
+    """Input of the plan generation endpoints."""
+    goal = serializers.CharField(max_length=200)
+    start_date = serializers.DateField(input_formats=['%Y-%m-%d'])
+    duration = serializers.IntegerField(min_value=1, default=30)
+    daily_workout_hours = serializers.IntegerField(min_value=1, max_value=24, default=1)
+    budget = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    fresh = serializers.BooleanField(default=False)
+
+    def validate_duration(self, value):
+        # The model is called once per PLAN_CHUNK_DAYS, so the length bounds the cost.
+        limit = getattr(settings, 'PLAN_MAX_DURATION', 180)
+        if value > limit:
+            raise serializers.ValidationError(f"Ensure this value is less than or equal to {limit}.")
+        return value
@@ -1,3 +1,866 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import json
+import random
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from fitness_studio import instrumentation, throttling
+from userprofile.models import UserProfile
+
+from . import jobs, llm, plan_cache, plan_days, planner, throttles
+from .extraction import DayStreamParser, extract_days
+from .models import PersonalizedFitnessPlan, PlanDay, PlanGenerationJob
+
+
+def _close(response):
+    """Close ``response`` as the server does, keeping the test's database connection open."""
+    # The test client's own closer reconnects close_old_connections before
+    # ``close`` sends request_finished, so keep the signal quiet instead.
+    with mock.patch.object(request_finished, 'send'):
+        response.close()
+
+
+class FlakyClient(llm.StubClient):
+    """Stub that fails a fixed number of calls before answering."""
+
+    failures = 0
+
+    def generate(self, prompt, timeout=None):
+        if FlakyClient.failures:
+            FlakyClient.failures -= 1
+            raise llm.ModelTimeout("simulated timeout")
+        return super().generate(prompt, timeout)
+
+
+class TruncatingClient(llm.StubClient):
+    """Stub that cuts off its answer for chunks starting on the given days."""
+
+    def __init__(self, truncate_days=(), **kwargs):
+        super().__init__(**kwargs)
+        self.truncate_days = set(truncate_days)
+        self.prompts = []
+
+    def generate(self, prompt, timeout=None):
+        self.prompts.append(prompt)
+        for day in list(self.truncate_days):
+            if f"These are days {day} to" in prompt:
+                self.truncate_days.discard(day)
+                return '[{"mealPlan": "cut'
+        return super().generate(prompt, timeout)
+
+
+@override_settings(
+    PLAN_MODEL_CLIENT='presionalized_assistance.llm.StubClient',
+    PLAN_JOBS_EAGER=True,
+    PLAN_JOB_RETRY_DELAY=0,
+)
+class PlanGenerationJobTests(TestCase):
+    """Tests for asynchronous plan generation jobs."""
+
+    def setUp(self):
+        llm.reset_client()
+        plan_cache.reset_cache()
+        throttling.reset_backend()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret')
+        UserProfile.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.payload = {
+            "goal": "strength",
+            "start_date": (date.today() + timedelta(days=1)).isoformat(),
+            "duration": 7,
+            "daily_workout_hours": 1,
+            "budget": "50.00",
+        }
+
+    def tearDown(self):
+        llm.reset_client()
+        plan_cache.reset_cache()
+
+    def test_post_returns_job_and_completes(self):
+        """Test the endpoint answers 202 and the job produces a dated plan."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], PlanGenerationJob.QUEUED)
+
+        response = self.client.get(response.data['status_url'])
+        self.assertEqual(response.data['status'], PlanGenerationJob.SUCCEEDED)
+        self.assertEqual(len(response.data['plan']['plan_details']), 7)
+        self.assertEqual(response.data['plan']['plan_details'][0]['date'], self.payload['start_date'])
+
+    @override_settings(PLAN_MODEL_CLIENT='presionalized_assistance.tests.FlakyClient', PLAN_JOB_MAX_ATTEMPTS=3)
+    def test_retries_then_succeeds(self):
+        """Test failed model calls are retried."""
+        FlakyClient.failures = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+        job = PlanGenerationJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, PlanGenerationJob.SUCCEEDED)
+        self.assertEqual(job.attempts, 3)
+
+    @override_settings(PLAN_MODEL_CLIENT='presionalized_assistance.tests.FlakyClient', PLAN_JOB_MAX_ATTEMPTS=2)
+    def test_gives_up_after_max_attempts(self):
+        """Test a job fails with the last error once attempts run out."""
+        FlakyClient.failures = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+        job = PlanGenerationJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, PlanGenerationJob.FAILED)
+        self.assertIn("simulated timeout", job.error)
+        self.assertFalse(PersonalizedFitnessPlan.objects.exists())
+
+    def test_job_runs_once(self):
+        """Test a job claimed by one worker is not run again."""
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+        job_id = response.data['job_id']
+        jobs.run_job(job_id)
+        jobs.run_job(job_id)
+        self.assertEqual(PersonalizedFitnessPlan.objects.count(), 1)
+
+    def test_stub_timeout(self):
+        """Test the stub honours the call timeout."""
+        with self.assertRaises(llm.ModelTimeout):
+            llm.StubClient(latency=0.05).generate("list of 1 objects", timeout=0.01)
+
+    def test_fresh_flag_stored(self):
+        """Test members can ask for a plan that skips the template cache."""
+        with self.captureOnCommitCallbacks(execute=False):
+            response = self.client.post(reverse('generate-plan'), dict(self.payload, fresh=True), format='json')
+        self.assertTrue(PlanGenerationJob.objects.get(pk=response.data['job_id']).fresh)
+
+    def test_invalid_start_date(self):
+        """Test malformed start dates are rejected before a job is queued."""
+        response = self.client.post(reverse('generate-plan'), dict(self.payload, start_date="tomorrow"), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(PLAN_MAX_DURATION=90, THROTTLING={'RATES': {'ai_generation': '100/hour'}})
+    def test_invalid_plan_fields(self):
+        """Test out-of-range or malformed plan fields get a 400 naming the field, not a 500."""
+        cases = [
+            ('duration', 'thirty'),
+            ('duration', -5),
+            ('duration', 0),
+            ('duration', 91),
+            ('daily_workout_hours', 'two'),
+            ('daily_workout_hours', 25),
+            ('budget', 'cheap'),
+            ('budget', '-10'),
+            ('budget', '1.005'),
+            ('goal', ['strength']),
+        ]
+        for field, value in cases:
+            with self.subTest(field=field, value=value):
+                response = self.client.post(reverse('generate-plan'), dict(self.payload, **{field: value}), format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(field, response.json())
+        self.assertFalse(PlanGenerationJob.objects.exists())
+
+        response = self.client.post(reverse('generate-plan'), dict(self.payload, duration=90), format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_other_users_job_hidden(self):
+        """Test users cannot read each other's jobs."""
+        job = PlanGenerationJob.objects.create(
+            user=User.objects.create_user(username='other'),
+            goal='x', start_date=date.today(), duration=1, daily_workout_hours=1, budget=1
+        )
+        response = self.client.get(reverse('plan-job-detail', args=[job.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ChunkedPlanTests(TestCase):
+    """Tests for chunked, parallel plan generation."""
+
+    def setUp(self):
+        plan_cache.reset_cache()
+
+    def tearDown(self):
+        plan_cache.reset_cache()
+
+    def test_chunks_stitched_in_order(self):
+        """Test chunk results are joined in day order with consecutive dates."""
+        plan, reports = planner.generate_plan_chunked(
+            'strength', '2030-01-30', 30, 1, 50, client=llm.StubClient(), chunk_days=7
+        )
+        self.assertEqual([report.days for report in reports], [7, 7, 7, 7, 2])
+        self.assertEqual(len(plan), 30)
+        self.assertEqual(plan[0]['date'], '2030-01-30')
+        self.assertEqual(plan[2]['date'], '2030-02-01')
+        self.assertEqual(plan[-1]['date'], '2030-02-28')
+        self.assertEqual(plan[7]['mealPlan'], "Stub meal plan 1")
+
+    def test_only_failed_chunks_retried(self):
+        """Test a truncated chunk is requested again without redoing the others."""
+        client = TruncatingClient(truncate_days=[15])
+        plan, reports = planner.generate_plan_chunked(
+            'strength', '2030-01-01', 28, 1, 50, client=client, chunk_days=7
+        )
+        self.assertEqual(len(plan), 28)
+        self.assertEqual([report.attempts for report in reports], [1, 1, 2, 1])
+        self.assertEqual(len(client.prompts), 5)
+
+    def test_gives_up_when_chunk_keeps_failing(self):
+        """Test a chunk failing every attempt fails the plan."""
+        client = llm.StubClient(failure_rate=1.0)
+        with self.assertRaises(ValueError):
+            planner.generate_plan_chunked('strength', '2030-01-01', 14, 1, 50, client=client, max_attempts=2)
+
+    def test_parallel_chunks_faster(self):
+        """Test concurrent chunks finish well before the sum of their latencies."""
+        started = time.perf_counter()
+        _, reports = planner.generate_plan_chunked(
+            'strength', '2030-01-01', 28, 1, 50,
+            client=llm.StubClient(latency=0.1), chunk_days=7, max_workers=4
+        )
+        elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, sum(report.latency for report in reports) / 2)
+
+    def test_chunk_model_calls_timed(self):
+        """Test model calls made by chunk workers count as external time of the caller."""
+        with instrumentation.measure() as timings:
+            planner.generate_plan_chunked(
+                'strength', '2030-01-01', 14, 1, 50, client=llm.StubClient(latency=0.05), chunk_days=7
+            )
+        self.assertGreaterEqual(timings.phases['external'], 0.1)
+
+    @override_settings(PLAN_CHUNKED_MIN_DURATION=14, PLAN_CHUNK_DAYS=7)
+    def test_long_plans_use_chunks(self):
+        """Test plans above the threshold are generated in chunks."""
+        client = TruncatingClient()
+        plan = planner.generate_plan_with_gemini('strength', '2030-01-01', 21, 1, 50, client=client)
+        self.assertEqual(len(plan), 21)
+        self.assertEqual(len(client.prompts), 3)
+
+
+class PlanTemplateCacheTests(TestCase):
+    """Tests for the plan template cache."""
+
+    def setUp(self):
+        plan_cache.reset_cache()
+        self.client = TruncatingClient()
+
+    def tearDown(self):
+        plan_cache.reset_cache()
+
+    def test_hit_redates_without_model_call(self):
+        """Test a near-identical request reuses the template with its own dates."""
+        planner.generate_plan_with_gemini('Weight loss', '2030-01-01', 5, 1, '60.00', client=self.client)
+        plan = planner.generate_plan_with_gemini(' weight-LOSS! ', '2030-03-10', 5, 1, '99', client=self.client)
+        self.assertEqual(len(self.client.prompts), 1)
+        self.assertEqual([day['date'] for day in plan][:2], ['2030-03-10', '2030-03-11'])
+        self.assertEqual(plan[0]['mealPlan'], "Stub meal plan 1")
+        stats = plan_cache.get_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_different_budget_band_misses(self):
+        """Test budgets in another band call the model."""
+        planner.generate_plan_with_gemini('strength', '2030-01-01', 5, 1, 60, client=self.client)
+        planner.generate_plan_with_gemini('strength', '2030-01-01', 5, 1, 120, client=self.client)
+        self.assertEqual(len(self.client.prompts), 2)
+
+    def test_fresh_bypasses_cache(self):
+        """Test the opt-out flag always calls the model and refreshes the template."""
+        planner.generate_plan_with_gemini('strength', '2030-01-01', 5, 1, 60, client=self.client)
+        planner.generate_plan_with_gemini('strength', '2030-01-01', 5, 1, 60, client=self.client, fresh=True)
+        self.assertEqual(len(self.client.prompts), 2)
+        self.assertEqual(plan_cache.get_cache().stats()['hits'], 0)
+
+    def test_failed_generation_not_cached(self):
+        """Test a failed model call leaves nothing behind."""
+        with self.assertRaises(ValueError):
+            planner.generate_plan_with_gemini(
+                'strength', '2030-01-01', 5, 1, 60, client=llm.StubClient(failure_rate=1.0)
+            )
+        self.assertEqual(plan_cache.get_cache().stats()['entries'], 0)
+
+    @override_settings(PLAN_CACHE={'MAX_ENTRIES': 2})
+    def test_lru_eviction(self):
+        """Test the least recently used template is evicted first."""
+        for goal in ('a', 'b'):
+            planner.generate_plan_with_gemini(goal, '2030-01-01', 1, 1, 60, client=self.client)
+        planner.generate_plan_with_gemini('a', '2030-01-01', 1, 1, 60, client=self.client)
+        planner.generate_plan_with_gemini('c', '2030-01-01', 1, 1, 60, client=self.client)
+        planner.generate_plan_with_gemini('a', '2030-01-01', 1, 1, 60, client=self.client)
+        planner.generate_plan_with_gemini('b', '2030-01-01', 1, 1, 60, client=self.client)
+        self.assertEqual(len(self.client.prompts), 4)
+        self.assertEqual(plan_cache.get_cache().stats()['evictions'], 2)
+
+    @override_settings(PLAN_CACHE={'TIMEOUT': 60})
+    def test_ttl_expiry(self):
+        """Test expired templates are regenerated."""
+        planner.generate_plan_with_gemini('strength', '2030-01-01', 1, 1, 60, client=self.client)
+        with mock.patch('presionalized_assistance.plan_cache.time.monotonic', return_value=time.monotonic() + 61):
+            planner.generate_plan_with_gemini('strength', '2030-01-01', 1, 1, 60, client=self.client)
+        self.assertEqual(len(self.client.prompts), 2)
+
+    @override_settings(PLAN_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        """Test the cache can be switched off."""
+        for _ in range(2):
+            planner.generate_plan_with_gemini('strength', '2030-01-01', 1, 1, 60, client=self.client)
+        self.assertEqual(len(self.client.prompts), 2)
+        self.assertIsNone(plan_cache.get_cache())
+
+
+class PlanDayTests(TestCase):
+    """Tests for per-day plan rows and the plan read endpoints."""
+
+    def setUp(self):
+        throttling.reset_backend()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret')
+        UserProfile.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.plan = self._create_plan(self.user, 30)
+
+    def _create_plan(self, user, days, store=True):
+        start = date(2030, 1, 1)
+        plan = PersonalizedFitnessPlan.objects.create(
+            user=user,
+            plan_name="Strength Plan",
+            start_date=start,
+            duration=days,
+            price=50,
+            plan_details=[
+                {"date": (start + timedelta(days=day)).isoformat(), "mealPlan": f"meal {day}", "exercisePlan": f"workout {day}"}
+                for day in range(days)
+            ],
+        )
+        if store:
+            plan_days.store_days(plan)
+        return plan
+
+    def test_date_detail_single_query(self):
+        """Test a date lookup is one indexed row fetch."""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('plan-date-detail', args=[self.plan.id, '2030-01-05']))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"date": "2030-01-05", "mealPlan": "meal 4", "exercisePlan": "workout 4"})
+
+    def test_date_detail_missing(self):
+        """Test unknown dates and other members' plans return 404."""
+        response = self.client.get(reverse('plan-date-detail', args=[self.plan.id, '2031-01-01']))
+        self.assertEqual(response.data['error'], "No plan found for the given date.")
+        response = self.client.get(reverse('plan-date-detail', args=[self.plan.id, 'someday']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        other = self._create_plan(User.objects.create_user(username='other'), 3)
+        response = self.client.get(reverse('plan-date-detail', args=[other.id, '2030-01-01']))
+        self.assertEqual(response.data['error'], "Plan not found.")
+
+    def test_list_returns_summaries(self):
+        """Test the plan list leaves out the day list."""
+        response = self.client.get(reverse('list-plans'))
+        self.assertEqual(len(response.data), 1)
+        self.assertNotIn('plan_details', response.data[0])
+        self.assertEqual(response.data[0]['days_url'], reverse('plan-days', args=[self.plan.id]))
+
+    def test_days_range(self):
+        """Test days are loaded on demand, optionally by date range."""
+        response = self.client.get(reverse('plan-days', args=[self.plan.id]), {'from': '2030-01-10', 'to': '2030-01-12'})
+        self.assertEqual([day['date'] for day in response.data], ['2030-01-10', '2030-01-11', '2030-01-12'])
+        response = self.client.get(reverse('plan-days', args=[self.plan.id]))
+        self.assertEqual(len(response.data), 30)
+        response = self.client.get(reverse('plan-days', args=[self.plan.id]), {'from': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_backfill(self):
+        """Test existing JSON plans are copied into day rows once."""
+        legacy = self._create_plan(self.user, 10, store=False)
+        legacy.plan_details.append({"date": "not a date", "mealPlan": "x"})
+        legacy.save()
+        self.assertEqual(plan_days.backfill(batch_size=1), (1, 10))
+        self.assertEqual(PlanDay.objects.filter(plan=legacy).count(), 10)
+        self.assertEqual(plan_days.backfill(), (0, 0))
+
+    @override_settings(
+        PLAN_MODEL_CLIENT='presionalized_assistance.llm.StubClient',
+        PLAN_JOBS_EAGER=True,
+        PLAN_CACHE={'ENABLED': False},
+    )
+    def test_generated_plan_stores_days(self):
+        """Test plans created by a generation job get their day rows."""
+        llm.reset_client()
+        self.addCleanup(llm.reset_client)
+        payload = {"goal": "strength", "start_date": "2030-02-01", "duration": 7, "daily_workout_hours": 1, "budget": "50"}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('generate-plan'), payload, format='json')
+        plan = PlanGenerationJob.objects.get(pk=response.data['job_id']).plan
+        self.assertEqual(plan.days.count(), 7)
+        self.assertEqual(plan.days.last().date, date(2030, 2, 7))
+
+
+class DayStreamParserTests(TestCase):
+    """Tests for the incremental day list parser."""
+
+    DAYS = [
+        {"mealPlan": "Oats {with} [berries]", "exercisePlan": "Run \"easy\" 5k"},
+        {"mealPlan": "Rice \\ beans", "exercisePlan": "Rest", "extra": {"tags": ["a", "]"]}},
+        {"mealPlan": "Dal \u00e9 \n", "exercisePlan": "Squats"},
+    ]
+
+    def _parse(self, pieces):
+        parser = DayStreamParser()
+        days = []
+        for piece in pieces:
+            days.extend(parser.feed(piece))
+        return days, parser
+
+    def test_every_split_point(self):
+        """Test any two-piece split of the output yields the same days."""
+        text = 'Here is your plan:\n```json\n' + json.dumps(self.DAYS) + '\n```\nEnjoy!'
+        for split in range(len(text) + 1):
+            days, parser = self._parse([text[:split], text[split:]])
+            self.assertEqual(days, self.DAYS, f"split at {split}")
+            self.assertFalse(parser.incomplete)
+
+    def test_random_chunking(self):
+        """Test random piece sizes, including single characters, yield the same days."""
+        text = json.dumps(self.DAYS * 20, indent=2)
+        rng = random.Random(13)
+        for _ in range(50):
+            pieces, pos = [], 0
+            while pos < len(text):
+                size = rng.randint(1, 40)
+                pieces.append(text[pos:pos + size])
+                pos += size
+            self.assertEqual(self._parse(pieces)[0], self.DAYS * 20)
+
+    def test_days_emitted_as_they_complete(self):
+        """Test a day is returned by the piece that closes it."""
+        parser = DayStreamParser()
+        self.assertEqual(parser.feed('[{"mealPlan": "a"'), [])
+        self.assertEqual(parser.feed('}, {"mealPlan"'), [{"mealPlan": "a"}])
+        self.assertEqual(parser.feed(': "b"}]'), [{"mealPlan": "b"}])
+
+    def test_truncated_output(self):
+        """Test complete days before a cut-off are kept and the cut is reported."""
+        days, parser = self._parse([json.dumps(self.DAYS)[:-20]])
+        self.assertEqual(days, self.DAYS[:2])
+        self.assertTrue(parser.incomplete)
+
+    def test_non_object_entries_skipped(self):
+        """Test entries that are not objects are counted, not returned."""
+        days, parser = self._parse(['[1, "x", [2], {"mealPlan": "a"}]'])
+        self.assertEqual(days, [{"mealPlan": "a"}])
+        self.assertEqual(parser.skipped, 1)
+
+
+@override_settings(
+    PLAN_MODEL_CLIENT='presionalized_assistance.llm.StubClient',
+    PLAN_MODEL_CLIENT_OPTIONS={'chunk_size': 7},
+)
+class PlanStreamTests(TestCase):
+    """Tests for streaming plan delivery."""
+
+    def setUp(self):
+        llm.reset_client()
+        plan_cache.reset_cache()
+        throttling.reset_backend()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret')
+        UserProfile.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.payload = {
+            "goal": "strength",
+            "start_date": "2030-01-01",
+            "duration": 5,
+            "daily_workout_hours": 1,
+            "budget": "50.00",
+        }
+
+    def tearDown(self):
+        llm.reset_client()
+        plan_cache.reset_cache()
+
+    def _events(self, response):
+        body = b''.join(response.streaming_content).decode()
+        return [
+            (block.split('\n')[0][len('event: '):], json.loads(block.split('\n')[1][len('data: '):]))
+            for block in body.strip().split('\n\n')
+        ]
+
+    def test_streams_days_then_saves_plan(self):
+        """Test each day arrives as an event and the plan is saved at the end."""
+        response = self.client.post(
+            reverse('generate-plan-stream'), self.payload, format='json', HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = self._events(response)
+        self.assertEqual([name for name, _ in events], ['day'] * 5 + ['done'])
+        self.assertEqual(events[0][1]['date'], '2030-01-01')
+        plan = PersonalizedFitnessPlan.objects.get(pk=events[-1][1]['plan_id'])
+        self.assertEqual(plan.days.count(), 5)
+        self.assertEqual(plan.plan_details, [data for _, data in events[:-1]])
+
+    def test_first_day_before_stream_ends(self):
+        """Test the first day is yielded while the model is still streaming."""
+        pieces_sent = []
+
+        class RecordingClient(llm.StubClient):
+            def stream(self, prompt, timeout=None):
+                for piece in super().stream(prompt, timeout):
+                    pieces_sent.append(piece)
+                    yield piece
+
+        client = RecordingClient(chunk_size=10)
+        stream = planner.stream_plan('strength', '2030-01-01', 5, 1, 50, client=client)
+        next(stream)
+        total = len(client._text(5)) // 10
+        self.assertLess(len(pieces_sent), total / 2)
+        self.assertEqual(len(list(stream)), 4)
+
+    @override_settings(PLAN_MODEL_CLIENT_OPTIONS={'failure_rate': 1.0})
+    def test_truncated_stream_reports_error(self):
+        """Test an incomplete stream ends with an error event and saves nothing."""
+        response = self.client.post(reverse('generate-plan-stream'), self.payload, format='json')
+        with self.assertLogs('presionalized_assistance.views', level='ERROR') as logs:
+            events = self._events(response)
+        self.assertEqual(events[-1][0], 'error')
+        self.assertIsNotNone(logs.records[0].exc_info)
+        self.assertFalse(PersonalizedFitnessPlan.objects.exists())
+
+    def test_invalid_request(self):
+        """Test validation errors are plain responses before any streaming starts."""
+        response = self.client.post(
+            reverse('generate-plan-stream'), dict(self.payload, start_date="soon"), format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(
+            reverse('generate-plan-stream'), dict(self.payload, duration="10 days"), format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('duration', response.json())
+
+
+class ExtractDaysTests(TestCase):
+    """Tests, including fuzz tests, for whole-response day extraction."""
+
+    def _random_day(self, rng):
+        alphabet = 'abc {}[]",:\\\n\u00e9'
+        text = lambda: ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+        day = {"mealPlan": text(), "exercisePlan": text()}
+        if rng.random() < 0.3:
+            day["extra"] = [{"k": text()}, [text()]]
+        return day
+
+    def _wrap(self, rng, body):
+        prefix = rng.choice(['', 'Sure!\n', '```json\n', 'Plan [draft]:\n```\n', '{"note": "x"}\n'])
+        suffix = rng.choice(['', '\n```', '\n```\nNotes: swap [{items}] freely.', ' ]} trailing'])
+        return prefix + body + suffix
+
+    def test_fuzz_complete_responses(self):
+        """Test random well-formed lists in random wrappers are recovered exactly."""
+        rng = random.Random(14)
+        for _ in range(300):
+            days = [self._random_day(rng) for _ in range(rng.randint(1, 8))]
+            text = self._wrap(rng, json.dumps(days, indent=rng.choice([None, 2]), ensure_ascii=rng.random() < 0.5))
+            result = extract_days(text)
+            self.assertEqual(result.days, days, text)
+            self.assertTrue(result.complete)
+
+    def test_fuzz_truncated_responses(self):
+        """Test a response cut anywhere keeps exactly the days completed before the cut."""
+        rng = random.Random(41)
+        for _ in range(300):
+            days = [self._random_day(rng) for _ in range(rng.randint(1, 8))]
+            body = json.dumps(days)
+            cut = rng.randint(0, len(body) - 1)
+            result = extract_days('```json\n' + body[:cut])
+            expected = [day for index, day in enumerate(days) if len(json.dumps(days[:index + 1])) - 1 <= cut]
+            self.assertEqual(result.days, expected, body[:cut])
+            self.assertFalse(result.complete)
+
+    def test_fuzz_garbage_does_not_raise(self):
+        """Test arbitrary text never raises."""
+        rng = random.Random(7)
+        for _ in range(300):
+            text = ''.join(rng.choice('[]{}",:\\ ab1') for _ in range(rng.randint(0, 200)))
+            self.assertIsInstance(extract_days(text).days, list)
+
+    def test_longest_list_wins(self):
+        """Test an echoed format example does not hide the real answer."""
+        text = 'Format: [{"mealPlan": "..."}]\nAnswer: [{"mealPlan": "a"}, {"mealPlan": "b"}]'
+        self.assertEqual(extract_days(text).salvaged, 2)
+
+    def test_malformed_entry_skipped(self):
+        """Test an invalid object is skipped while its neighbours are kept."""
+        result = extract_days('[{"mealPlan": "a"}, {"mealPlan": "b",}, {"mealPlan": "c"}]')
+        self.assertEqual([day["mealPlan"] for day in result.days], ["a", "c"])
+        self.assertEqual(result.skipped, 1)
+
+    def test_salvaged_days_not_regenerated(self):
+        """Test only the days missing from a truncated answer are requested again."""
+        full = json.dumps([{"mealPlan": f"m{day}", "exercisePlan": f"e{day}"} for day in range(5)])
+        prompts = []
+
+        class CutClient(llm.StubClient):
+            def generate(self, prompt, timeout=None):
+                prompts.append(prompt)
+                if len(prompts) == 1:
+                    return full[:full.index('{"mealPlan": "m3"') + 5]
+                return super().generate(prompt, timeout)
+
+        plan = planner.generate_plan_single('strength', '2030-01-01', 5, 1, 50, client=CutClient())
+        self.assertEqual([day['mealPlan'] for day in plan][:3], ['m0', 'm1', 'm2'])
+        self.assertEqual(len(plan), 5)
+        self.assertEqual(plan[-1]['date'], '2030-01-05')
+        self.assertIn("These are days 4 to 5 of a 5-day plan", prompts[1])
+        self.assertIn("list of 2 objects", prompts[1])
+
+
+@override_settings(PLAN_JOBS_EAGER=False, PLAN_JOBS_IN_PROCESS=False)
+class PlanThrottleTests(TestCase):
+    """Tests for AI generation rate limits and the in-flight job cap."""
+
+    def setUp(self):
+        throttling.reset_backend()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret')
+        UserProfile.objects.create(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.payload = {
+            "goal": "strength",
+            "start_date": "2030-01-01",
+            "duration": 7,
+            "daily_workout_hours": 1,
+            "budget": "50.00",
+        }
+
+    def tearDown(self):
+        throttling.reset_backend()
+
+    @override_settings(PLAN_JOB_MAX_IN_FLIGHT=2, PLAN_JOB_IN_FLIGHT_RETRY_AFTER=15)
+    def test_in_flight_cap(self):
+        """Test a member cannot queue more jobs than the cap until one finishes."""
+        for _ in range(2):
+            response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '15')
+
+        PlanGenerationJob.objects.filter(user=self.user).update(status=PlanGenerationJob.SUCCEEDED)
+        response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    @override_settings(
+        PLAN_JOB_MAX_IN_FLIGHT=2,
+        PLAN_JOB_IN_FLIGHT_RETRY_AFTER=15,
+        PLAN_MODEL_CLIENT='presionalized_assistance.llm.StubClient',
+    )
+    def test_in_flight_cap_counts_streams(self):
+        """Test open plan streams share the in-flight cap with jobs and free it when closed."""
+        llm.reset_client()
+        self.addCleanup(llm.reset_client)
+        cache.delete(throttles.STREAM_KEY.format(self.user.id))
+        first = self.client.post(reverse('generate-plan-stream'), self.payload, format='json')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        for name in ('generate-plan-stream', 'generate-plan'):
+            response = self.client.post(reverse(name), self.payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response['Retry-After'], '15')
+        self.assertEqual(throttles.open_streams(self.user.id), 1)
+
+        # A client that disconnects mid-stream closes the response.
+        next(iter(first.streaming_content))
+        _close(first)
+        self.assertEqual(throttles.open_streams(self.user.id), 0)
+        response = self.client.post(reverse('generate-plan-stream'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        b''.join(response.streaming_content)
+        self.assertEqual(throttles.open_streams(self.user.id), 0)
+
+    def test_stream_closed_before_first_event(self):
+        """Test a stream response closed before it is iterated frees its slot once."""
+        cache.delete(throttles.STREAM_KEY.format(self.user.id))
+        other = self.client.post(reverse('generate-plan-stream'), self.payload, format='json')
+        response = self.client.post(reverse('generate-plan-stream'), self.payload, format='json')
+        self.assertEqual(throttles.open_streams(self.user.id), 2)
+        _close(response)
+        _close(response)
+        self.assertEqual(throttles.open_streams(self.user.id), 1)
+        _close(other)
+        self.assertEqual(throttles.open_streams(self.user.id), 0)
+
+    def test_stream_counter_expiring_mid_acquire(self):
+        """Test a counter that expires between ``add`` and ``incr`` is started again."""
+        key = throttles.STREAM_KEY.format(self.user.id)
+        cache.delete(key)
+        with mock.patch.object(throttles.cache, 'add', side_effect=[False, True]), \
+                mock.patch.object(throttles.cache, 'incr', side_effect=ValueError):
+            self.assertTrue(throttles.acquire_stream(self.user))
+
+    def test_stream_cache_warning(self):
+        """Test ``check --deploy`` warns when open streams are counted per process."""
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CACHES=local):
+            self.assertEqual(
+                [warning.id for warning in throttles.check_stream_cache(None)], ['presionalized_assistance.W001']
+            )
+        with override_settings(CACHES=shared):
+            self.assertEqual(throttles.check_stream_cache(None), [])
+
+    @override_settings(PLAN_JOB_MAX_IN_FLIGHT=100, THROTTLING={'RATES': {'ai_generation': '3/hour'}})
+    def test_generation_rate(self):
+        """Test the AI generation budget is per user and sets Retry-After."""
+        for _ in range(3):
+            response = self.client.post(reverse('generate-plan'), self.payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        response = self.client.post(reverse('generate-plan-stream'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '1200')
+
+        other = APIClient()
+        other_user = User.objects.create_user(username='other')
+        UserProfile.objects.create(user=other_user)
+        other.force_authenticate(user=other_user)
+        response = other.post(reverse('generate-plan'), self.payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+
+@override_settings(
+    PLAN_JOBS_EAGER=False,
+    PLAN_JOBS_IN_PROCESS=False,
+    PLAN_JOB_MAX_IN_FLIGHT=2,
+    THROTTLING={'RATES': {'ai_generation': '1000/hour'}},
+)
+class PlanThrottleConcurrencyTests(TransactionTestCase):
+    """Stress test firing parallel plan requests from one member."""
+
+    workers = 8
+    attempts = 24
+
+    def setUp(self):
+        throttling.reset_backend()
+        self.user = User.objects.create_user(username='member')
+        UserProfile.objects.create(user=self.user)
+        cache.delete(throttles.STREAM_KEY.format(self.user.id))
+        self.payload = {
+            "goal": "strength",
+            "start_date": "2030-01-01",
+            "duration": 7,
+            "daily_workout_hours": 1,
+            "budget": "50.00",
+        }
+
+    def tearDown(self):
+        throttling.reset_backend()
+
+    def _post(self, _):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        try:
+            while True:
+                try:
+                    return client.post(reverse('generate-plan'), self.payload, format='json').status_code
+                except OperationalError:
+                    # SQLite reports writer contention instead of blocking.
+                    time.sleep(0.001)
+        finally:
+            connection.close()
+
+    def test_parallel_posts_respect_cap(self):
+        """Test parallel job requests never queue more than the in-flight cap."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            statuses = list(pool.map(self._post, range(self.attempts)))
+        self.assertEqual(PlanGenerationJob.objects.filter(user=self.user).count(), 2)
+        # SQLite can report a request as locked after its job was saved; the retry then sees the cap.
+        self.assertLessEqual(statuses.count(status.HTTP_202_ACCEPTED), 2)
+        self.assertEqual(set(statuses) - {status.HTTP_202_ACCEPTED}, {status.HTTP_429_TOO_MANY_REQUESTS})
+
+
+@override_settings(
+    ROOT_URLCONF='fitness_studio.async_urls',
+    PLAN_MODEL_CLIENT='presionalized_assistance.llm.StubClient',
+    PLAN_MODEL_CLIENT_OPTIONS={'chunk_size': 7},
+    PLAN_JOBS_EAGER=True,
+)
+class AsyncPlanViewTests(TestCase):
+    """Tests for the async plan views served under ASGI."""
+
+    def setUp(self):
+        llm.reset_client()
+        plan_cache.reset_cache()
+        throttling.reset_backend()
+        self.user = User.objects.create_user(username='member', password='secret')
+        UserProfile.objects.create(user=self.user)
+        self.headers = {'Authorization': f"Bearer {AccessToken.for_user(self.user)}"}
+        cache.delete(throttles.STREAM_KEY.format(self.user.id))
+        self.payload = {
+            "goal": "strength",
+            "start_date": "2030-01-01",
+            "duration": 5,
+            "daily_workout_hours": 1,
+            "budget": "50.00",
+        }
+
+    def tearDown(self):
+        llm.reset_client()
+        plan_cache.reset_cache()
+
+    async def _post(self, name, payload):
+        return await self.async_client.post(
+            reverse(name), payload, content_type='application/json', headers=self.headers
+        )
+
+    async def test_stream_awaits_model(self):
+        """Test the async stream yields every day from ``astream`` and saves the plan."""
+        response = await self._post('generate-plan-stream', self.payload)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        names = [block.split('\n')[0][len('event: '):] for block in body.strip().split('\n\n')]
+        self.assertEqual(names, ['day'] * 5 + ['done'])
+        self.assertEqual(throttles.open_streams(self.user.id), 0)
+        plan = await PersonalizedFitnessPlan.objects.aget(user=self.user)
+        self.assertEqual(await plan.days.acount(), 5)
+
+    async def test_stream_closed_before_first_event(self):
+        """Test the async stream frees its slot when the response is closed unread."""
+        response = await self._post('generate-plan-stream', self.payload)
+        self.assertEqual(await sync_to_async(throttles.open_streams)(self.user.id), 1)
+        await sync_to_async(_close)(response)
+        self.assertEqual(await sync_to_async(throttles.open_streams)(self.user.id), 0)
+
+    async def test_job_and_plan_reads(self):
+        """Test a job runs to a plan that the async list, days and date views return."""
+        response = await self._post('generate-plan', self.payload)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = json.loads(response.content)
+        # The test transaction never commits, so run the job the commit would have started.
+        await sync_to_async(jobs.run_job)(job['job_id'])
+        response = await self.async_client.get(job['status_url'], headers=self.headers)
+        self.assertEqual(json.loads(response.content)['status'], PlanGenerationJob.SUCCEEDED)
+        plan_id = json.loads(response.content)['plan']['id']
+
+        plans = json.loads((await self.async_client.get(reverse('list-plans'), headers=self.headers)).content)
+        self.assertEqual([plan['days_url'] for plan in plans], [reverse('plan-days', args=[plan_id])])
+        days = await self.async_client.get(
+            reverse('plan-days', args=[plan_id]) + '?from=2030-01-02&to=2030-01-03', headers=self.headers
+        )
+        self.assertEqual([day['date'] for day in json.loads(days.content)], ['2030-01-02', '2030-01-03'])
+        day = await self.async_client.get(
+            reverse('plan-date-detail', args=[plan_id, '2030-01-05']), headers=self.headers
+        )
+        self.assertEqual(json.loads(day.content)['date'], '2030-01-05')
+        missing = await self.async_client.get(
+            reverse('plan-date-detail', args=[plan_id + 1, '2030-01-05']), headers=self.headers
+        )
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,193 @@
+"""
+The in-flight cap on plan generation.
+
+A member may have at most ``PLAN_JOB_MAX_IN_FLIGHT`` plan jobs queued or
+running and plan streams open, together. Jobs are counted from their rows and
+streams in the default Django cache, which all workers must share for the cap
+to hold across them; ``check --deploy`` warns when it is local to each
+process. Each check locks the member's user row until its transaction ends,
+so two requests cannot both take the last slot.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.throttling import BaseThrottle
+
+from fitness_studio.db_router import is_process_local
+from .models import PlanGenerationJob
+
+STREAM_KEY = 'plan-streams:{}'
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_stream_cache(app_configs, **kwargs):
+    """A stream opened on one worker must count against the cap on all of them."""
+    if is_process_local('default'):
+        return [checks.Warning(
+            "Open plan streams are counted in the 'default' cache, which is local to each process; "
+            "with several workers, each one enforces PLAN_JOB_MAX_IN_FLIGHT on its own streams only.",
+            hint="Set CACHE_URL to a cache shared by all workers.",
+            id='presionalized_assistance.W001',
+        )]
+    return []
+
+
+def open_streams(user_id):
+    """Plan streams ``user_id`` has open, as counted in the default cache."""
+    return cache.get(STREAM_KEY.format(user_id), 0)
+
+
+def in_flight(user):
+    """Queued or running plan jobs of ``user`` plus their open plan streams."""
+    jobs = PlanGenerationJob.objects.filter(
+        user=user, status__in=[PlanGenerationJob.QUEUED, PlanGenerationJob.RUNNING]
+    ).count()
+    return jobs + open_streams(user.id)
+
+
+def _max_in_flight():
+    return getattr(settings, 'PLAN_JOB_MAX_IN_FLIGHT', 2)
+
+
+def _lock_user(user):
+    # Every in-flight check of a user takes this row lock until its transaction
+    # ends, so two requests cannot both see the last free slot.
+    get_user_model().objects.select_for_update().only('pk').get(pk=user.pk)
+
+
+def reserve_job_slot(user):
+    """
+    Whether ``user`` may queue another plan job; must run in the job's transaction.
+
+    The user's row stays locked until that transaction commits, so the job is
+    counted by the next request's check.
+    """
+    _lock_user(user)
+    return in_flight(user) < _max_in_flight()
+
+
+def acquire_stream(user):
+    """
+    Count a new plan stream of ``user``; ``False`` if it would exceed ``PLAN_JOB_MAX_IN_FLIGHT``.
+
+    The counter expires ``PLAN_STREAM_SLOT_SECONDS`` after the first stream
+    opens, so a worker that dies mid-stream cannot hold a slot for good.
+    """
+    key = STREAM_KEY.format(user.id)
+    with transaction.atomic():
+        _lock_user(user)
+        _count_stream(key)
+        if in_flight(user) > _max_in_flight():
+            release_stream(user.id)
+            return False
+    return True
+
+
+def _count_stream(key):
+    while not cache.add(key, 1, getattr(settings, 'PLAN_STREAM_SLOT_SECONDS', 900)):
+        try:
+            cache.incr(key)
+            return
+        except ValueError:
+            # The counter expired between ``add`` and ``incr``; start a new one.
+            continue
+
+
+def release_stream(user_id):
+    """Uncount a plan stream of ``user_id``; see ``hold_stream``."""
+    try:
+        cache.decr(STREAM_KEY.format(user_id))
+    except ValueError:
+        # The counter expired while the stream was open.
+        pass
+
+
+class _HeldStream:
+    # Gives back the stream slot of ``user_id`` exactly once: when ``events``
+    # ends or fails, or when the response is closed, even before the first
+    # event was pulled and so before the generator's own cleanup could run.
+
+    def __init__(self, events, user_id):
+        self._events = events
+        self._user_id = user_id
+        self._lock = threading.Lock()
+        self._released = False
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        release_stream(self._user_id)
+
+    def close(self):
+        try:
+            if hasattr(self._events, 'close'):
+                self._events.close()
+        finally:
+            self.release()
+
+
+class _HeldSyncStream(_HeldStream):
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except BaseException:
+            self.release()
+            raise
+
+
+class _HeldAsyncStream(_HeldStream):
+    # Under ASGI a client disconnect cancels the response task without calling
+    # ``close``, which reaches ``__anext__`` as ``CancelledError``.
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._events.__anext__()
+        except BaseException:
+            await sync_to_async(self.release)()
+            raise
+
+    async def aclose(self):
+        try:
+            await self._events.aclose()
+        finally:
+            await sync_to_async(self.release)()
+
+
+def hold_stream(events, user_id):
+    """Wrap the event iterator of a stream counted by ``acquire_stream`` so that closing it frees the slot."""
+    if hasattr(events, '__aiter__'):
+        return _HeldAsyncStream(events, user_id)
+    return _HeldSyncStream(events, user_id)
+
+
+class PlanJobConcurrencyThrottle(BaseThrottle):
+    """
+    Refuses new plan jobs while a member already has ``PLAN_JOB_MAX_IN_FLIGHT``
+    jobs queued or running or plan streams open, so one account cannot occupy
+    every worker.
+
+    This is an early, unlocked check that spares the generation budget;
+    ``reserve_job_slot`` is what enforces the cap.
+    """
+
+    def allow_request(self, request, view):
+        if request.method != 'POST' or not request.user.is_authenticated:
+            return True
+        return in_flight(request.user) < _max_in_flight()
+
+    def wait(self):
+        return getattr(settings, 'PLAN_JOB_IN_FLIGHT_RETRY_AFTER', 15)
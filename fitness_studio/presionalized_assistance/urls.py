@@ -1,9 +1,12 @@
 from django.urls import path
-from .views import AI_Assistance_List_View, FitnessPlanListView, FitnessPlanDateDetailView
+from .views import AI_Assistance_List_View, AI_Assistance_Stream_View, PlanGenerationJobView, FitnessPlanListView, FitnessPlanDaysView, FitnessPlanDateDetailView
 
 urlpatterns = [
     path('ai-assistance/', AI_Assistance_List_View.as_view(), name='generate-plan'),
+    path('ai-assistance/stream/', AI_Assistance_Stream_View.as_view(), name='generate-plan-stream'),
+    path('ai-assistance/jobs/<int:job_id>/', PlanGenerationJobView.as_view(), name='plan-job-detail'),
     path('fitness-plans/', FitnessPlanListView.as_view(), name='list-plans'),
+    path('fitness-plans/<int:plan_id>/days/', FitnessPlanDaysView.as_view(), name='plan-days'),
     path('fitness-plans/<int:plan_id>/<str:target_date>/', FitnessPlanDateDetailView.as_view(), name='plan-date-detail'),
 
 ]
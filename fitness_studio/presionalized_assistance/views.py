@@ -1,123 +1,182 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status, permissions
-from .models import PersonalizedFitnessPlan
-from .serializers import FitnessPlanSerializer
-import datetime
-import re
-import json
-import google.generativeai as genai
+from rest_framework.renderers import JSONRenderer
+from rest_framework import status
 from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from .models import PersonalizedFitnessPlan, PlanDay, PlanGenerationJob
+from .serializers import FitnessPlanSummarySerializer, PlanGenerationJobSerializer, PlanRequestSerializer
+from .plan_days import create_plan
+from .planner import stream_plan
+from .renderers import EventStreamRenderer, sse_event
+from .throttles import PlanJobConcurrencyThrottle, acquire_stream, hold_stream, reserve_job_slot
+from fitness_studio.db_router import replica_reads
+from fitness_studio.throttling import AIGenerationThrottle
+from userprofile.permissions import IsMember
+from . import jobs
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _plan_request(data):
+    """Validate a plan request; returns ``(params, None)`` or ``(None, error_response)``."""
+    serializer = PlanRequestSerializer(data=data)
+    if not serializer.is_valid():
+        return None, Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    return {
+        "goal": data["goal"],
+        "start_date": data["start_date"].isoformat(),
+        "duration": data["duration"],
+        "hours": data["daily_workout_hours"],
+        "budget": data["budget"],
+        "fresh": data["fresh"],
+    }, None
+
+
+def plan_days_queryset(plan_id, query_params):
+    """Days of a plan within the optional ``from``/``to`` dates; raises ``ValueError`` for bad dates."""
+    days = PlanDay.objects.filter(plan_id=plan_id)
+    if query_params.get('from'):
+        days = days.filter(date__gte=datetime.date.fromisoformat(query_params['from']))
+    if query_params.get('to'):
+        days = days.filter(date__lte=datetime.date.fromisoformat(query_params['to']))
+    return days
+
+
+def stream_response(events):
+    """Wrap an SSE event iterator (sync or async) in an unbuffered streaming response."""
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def create_job(user, params):
+    """Queue a plan job for ``user``; ``None`` if they are at the in-flight cap."""
+    with transaction.atomic():
+        if not reserve_job_slot(user):
+            return None
+        job = PlanGenerationJob.objects.create(
+            user=user,
+            goal=params["goal"],
+            start_date=params["start_date"],
+            duration=params["duration"],
+            daily_workout_hours=params["hours"],
+            budget=params["budget"],
+            fresh=params["fresh"]
+        )
+        jobs.enqueue(job)
+    return job
+
 
-GEMINI_API_KEY = settings.GEMINI_API_KEY
-
-# Initialize Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-
-def generate_plan_with_gemini(goal, start_date, duration, hours, budget):
-    model = genai.GenerativeModel(model_name='models/gemini-1.5-flash')
-
-    prompt = f"""
-    I want you to create a personalized fitness plan.
-    Goal: {goal}
-    Start Date: {start_date}
-    Duration: {duration} days
-    Daily Workout Hours: {hours}
-    Budget: {budget}
-
-    For each day, provide:
-    - Meal Plan
-    - Workout Plan
-
-    Output ONLY the following JSON list format:
-    [
-      {{
-        "mealPlan": "...",
-        "exercisePlan": "..."
-      }},
-      ...
-    ]
-    Only give me a list of {duration} objects. Don't include anything else like notes or comments.
-    """
-
-    response = model.generate_content(prompt)
-    raw_text = response.text
-    print("Gemini Response:", raw_text)
-
-    try:
-        match = re.search(r'\[\s*{.*}\s*\]', raw_text, re.DOTALL)
-        if not match:
-            raise ValueError("No valid JSON found in Gemini response.")
-
-        json_str = match.group(0)
-        parsed_days = json.loads(json_str)
-
-        # Add actual date fields
-        base_date = datetime.datetime.strptime(start_date, "%Y-%m-%d")
-        plan_data = []
-
-        for i, day in enumerate(parsed_days):
-            current_date = base_date + datetime.timedelta(days=i)
-            plan_data.append({
-                "date": current_date.strftime("%Y-%m-%d"),
-                "mealPlan": day.get("mealPlan", ""),
-                "exercisePlan": day.get("exercisePlan", "")
-            })
-
-        return plan_data
-
-    except Exception as e:
-        print("Gemini Parsing Error:", e)
-        raise ValueError("Failed to parse JSON from Gemini response.")
-  
 class AI_Assistance_List_View(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsMember]
+    throttle_classes = [PlanJobConcurrencyThrottle, AIGenerationThrottle]
 
     def post(self, request):
-        data = request.data
-        goal = data.get("goal")
-        start_date = data.get("start_date")
-        duration = int(data.get("duration", 30))
-        hours = int(data.get("daily_workout_hours", 1))
-        budget = data.get("budget")
-
-        if not all([goal, start_date, duration, hours, budget]):
-            return Response({"error": "All fields are required."}, status=status.HTTP_400_BAD_REQUEST)
+        params, error = _plan_request(request.data)
+        if error:
+            return error
+
+        job = create_job(request.user, params)
+        if job is None:
+            self.throttled(request, PlanJobConcurrencyThrottle().wait())
+        return Response({
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": reverse('plan-job-detail', args=[job.id]),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class AI_Assistance_Stream_View(APIView):
+    """Generate a plan while streaming each day to the client as a Server-Sent Event."""
+    permission_classes = [IsMember]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+    throttle_classes = [AIGenerationThrottle]
 
+    def post(self, request):
+        params, error = _plan_request(request.data)
+        if error:
+            return error
+        # A stream holds a worker and a model call until it closes, so it counts
+        # against the same in-flight cap as queued jobs.
+        if not acquire_stream(request.user):
+            self.throttled(request, PlanJobConcurrencyThrottle().wait())
+        user_id = request.user.id
+
+        def events():
+            plan_details = []
+            try:
+                for day in stream_plan(
+                    params["goal"], params["start_date"], params["duration"], params["hours"],
+                    params["budget"], timeout=getattr(settings, 'PLAN_JOB_TIMEOUT', 120),
+                    fresh=params["fresh"],
+                ):
+                    plan_details.append(day)
+                    yield sse_event('day', day)
+                plan = create_plan(
+                    user_id, params["goal"], params["start_date"], params["duration"],
+                    params["budget"], plan_details
+                )
+            except Exception as e:
+                logger.exception(f"Error streaming fitness plan: {str(e)}")
+                yield sse_event('error', {"error": "Failed to generate plan.", "days": len(plan_details)})
+                return
+            yield sse_event('done', {"plan_id": plan.id, "days": len(plan_details)})
+
+        return stream_response(hold_stream(events(), user_id))
+
+
+class PlanGenerationJobView(APIView):
+    permission_classes = [IsMember]
+
+    def get(self, request, job_id):
         try:
-            generated_plan = generate_plan_with_gemini(goal, start_date, duration, hours, budget)
-        except ValueError as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        plan = PersonalizedFitnessPlan.objects.create(
-            user=request.user,
-            plan_name=f"{goal.capitalize()} Plan ({start_date})",
-            description=f"{goal.capitalize()} plan generated with Gemini AI.",
-            start_date=start_date,
-            duration=duration,
-            price=budget,
-            plan_details=generated_plan
-        )
-        return Response(FitnessPlanSerializer(plan).data, status=status.HTTP_201_CREATED)
+            job = PlanGenerationJob.objects.select_related('plan').get(id=job_id, user=request.user)
+        except PlanGenerationJob.DoesNotExist:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PlanGenerationJobSerializer(job).data)
 
 
 class FitnessPlanListView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsMember]
 
+    @replica_reads()
     def get(self, request):
-        plans = PersonalizedFitnessPlan.objects.filter(user=request.user)
-        return Response(FitnessPlanSerializer(plans, many=True).data)
+        plans = PersonalizedFitnessPlan.objects.filter(user=request.user).defer('plan_details')
+        return Response(FitnessPlanSummarySerializer(plans, many=True).data)
+
+
+class FitnessPlanDaysView(APIView):
+    permission_classes = [IsMember]
+
+    def get(self, request, plan_id):
+        if not PersonalizedFitnessPlan.objects.filter(id=plan_id, user=request.user).exists():
+            return Response({"error": "Plan not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            days = plan_days_queryset(plan_id, request.query_params)
+        except ValueError:
+            return Response({"error": "from and to must use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response([day.as_dict() for day in days])
 
 
 class FitnessPlanDateDetailView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsMember]
 
     def get(self, request, plan_id, target_date):
         try:
-            plan = PersonalizedFitnessPlan.objects.get(id=plan_id, user=request.user)
-            for day_plan in plan.plan_details:
-                if day_plan.get("date") == target_date:
-                    return Response(day_plan)
-            return Response({"error": "No plan found for the given date."}, status=status.HTTP_404_NOT_FOUND)
-        except PersonalizedFitnessPlan.DoesNotExist:
+            date = datetime.date.fromisoformat(target_date)
+        except ValueError:
+            date = None
+        if date is not None:
+            day = PlanDay.objects.filter(plan_id=plan_id, plan__user=request.user, date=date).first()
+            if day is not None:
+                return Response(day.as_dict())
+        if not PersonalizedFitnessPlan.objects.filter(id=plan_id, user=request.user).exists():
             return Response({"error": "Plan not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"error": "No plan found for the given date."}, status=status.HTTP_404_NOT_FOUND)
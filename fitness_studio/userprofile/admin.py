@@ -1,3 +1,22 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import UserProfile
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    """
+    Where staff assign roles; registration always creates members.
+
+    Edits go through ``UserProfile.save``, so a role change bumps
+    ``token_version`` and retires the tokens issued under the old role.
+    """
+
+    list_display = ['user', 'role', 'phone_number']
+    list_filter = ['role']
+    search_fields = ['user__username', 'user__email']
+    list_select_related = ['user']
+
+    def get_readonly_fields(self, request, obj=None):
+        # The profile stays with its user; the version is only ever bumped by ``save``.
+        return ['user', 'token_version'] if obj else ['token_version']
@@ -0,0 +1,131 @@
+"""
+JWT authentication that loads the user together with its profile.
+
+SimpleJWT's ``JWTAuthentication`` fetches ``auth.User`` alone, so every view
+reading ``request.user.profile`` pays a second query. ``ProfileJWTAuthentication``
+fetches both in one ``select_related`` query and, when
+``AUTH_PROFILE_CACHE_TIMEOUT`` is positive, serves them from a snapshot in the
+Django cache (``AUTH_PROFILE_CACHE_ALIAS``) keyed by user ID. Saving or
+deleting a user or profile drops its snapshot; other workers only see that
+when the cache is shared, which ``check --deploy`` warns about.
+
+Tokens carrying a ``token_version`` claim are rejected once the profile's
+version has moved on, i.e. after a role change.
+
+Snapshot users are built like ``.defer('password')`` instances: reading the
+password hash loads it from the database, and ``save()`` only writes the
+loaded fields.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import checks
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from fitness_studio.db_router import is_process_local
+from .models import UserProfile
+from .permissions import TOKEN_VERSION_CLAIM
+
+SNAPSHOT_KEY = 'userprofile:snapshot:{}'
+
+_USER_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+_PROFILE_FIELDS = [field.attname for field in UserProfile._meta.concrete_fields]
+
+
+def _cache():
+    return caches[getattr(settings, 'AUTH_PROFILE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'AUTH_PROFILE_CACHE_TIMEOUT', 0)
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_snapshot_cache(app_configs, **kwargs):
+    """Snapshots dropped on one worker must be dropped for all of them."""
+    alias = getattr(settings, 'AUTH_PROFILE_CACHE_ALIAS', 'default')
+    if _timeout() and is_process_local(alias):
+        return [checks.Warning(
+            f"Authentication snapshots are cached in the '{alias}' cache, which is local to each process; "
+            "with several workers, a role change or deactivation reaches the others only after "
+            "AUTH_PROFILE_CACHE_TIMEOUT, and tokens it retired are accepted until then.",
+            hint="Set CACHE_URL to a cache shared by all workers, or AUTH_PROFILE_CACHE_TIMEOUT=0.",
+            id='userprofile.W001',
+        )]
+    return []
+
+
+def invalidate(user_id):
+    """Drop the cached snapshot for ``user_id``."""
+    if _timeout():
+        _cache().delete(SNAPSHOT_KEY.format(user_id))
+
+
+def _snapshot(user):
+    profile = getattr(user, 'profile', None)
+    return {
+        'user': [getattr(user, name) for name in _USER_FIELDS],
+        'profile': [getattr(profile, name) for name in _PROFILE_FIELDS] if profile else None,
+    }
+
+
+def _restore(snapshot):
+    user = User.from_db(router.db_for_read(User), _USER_FIELDS, snapshot['user'])
+    profile = None
+    if snapshot['profile'] is not None:
+        profile = UserProfile.from_db(router.db_for_read(UserProfile), _PROFILE_FIELDS, snapshot['profile'])
+        UserProfile.user.field.set_cached_value(profile, user)
+    # A cached ``None`` makes ``user.profile`` raise DoesNotExist without a query.
+    User.profile.related.set_cached_value(user, profile)
+    return user
+
+
+class ProfileJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` returning users with ``profile`` already loaded."""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = self._load(user_id)
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        version = validated_token.get(TOKEN_VERSION_CLAIM)
+        if version is not None and version != getattr(getattr(user, 'profile', None), 'token_version', None):
+            raise AuthenticationFailed(_("The user's role has changed."), code="token_outdated")
+
+        return user
+
+    def _load(self, user_id):
+        timeout = _timeout()
+        key = SNAPSHOT_KEY.format(user_id)
+        if timeout:
+            snapshot = _cache().get(key)
+            if snapshot is not None:
+                return _restore(snapshot)
+
+        try:
+            user = User.objects.select_related('profile').get(**{api_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if timeout:
+            _cache().set(key, _snapshot(user), timeout)
+        return user
@@ -16,6 +16,23 @@ class UserProfile(models.Model):
     bio = models.TextField(blank=True, null=True)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     role=models.CharField(max_length=10, choices=choices, default='member')
+    token_version = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_role = instance.__dict__.get('role')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Tokens carry the role, so changing it retires every issued token.
+        # Queryset ``update(role=...)`` bypasses this and must bump the version itself.
+        if self.pk and self.role != getattr(self, '_saved_role', self.role):
+            self.token_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'token_version'}
+        super().save(*args, **kwargs)
+        self._saved_role = self.role
 
     def __str__(self):
         return self.user.username
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+Role-based DRF permissions for the roles in ``userprofile.models.choices``.
+
+The role is read from the ``role`` claim that ``RoleTokenObtainPairSerializer``
+puts in the access token, so checks cost no query. Requests without the claim
+(older tokens, ``force_authenticate`` in tests) fall back to
+``request.user.profile``. ``ProfileJWTAuthentication`` rejects tokens whose
+``token_version`` claim is behind the profile, which is bumped whenever the
+role changes.
+"""
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+ROLE_CLAIM = 'role'
+TOKEN_VERSION_CLAIM = 'token_version'
+
+
+def request_role(request):
+    """Return the caller's role, or ``None`` for anonymous users and users without a profile."""
+    token = request.auth
+    if token is not None and hasattr(token, 'get') and token.get(ROLE_CLAIM) is not None:
+        return token[ROLE_CLAIM]
+    user = request.user
+    if not user or not user.is_authenticated:
+        return None
+    profile = getattr(user, 'profile', None)
+    return getattr(profile, 'role', None)
+
+
+class HasRole(BasePermission):
+    """Allows callers whose role is in ``roles``."""
+
+    roles = ()
+
+    def has_permission(self, request, view):
+        return request_role(request) in self.roles
+
+
+class IsAdmin(HasRole):
+    roles = ('admin',)
+    message = "Only admins can perform this action."
+
+
+class IsTrainer(HasRole):
+    roles = ('trainer',)
+    message = "Only trainers can manage fitness classes."
+
+
+class IsMember(HasRole):
+    """Any studio account with a profile; members, trainers and admins alike."""
+
+    roles = ('member', 'trainer', 'admin')
+    message = "A member profile is required."
+
+
+class ReadOnly(BasePermission):
+    """Allows safe methods; combine as ``ReadOnly | IsTrainer``."""
+
+    def has_permission(self, request, view):
+        return request.method in SAFE_METHODS
@@ -1,11 +1,16 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import UserProfile
+from .permissions import ROLE_CLAIM, TOKEN_VERSION_CLAIM
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ['phone_number', 'role']
+        # Roles grant trainer and admin permissions; new accounts are members
+        # and staff change roles in the Django admin (``UserProfileAdmin``).
+        read_only_fields = ['role']
 
 class UserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer(required=True)
@@ -24,7 +29,18 @@ class UserSerializer(serializers.ModelSerializer):
         )
         UserProfile.objects.create(
             user=user,
-            phone_number=profile_data.get('phone_number'),
-            role=profile_data.get('role')
+            phone_number=profile_data.get('phone_number')
         )
         return user
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issues tokens carrying the user's role and profile token version."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        profile = getattr(user, 'profile', None)
+        if profile is not None:
+            token[ROLE_CLAIM] = profile.role
+            token[TOKEN_VERSION_CLAIM] = profile.token_version
+        return token
@@ -0,0 +1,32 @@
+"""
+Signal handlers dropping cached authentication snapshots on user writes.
+
+The snapshot is dropped straight away and again on commit, so a request
+that re-cached the old row while the transaction was open is not served
+after it.
+"""
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import authentication
+from .models import UserProfile
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    """Drop the user's snapshot now and once the write is committed."""
+    authentication.invalidate(instance.pk)
+    transaction.on_commit(partial(authentication.invalidate, instance.pk))
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_snapshot(sender, instance, **kwargs):
+    """Drop the owner's snapshot now and once the profile write is committed."""
+    authentication.invalidate(instance.user_id)
+    transaction.on_commit(partial(authentication.invalidate, instance.user_id))
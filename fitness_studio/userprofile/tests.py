@@ -1,3 +1,275 @@
-from django.test import TestCase
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from booking.models import Booking, FitnessClass
+from booking.views import BookingView, FitnessClassView
+from fitness_studio import throttling
+from .authentication import ProfileJWTAuthentication, SNAPSHOT_KEY, check_snapshot_cache
+from .models import UserProfile
+from .permissions import IsAdmin, IsMember, IsTrainer, ROLE_CLAIM, TOKEN_VERSION_CLAIM
+
+
+class ProfileAuthenticationTests(TestCase):
+    """Tests for JWT authentication with the profile loaded alongside the user."""
+
+    def setUp(self):
+        cache.clear()
+        throttling.reset_backend()
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='secret')
+        UserProfile.objects.create(user=self.member, role='member')
+        self.trainer = User.objects.create_user(username='trainer', email='trainer@example.com', password='secret')
+        UserProfile.objects.create(user=self.trainer, role='trainer')
+        self.fitness_class = FitnessClass.objects.create(
+            name="YOGA",
+            date_time=timezone.now() + timedelta(days=1),
+            instructor="Jane Doe",
+            total_slots=10,
+            available_slots=10,
+            duration="60 min",
+            Location="Studio A"
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def _client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def _queries(self, authentication_class, request):
+        with mock.patch.object(BookingView, 'authentication_classes', [authentication_class]), \
+                mock.patch.object(FitnessClassView, 'authentication_classes', [authentication_class]):
+            with CaptureQueriesContext(connection) as queries:
+                response = request()
+        self.assertLess(response.status_code, 300, response.data)
+        return len(queries)
+
+    def _requests(self):
+        member, trainer = self._client(self.member), self._client(self.trainer)
+        booking = {"class_id": self.fitness_class.id, "client_name": "Member", "client_email": "member@example.com"}
+        new_class = {
+            "name": "HIIT",
+            "date_time": (timezone.now() + timedelta(days=2)).isoformat(),
+            "instructor": "Jane Doe",
+            "total_slots": 5,
+            "duration": "45 min",
+            "Location": "Studio B",
+        }
+        return {
+            'booking list': lambda: member.get(reverse('booking-list')),
+            'booking create': lambda: member.post(reverse('booking-list'), booking, format='json'),
+            'class create': lambda: trainer.post(reverse('class-list'), new_class, format='json'),
+        }
+
+    @override_settings(AUTH_PROFILE_CACHE_TIMEOUT=0)
+    def test_profile_loaded_with_user(self):
+        """Test the profile no longer costs a query of its own."""
+        for name, request in self._requests().items():
+            before = self._queries(JWTAuthentication, request)
+            Booking.objects.all().delete()
+            after = self._queries(ProfileJWTAuthentication, request)
+            self.assertEqual(after, before - 1, name)
+
+    @override_settings(AUTH_PROFILE_CACHE_TIMEOUT=30)
+    def test_snapshot_skips_user_query(self):
+        """Test a cached snapshot serves the user and profile without queries."""
+        request = self._requests()['booking list']
+        uncached = self._queries(ProfileJWTAuthentication, request)
+        cached = self._queries(ProfileJWTAuthentication, request)
+        self.assertEqual(cached, uncached - 1)
+
+    @override_settings(AUTH_PROFILE_CACHE_TIMEOUT=30)
+    def test_snapshot_invalidated_on_profile_save(self):
+        """Test a role change is seen on the next request."""
+        client = self._client(self.member)
+        with mock.patch.object(FitnessClassView, 'authentication_classes', [ProfileJWTAuthentication]):
+            new_class = {
+                "name": "HIIT",
+                "date_time": (timezone.now() + timedelta(days=2)).isoformat(),
+                "instructor": "Jane Doe",
+                "total_slots": 5,
+                "duration": "45 min",
+                "Location": "Studio B",
+            }
+            response = client.post(reverse('class-list'), new_class, format='json')
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+            self.assertIsNotNone(cache.get(SNAPSHOT_KEY.format(self.member.pk)))
+
+            profile = self.member.profile
+            profile.role = 'trainer'
+            profile.save()
+            self.assertIsNone(cache.get(SNAPSHOT_KEY.format(self.member.pk)))
+            response = client.post(reverse('class-list'), new_class, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    @override_settings(AUTH_PROFILE_CACHE_TIMEOUT=30)
+    def test_snapshot_cache_check(self):
+        """Test the deploy check warns when snapshots would be invalidated in one worker only."""
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(AUTH_PROFILE_CACHE_TIMEOUT=30, CACHES=local):
+            self.assertEqual([warning.id for warning in check_snapshot_cache(None)], ['userprofile.W001'])
+        with override_settings(AUTH_PROFILE_CACHE_TIMEOUT=30, CACHES=shared):
+            self.assertEqual(check_snapshot_cache(None), [])
+        with override_settings(AUTH_PROFILE_CACHE_TIMEOUT=0, CACHES=local):
+            self.assertEqual(check_snapshot_cache(None), [])
+
+    def test_snapshot_user_defers_password(self):
+        """Test snapshot users carry no password hash and save only loaded fields."""
+        token = AccessToken.for_user(self.member)
+        ProfileJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            user = ProfileJWTAuthentication().get_user(token)
+            self.assertEqual(user.profile.role, 'member')
+        self.assertIn('password', user.get_deferred_fields())
+        user.first_name = 'Changed'
+        user.save()
+        self.assertTrue(User.objects.get(pk=self.member.pk).check_password('secret'))
+
+    @override_settings(AUTH_PROFILE_CACHE_TIMEOUT=30)
+    def test_user_without_profile(self):
+        """Test users without a profile authenticate and raise on profile access without a query."""
+        user = User.objects.create_user(username='plain')
+        token = AccessToken.for_user(user)
+        ProfileJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            cached = ProfileJWTAuthentication().get_user(token)
+            with self.assertRaises(UserProfile.DoesNotExist):
+                cached.profile
+
+
+class RolePermissionTests(TestCase):
+    """Tests for role claims in issued tokens and the role permission classes."""
+
+    def setUp(self):
+        cache.clear()
+        throttling.reset_backend()
+        self.client = APIClient()
+        self.trainer = User.objects.create_user(username='trainer', email='trainer@example.com', password='secret')
+        UserProfile.objects.create(user=self.trainer, role='trainer')
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='secret')
+        UserProfile.objects.create(user=self.member, role='member')
+        self.new_class = {
+            "name": "HIIT",
+            "date_time": (timezone.now() + timedelta(days=2)).isoformat(),
+            "instructor": "Jane Doe",
+            "total_slots": 5,
+            "duration": "45 min",
+            "Location": "Studio B",
+        }
+
+    def tearDown(self):
+        cache.clear()
+
+    def _login(self, username):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': username, 'password': 'secret'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['access']
+
+    def test_registration_cannot_choose_role(self):
+        """Test a role sent at registration is ignored and the account is a member."""
+        response = self.client.post(reverse('user-register'), {
+            'username': 'newcomer', 'email': 'newcomer@example.com', 'password': 'secret',
+            'profile': {'role': 'admin'},
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['user']['profile']['role'], 'member')
+        self.assertEqual(AccessToken(self._login('newcomer'))[ROLE_CLAIM], 'member')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('newcomer')}")
+        response = self.client.post(reverse('class-list'), self.new_class, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_token_carries_role(self):
+        """Test issued tokens contain the role and token version claims."""
+        token = AccessToken(self._login('trainer'))
+        self.assertEqual(token[ROLE_CLAIM], 'trainer')
+        self.assertEqual(token[TOKEN_VERSION_CLAIM], 0)
+
+    def test_permission_check_uses_claim(self):
+        """Test a role check with a claim-bearing token needs no query."""
+        request = SimpleNamespace(auth=AccessToken(self._login('trainer')), user=User(pk=self.trainer.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(IsTrainer().has_permission(request, None))
+            self.assertTrue(IsMember().has_permission(request, None))
+            self.assertFalse(IsAdmin().has_permission(request, None))
+
+    def test_trainer_only_class_writes(self):
+        """Test only trainers may create classes while anyone may read them."""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('member')}")
+        response = self.client.post(reverse('class-list'), self.new_class, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('trainer')}")
+        response = self.client.post(reverse('class-list'), self.new_class, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.credentials()
+        self.assertEqual(self.client.get(reverse('class-list')).status_code, status.HTTP_200_OK)
+
+    def test_member_endpoints_need_profile(self):
+        """Test booking and plan endpoints reject anonymous users and users without a profile."""
+        self.assertEqual(self.client.get(reverse('booking-list')).status_code, status.HTTP_401_UNAUTHORIZED)
+        User.objects.create_user(username='plain', password='secret')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('plain')}")
+        for name in ('booking-list', 'waitlist', 'list-plans'):
+            self.assertEqual(self.client.get(reverse(name)).status_code, status.HTTP_403_FORBIDDEN, name)
+
+    def test_role_change_retires_tokens(self):
+        """Test a token issued before a role change is rejected."""
+        token = self._login('trainer')
+        profile = UserProfile.objects.get(user=self.trainer)
+        profile.role = 'member'
+        profile.save(update_fields=['role'])
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).token_version, 1)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.post(reverse('class-list'), self.new_class, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['code'], 'token_outdated')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('trainer')}")
+        response = self.client.post(reverse('class-list'), self.new_class, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_role_change_retires_tokens(self):
+        """Test staff can promote a member in the Django admin, which retires the member's tokens."""
+        token = self._login('member')
+        staff = User.objects.create_superuser(username='staff', email='staff@example.com', password='secret')
+        admin_client = Client()
+        admin_client.force_login(staff)
+        profile = UserProfile.objects.get(user=self.member)
+        response = admin_client.post(
+            reverse('admin:userprofile_userprofile_change', args=[profile.pk]),
+            {'bio': '', 'phone_number': '', 'role': 'trainer'},
+        )
+        self.assertEqual(response.status_code, 302)
+        profile.refresh_from_db()
+        self.assertEqual((profile.role, profile.token_version), ('trainer', 1))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.post(reverse('class-list'), self.new_class, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('member')}")
+        response = self.client.post(reverse('class-list'), self.new_class, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_other_saves_keep_version(self):
+        """Test saving a profile without a role change keeps issued tokens valid."""
+        profile = UserProfile.objects.get(user=self.member)
+        profile.phone_number = '12345'
+        profile.save()
+        self.assertEqual(UserProfile.objects.get(pk=profile.pk).token_version, 0)